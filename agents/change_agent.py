@@ -0,0 +1,77 @@
+"""
+Change Detection Agent - Limits incremental rescans to new and changed listings
+"""
+
+from typing import Optional
+from utils.models import AgentState
+from utils.snapshot_store import SnapshotStore, scope_key
+
+class ChangeDetectionAgent:
+    """Agent responsible for comparing a rescan with the last snapshot of the same search"""
+    
+    def __init__(self, snapshot_store: Optional[SnapshotStore] = None):
+        self.snapshot_store = snapshot_store or SnapshotStore()
+    
+    async def process(self, state: AgentState) -> AgentState:
+        """Keep only new or changed filtered listings and carry forward the unchanged leads"""
+        try:
+            if not state.search_criteria:
+                raise ValueError("No search criteria for change detection")
+            
+            scanned = len(state.filtered_listings)
+            print(f"🔁 Comparing {scanned} listings with the last scan...")
+            
+            changed_listings, carried_forward, events = self.snapshot_store.compare(
+                scope_key(state.search_criteria), state.filtered_listings
+            )
+            
+            state.filtered_listings = changed_listings
+            state.carried_forward_leads = carried_forward
+            state.change_events = events
+            
+            counts = {}
+            for event in events:
+                counts[event["event"]] = counts.get(event["event"], 0) + 1
+            state.metadata["changes"] = {
+                "scanned": scanned,
+                "changed": len(changed_listings),
+                "carried_forward": len(carried_forward),
+                "events": counts
+            }
+            
+            for event in events:
+                if event["event"] == "price_drop":
+                    print(f"   📉 Price drop: {event['address']} ${event['old_price']:,} → ${event['price']:,} (-{event['drop_percent']}%)")
+            
+            print(f"✅ Change Detection Complete: {len(changed_listings)} new or changed, {len(carried_forward)} carried forward")
+            
+            return state
+            
+        except Exception as e:
+            error_msg = f"Change Detection Agent error: {str(e)}"
+            state.errors.append(error_msg)
+            print(f"❌ {error_msg}")
+            return state
+    
+    async def carry_forward(self, state: AgentState) -> AgentState:
+        """Merge carried-forward leads into the scored leads and save the new snapshot"""
+        try:
+            removed = [event["property_key"] for event in state.change_events if event["event"] == "removed"]
+            self.snapshot_store.save(
+                scope_key(state.search_criteria), state.filtered_listings, state.scored_leads, removed
+            )
+            
+            state.scored_leads = sorted(
+                state.scored_leads + state.carried_forward_leads, key=lambda x: x.score or 0, reverse=True
+            )
+            state.current_step = "human_review"
+            
+            print(f"   ♻️ Carried forward {len(state.carried_forward_leads)} unchanged leads; {len(state.scored_leads)} leads in total")
+            
+            return state
+            
+        except Exception as e:
+            error_msg = f"Change Detection Agent error: {str(e)}"
+            state.errors.append(error_msg)
+            print(f"❌ {error_msg}")
+            return state
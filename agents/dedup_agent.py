@@ -0,0 +1,52 @@
+"""
+Dedup Agent - Merges listings that describe the same property across sources
+"""
+
+import os
+from typing import Optional
+from utils.models import AgentState
+from utils.fuzzy_dedup import FuzzyDeduplicator
+
+# Merge decisions kept in state metadata; the audit file (if configured) has all of them
+MAX_DECISIONS_IN_METADATA = 100
+
+class DedupAgent:
+    """Agent responsible for fuzzy cross-source deduplication of raw listings"""
+    
+    def __init__(self, threshold: float = 0.85, audit_path: Optional[str] = None):
+        self.deduplicator = FuzzyDeduplicator(
+            threshold=threshold,
+            audit_path=audit_path or os.getenv("LEADGEN_DEDUP_AUDIT_PATH")
+        )
+    
+    async def process(self, state: AgentState) -> AgentState:
+        """Merge fuzzy duplicates in the raw listings"""
+        try:
+            if not state.raw_listings:
+                raise ValueError("No raw listings to deduplicate")
+            
+            print(f"🧬 Deduplicating {len(state.raw_listings)} listings across sources...")
+            
+            merged_listings, stats = self.deduplicator.run(state.raw_listings)
+            
+            decisions = stats.pop("decisions")
+            for decision in decisions[:5]:
+                print(f"   🔗 Merged {' / '.join(decision['addresses'])} ({', '.join(decision['sources'])})")
+            
+            state.raw_listings = merged_listings
+            state.current_step = "filter"
+            state.metadata["dedup"] = {
+                **stats,
+                "threshold": self.deduplicator.threshold,
+                "decisions": decisions[:MAX_DECISIONS_IN_METADATA]
+            }
+            
+            print(f"✅ Dedup Complete: merged {stats['merged']} duplicates, {len(merged_listings)} listings remain")
+            
+            return state
+            
+        except Exception as e:
+            error_msg = f"Dedup Agent error: {str(e)}"
+            state.errors.append(error_msg)
+            print(f"❌ {error_msg}")
+            return state
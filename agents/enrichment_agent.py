@@ -4,22 +4,84 @@ Enrichment Agent - Enriches property listings with owner contact information
 
 import asyncio
 import random
-import string
-from typing import Dict, List, Any, Optional
+import time
+from typing import Dict, List, Any, Optional, Tuple
 from utils.models import AgentState, Lead
+from utils.enrichment_cache import EnrichmentCache
+from utils.address import property_key, listing_property_key
+from utils.rate_limiter import RateLimiterRegistry, get_rate_limiter
+from utils.provider_stats import ProviderStatsStore, get_provider_stats, market_key, GLOBAL_MARKET
+from utils.lead_heuristics import score_upper_bounds
+from utils.comps import CompsEngine, get_comps_engine
+from utils.run_checkpoints import StageCheckpointStore
 from datetime import datetime
-import re
+
+# Maximum concurrent in-flight calls per provider (tune to each provider's quota)
+DEFAULT_PROVIDER_LIMITS = {
+    "property_records": 10,
+    "skiptracing": 5,
+    "social_media": 5,
+    "public_records": 10
+}
+
+# Owner identity comes from property records and later sources build on them,
+# so these always run first; the remaining contact waterfall is ordered adaptively
+PREREQUISITE_SOURCES = ("property_records",)
 
 class EnrichmentAgent:
     """Agent responsible for enriching property data with owner contact information"""
     
-    def __init__(self):
+    def __init__(self,
+                 max_concurrent: int = 20,
+                 provider_limits: Optional[Dict[str, int]] = None,
+                 cache_results: bool = True,
+                 enrichment_cache: Optional[EnrichmentCache] = None,
+                 rate_limiter: Optional[RateLimiterRegistry] = None,
+                 adaptive_ordering: bool = True,
+                 ordering_scope: str = "market",
+                 provider_stats: Optional[ProviderStatsStore] = None,
+                 approval_threshold: Optional[float] = None,
+                 comps_engine: Optional[CompsEngine] = None,
+                 checkpoint_store: Optional[StageCheckpointStore] = None):
         self.enrichment_sources = {
             "property_records": self._enrich_from_property_records,
             "skiptracing": self._enrich_from_skiptracing,
             "social_media": self._enrich_from_social_media,
             "public_records": self._enrich_from_public_records
         }
+        
+        # Concurrency limits: a global cap on leads in flight plus a cap per provider
+        self.max_concurrent = max_concurrent
+        self.provider_limits = {**DEFAULT_PROVIDER_LIMITS, **(provider_limits or {})}
+        self._limits_loop = None
+        self._lead_semaphore = None
+        self._provider_semaphores = {}
+        
+        # Request-rate quotas per provider, shared with the API clients and other workflows
+        self.rate_limiter = rate_limiter or get_rate_limiter()
+        
+        # Provider results (including misses) are cached per address, since lookups are billed
+        if enrichment_cache is None and cache_results:
+            enrichment_cache = EnrichmentCache()
+        self.enrichment_cache = enrichment_cache
+        self.provider_calls = {source_name: 0 for source_name in self.enrichment_sources}
+        
+        # Waterfall order adapts to each provider's observed hit rate, latency and cost,
+        # per market ("market") or across all markets ("global")
+        self.adaptive_ordering = adaptive_ordering
+        self.ordering_scope = ordering_scope
+        self.provider_stats = provider_stats or get_provider_stats()
+        self.provider_order = {}
+        
+        # Listings that could not reach this score even with full contact data skip paid lookups
+        self.approval_threshold = approval_threshold
+        self.reset_gate_stats()
+        
+        # Property values and equity come from local comparable sales, in one batch per run
+        self.comps_engine = comps_engine or get_comps_engine()
+        
+        # Each enriched lead is checkpointed under the run id so a resumed run skips it
+        self.checkpoint_store = checkpoint_store
     
     async def process(self, state: AgentState) -> AgentState:
         """Enrich filtered listings with contact information"""
@@ -27,31 +89,80 @@ class EnrichmentAgent:
             if not state.filtered_listings:
                 raise ValueError("No filtered listings to enrich")
             
-            print(f"📞 Enriching {len(state.filtered_listings)} listings with contact data...")
+            total = len(state.filtered_listings)
+            print(f"📞 Enriching {total} listings with contact data (up to {self.max_concurrent} at once)...")
             
-            enriched_leads = []
+            started = time.perf_counter()
+            completed = 0
+            self.provider_order = {}
+            self.reset_gate_stats()
             
-            # Process each listing
-            for i, listing in enumerate(state.filtered_listings):
-                print(f"   🔍 Enriching listing {i+1}/{len(state.filtered_listings)}")
-                
-                # Convert listing to Lead object
-                lead = self._convert_listing_to_lead(listing)
-                
-                # Enrich with contact information
-                enriched_lead = await self._enrich_lead(lead)
-                
-                enriched_leads.append(enriched_lead)
-                
-                # Small delay to simulate real enrichment
-                await asyncio.sleep(0.1)
+            # Upper bounds for every listing at once; the gate itself runs per listing
+            upper_bounds = score_upper_bounds(state.filtered_listings).tolist()
+            
+            run_id = state.metadata.get("run_id")
+            checkpoint_store = self.checkpoint_store if run_id else None
+            checkpointed = checkpoint_store.load(run_id, "enrichment") if checkpoint_store else {}
+            if checkpointed:
+                print(f"   ⏯️ Resuming: {len(checkpointed)} leads were enriched before the interruption")
+            
+            async def enrich_with_progress(listing: Dict[str, Any], upper_bound: float) -> Lead:
+                nonlocal completed
+                key = listing.get('property_key') or listing_property_key(listing)
+                if key in checkpointed:
+                    lead = Lead(**checkpointed[key])
+                else:
+                    lead = await self.enrich_listing(listing, upper_bound)
+                    if checkpoint_store:
+                        checkpoint_store.save(run_id, "enrichment", key, lead.dict())
+                completed += 1
+                print(f"   🔍 Enriched listing {completed}/{total}")
+                return lead
+            
+            # Enrich all listings concurrently; gather keeps the filtered order
+            enriched_leads = list(await asyncio.gather(
+                *(enrich_with_progress(listing, upper_bound)
+                  for listing, upper_bound in zip(state.filtered_listings, upper_bounds))
+            ))
+            
+            valuation = self.value_leads(enriched_leads)
+            print(f"   🏘️  Valued {valuation['valued']}/{len(enriched_leads)} leads from comparable sales")
+            
+            elapsed = time.perf_counter() - started
             
             state.enriched_leads = enriched_leads
             state.current_step = "scoring"
             
             # Count successful enrichments
             enriched_count = sum(1 for lead in enriched_leads if lead.owner_phone or lead.owner_email)
-            print(f"✅ Enrichment Complete: {enriched_count}/{len(enriched_leads)} leads have contact info")
+            leads_per_second = len(enriched_leads) / elapsed if elapsed > 0 else float(len(enriched_leads))
+            
+            state.metadata["enrichment"] = {
+                "leads": len(enriched_leads),
+                "with_contact": enriched_count,
+                "elapsed_seconds": round(elapsed, 3),
+                "leads_per_second": round(leads_per_second, 2),
+                "max_concurrent": self.max_concurrent,
+                "provider_limits": dict(self.provider_limits),
+                "provider_calls": dict(self.provider_calls),
+                "rate_limits": {
+                    source_name: self.rate_limiter.bucket(source_name).get_stats()
+                    for source_name in self.enrichment_sources
+                },
+                "provider_order": dict(self.provider_order),
+                "provider_stats": self.provider_stats.summary(list(self.enrichment_sources)),
+                "gating": self.get_gate_stats(),
+                "valuation": valuation,
+                "resumed": len(checkpointed)
+            }
+            self.provider_stats.save()
+            if self.enrichment_cache:
+                state.metadata["enrichment"]["cache"] = self.enrichment_cache.stats()
+            
+            print(f"✅ Enrichment Complete: {enriched_count}/{len(enriched_leads)} leads have contact info ({leads_per_second:.1f} leads/sec)")
+            if self.gate_stats["skipped_listings"]:
+                print(f"   💰 Skipped enrichment for {self.gate_stats['skipped_listings']} listings that cannot reach "
+                      f"a score of {self.approval_threshold} (~${self.gate_stats['estimated_cost_saved']:.2f} saved)")
             
             return state
             
@@ -61,10 +172,86 @@ class EnrichmentAgent:
             print(f"❌ {error_msg}")
             return state
     
+    async def enrich_listing(self, listing: Dict[str, Any], upper_bound: Optional[float] = None) -> Lead:
+        """Convert a single filtered listing to a lead and enrich it unless it cannot be approved"""
+        lead = self._convert_listing_to_lead(listing)
+        
+        if self.approval_threshold is not None:
+            if upper_bound is None:
+                upper_bound = float(score_upper_bounds([listing])[0])
+            if upper_bound < self.approval_threshold:
+                self._record_skip(lead, upper_bound)
+                return lead
+        
+        lead_semaphore, _ = self._get_limits()
+        
+        async with lead_semaphore:
+            return await self._enrich_lead(lead)
+    
+    def get_gate_stats(self) -> Dict[str, Any]:
+        """Enrichment gating counters since the last process() call"""
+        return {
+            "approval_threshold": self.approval_threshold,
+            **self.gate_stats,
+            "skipped_lookups": round(self.gate_stats["skipped_lookups"], 1),
+            "estimated_cost_saved": round(self.gate_stats["estimated_cost_saved"], 2)
+        }
+    
+    def reset_gate_stats(self):
+        """Start new enrichment gating counters"""
+        self.gate_stats = {"skipped_listings": 0, "skipped_lookups": 0.0, "estimated_cost_saved": 0.0}
+    
+    def _record_skip(self, lead: Lead, upper_bound: float):
+        """Flag an unenriched lead and count the lookups its waterfall would have made"""
+        lead.metadata["enrichment_skipped"] = True
+        lead.metadata["score_upper_bound"] = upper_bound
+        
+        market = market_key(lead.city, lead.state) if self.ordering_scope == "market" else GLOBAL_MARKET
+        expected_calls, expected_cost = self.provider_stats.waterfall_estimate(self._source_order(market), market)
+        self.gate_stats["skipped_listings"] += 1
+        self.gate_stats["skipped_lookups"] += expected_calls
+        self.gate_stats["estimated_cost_saved"] += expected_cost
+    
+    def value_leads(self, leads: List[Lead]) -> Dict[str, Any]:
+        """Value every lead from comparable sales and derive its equity (value above asking price)"""
+        started = time.perf_counter()
+        estimates = self.comps_engine.estimate(leads)
+        
+        for lead, estimate in zip(leads, estimates):
+            if estimate is None:
+                continue
+            lead.estimated_value = estimate["value"]
+            lead.value_confidence = estimate["confidence"]
+            lead.metadata["comps"] = estimate
+            if lead.price:
+                lead.equity_estimate = round(max(estimate["value"] - lead.price, 0), 2)
+        
+        return {
+            "valued": sum(1 for estimate in estimates if estimate is not None),
+            "comps_k": self.comps_engine.k,
+            "sales": len(self.comps_engine.sales),
+            "elapsed_seconds": round(time.perf_counter() - started, 3)
+        }
+    
+    def _get_limits(self) -> Tuple[asyncio.Semaphore, Dict[str, asyncio.Semaphore]]:
+        """Return the concurrency semaphores for the running event loop"""
+        loop = asyncio.get_running_loop()
+        
+        # Semaphores belong to one event loop, so rebuild them when the loop changes
+        if self._limits_loop is not loop:
+            self._lead_semaphore = asyncio.Semaphore(self.max_concurrent)
+            self._provider_semaphores = {
+                source_name: asyncio.Semaphore(self.provider_limits.get(source_name, self.max_concurrent))
+                for source_name in self.enrichment_sources
+            }
+            self._limits_loop = loop
+        
+        return self._lead_semaphore, self._provider_semaphores
+    
     def _convert_listing_to_lead(self, listing: Dict[str, Any]) -> Lead:
         """Convert raw listing data to Lead object"""
         return Lead(
-            id=f"lead_{random.randint(100000, 999999)}",
+            id=f"lead_{listing.get('property_key') or listing_property_key(listing)}",
             address=listing.get('address', ''),
             city=listing.get('city', ''),
             state=listing.get('state', ''),
@@ -77,16 +264,33 @@ class EnrichmentAgent:
             lot_size=listing.get('lot_size'),
             year_built=listing.get('year_built'),
             source=listing.get('source', ''),
+            latitude=listing.get('latitude'),
+            longitude=listing.get('longitude'),
             motivation_indicators=listing.get('motivation_signals', []),
-            found_date=datetime.now()
+            found_date=datetime.now(),
+            metadata={"quality_score": listing['quality_score']} if 'quality_score' in listing else {}
         )
     
     async def _enrich_lead(self, lead: Lead) -> Lead:
         """Enrich a single lead with contact information"""
+        _, provider_semaphores = self._get_limits()
+        address_key = property_key(lead.address, lead.city, lead.state, lead.zip_code)
+        market = market_key(lead.city, lead.state) if self.ordering_scope == "market" else GLOBAL_MARKET
+        
         # Try each enrichment source
-        for source_name, enrich_func in self.enrichment_sources.items():
+        for source_name in self._source_order(market):
+            enrich_func = self.enrichment_sources[source_name]
             try:
-                enriched_data = await enrich_func(lead)
+                enriched_data = self.enrichment_cache.get(source_name, address_key) if self.enrichment_cache else None
+                
+                if enriched_data is None:
+                    # Wait for a rate limit token before taking a concurrency slot so waiting leads don't hold one
+                    await self.rate_limiter.acquire(source_name)
+                    async with provider_semaphores[source_name]:
+                        enriched_data = await self._call_source(source_name, enrich_func, lead, market)
+                    
+                    if self.enrichment_cache:
+                        self.enrichment_cache.set(source_name, address_key, enriched_data)
                 
                 # Update lead with enriched data
                 if enriched_data.get('owner_name'):
@@ -97,8 +301,6 @@ class EnrichmentAgent:
                     lead.owner_email = enriched_data['owner_email']
                 if enriched_data.get('mailing_address'):
                     lead.mailing_address = enriched_data['mailing_address']
-                if enriched_data.get('equity_estimate'):
-                    lead.equity_estimate = enriched_data['equity_estimate']
                 
                 # If we found contact info, we can stop enriching
                 if lead.owner_phone or lead.owner_email:
@@ -110,6 +312,34 @@ class EnrichmentAgent:
         
         return lead
     
+    def _source_order(self, market: str) -> List[str]:
+        """Waterfall order for a market: prerequisites first, then cheapest expected cost per contact"""
+        if market not in self.provider_order:
+            prerequisites = [name for name in self.enrichment_sources if name in PREREQUISITE_SOURCES]
+            contact_sources = [name for name in self.enrichment_sources if name not in PREREQUISITE_SOURCES]
+            
+            if self.adaptive_ordering:
+                contact_sources = self.provider_stats.order(contact_sources, market)
+            
+            self.provider_order[market] = prerequisites + contact_sources
+        
+        return self.provider_order[market]
+    
+    async def _call_source(self, source_name: str, enrich_func, lead: Lead, market: str) -> Dict[str, Any]:
+        """Call one enrichment source, recording its latency and whether it found contact info"""
+        self.provider_calls[source_name] += 1
+        started = time.perf_counter()
+        
+        try:
+            enriched_data = await enrich_func(lead)
+        except Exception:
+            self.provider_stats.record(source_name, market, False, time.perf_counter() - started)
+            raise
+        
+        found_contact = bool(enriched_data.get('owner_phone') or enriched_data.get('owner_email'))
+        self.provider_stats.record(source_name, market, found_contact, time.perf_counter() - started)
+        return enriched_data
+    
     async def _enrich_from_property_records(self, lead: Lead) -> Dict[str, Any]:
         """Enrich from public property records (mock implementation)"""
         await asyncio.sleep(0.2)  # Simulate API call
@@ -118,8 +348,7 @@ class EnrichmentAgent:
         if random.random() < 0.7:
             return {
                 "owner_name": self._generate_owner_name(),
-                "mailing_address": f"{lead.address}, {lead.city}, {lead.state} {lead.zip_code}",
-                "equity_estimate": self._estimate_equity(lead.price)
+                "mailing_address": f"{lead.address}, {lead.city}, {lead.state} {lead.zip_code}"
             }
         
         return {}
@@ -216,13 +445,4 @@ class EnrichmentAgent:
             # Different mailing address
             po_box = f"PO Box {random.randint(100, 9999)}"
             return f"{po_box}, {lead.city}, {lead.state} {lead.zip_code}"
-    
-    def _estimate_equity(self, current_price: Optional[float]) -> Optional[float]:
-        """Estimate property equity based on price and market factors"""
-        if not current_price:
-            return None
-        
-        # Mock equity calculation
-        # Assume 10-40% equity based on various factors
-        equity_percentage = random.uniform(0.1, 0.4)
-        return round(current_price * equity_percentage, 2)
+
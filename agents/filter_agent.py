@@ -2,14 +2,34 @@
 Filter Agent - Filters and refines property listings based on criteria
 """
 
-from typing import Dict, List, Any
+import heapq
+from typing import Dict, List, Any, Optional, Tuple
 from utils.models import AgentState, SearchCriteria
+from utils.spatial import geo_contains, geo_filter
+from utils.filter_engines import (
+    ColumnarFilterEngine, FusedFilterEngine, FilterCounts,
+    parse_location, location_matches, property_type_matches, score_listing_quality
+)
 from datetime import datetime, timedelta
 
 class FilterAgent:
     """Agent responsible for filtering raw listings based on detailed criteria"""
     
-    def __init__(self):
+    ENGINES = ("python", "columnar", "fused")
+    
+    def __init__(self, engine: str = "python", top_k: Optional[int] = None):
+        if engine not in self.ENGINES:
+            raise ValueError(f"Unknown filter engine: {engine}")
+        
+        # "python" runs each filter over a list of dicts; "columnar" evaluates them
+        # as NumPy masks; "fused" checks each listing once against a compiled predicate
+        self.engine = engine
+        self.columnar_engine = ColumnarFilterEngine()
+        self.fused_engine = FusedFilterEngine()
+        
+        # Only the best top_k listings move on to the paid enrichment and scoring stages
+        self.top_k = top_k
+        
         self.filters = {
             "location": self._filter_by_location,
             "price": self._filter_by_price,
@@ -26,31 +46,47 @@ class FilterAgent:
             if not state.raw_listings:
                 raise ValueError("No raw listings to filter")
             
-            print(f"🔍 Filtering {len(state.raw_listings)} raw listings...")
+            print(f"🔍 Filtering {len(state.raw_listings)} raw listings ({self.engine} engine)...")
             
-            filtered_listings = state.raw_listings.copy()
+            # Radius, bounding-box and polygon constraints are answered from a spatial index before the other filters
+            listings, geo_removed, unplaced = self._filter_by_geo(state.raw_listings, state.search_criteria)
             
-            # Apply each filter
-            for filter_name, filter_func in self.filters.items():
-                initial_count = len(filtered_listings)
-                
-                # Skip motivation filter if no specific motivation signals are requested
-                if filter_name == "motivation" and not state.search_criteria.motivation_signals:
+            if self.engine == "columnar":
+                filtered_listings, removal_counts = self.columnar_engine.run(listings, state.search_criteria)
+            elif self.engine == "fused":
+                filtered_listings, removal_counts = self.fused_engine.run(listings, state.search_criteria)
+            else:
+                filtered_listings, removal_counts = self._run_filters(listings, state.search_criteria)
+            
+            if geo_removed is not None:
+                removal_counts = {"geo": geo_removed, **removal_counts}
+            
+            for filter_name, removed in removal_counts.items():
+                if removed is None:
                     print(f"   🎯 {filter_name} filter: skipped (no specific signals requested)")
-                    continue
-                    
-                filtered_listings = filter_func(filtered_listings, state.search_criteria)
-                removed = initial_count - len(filtered_listings)
-                if removed > 0:
+                elif removed > 0:
                     print(f"   🎯 {filter_name} filter: removed {removed} listings")
                 else:
                     print(f"   ✅ {filter_name} filter: all listings passed")
             
-            # Add quality scores
-            filtered_listings = self._add_quality_scores(filtered_listings)
+            state.metadata["filter"] = {
+                "engine": self.engine,
+                "removed": removal_counts
+            }
+            if geo_removed is not None:
+                state.metadata["filter"]["geo_unplaced"] = unplaced
+                if unplaced:
+                    print(f"   📍 {unplaced} listings have no coordinates and skipped the geo filter")
+            if self.engine == "fused":
+                state.metadata["filter"]["evaluation_order"] = self.fused_engine.last_order
             
-            # Sort by quality score
-            filtered_listings.sort(key=lambda x: x.get('quality_score', 0), reverse=True)
+            # Rank by quality score, keeping only the top K when a limit is set
+            matched_count = len(filtered_listings)
+            filtered_listings = self.select_top(filtered_listings)
+            if len(filtered_listings) < matched_count:
+                print(f"   🏆 Keeping top {len(filtered_listings)} of {matched_count} listings by quality score")
+            state.metadata["filter"]["top_k"] = self.top_k
+            state.metadata["filter"]["dropped_by_top_k"] = matched_count - len(filtered_listings)
             
             state.filtered_listings = filtered_listings
             state.current_step = "enrichment"
@@ -65,30 +101,92 @@ class FilterAgent:
             print(f"❌ {error_msg}")
             return state
     
+    def select_top(self, listings: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Listings ordered by quality score, limited to top_k using a bounded heap"""
+        quality = lambda x: x.get('quality_score', 0)
+        
+        if self.top_k and len(listings) > self.top_k:
+            # nlargest keeps a heap of K items instead of sorting everything
+            return heapq.nlargest(self.top_k, listings, key=quality)
+        
+        return sorted(listings, key=quality, reverse=True)
+    
+    def _run_filters(self, listings: List[Dict[str, Any]], criteria: SearchCriteria) -> Tuple[List[Dict[str, Any]], FilterCounts]:
+        """Apply each filter in turn, returning scored survivors and per-filter removal counts"""
+        filtered_listings = listings.copy()
+        removal_counts = {}
+        
+        # Apply each filter
+        for filter_name, filter_func in self.filters.items():
+            initial_count = len(filtered_listings)
+            
+            # Skip motivation filter if no specific motivation signals are requested
+            if filter_name == "motivation" and not criteria.motivation_signals:
+                removal_counts[filter_name] = None
+                continue
+                
+            filtered_listings = filter_func(filtered_listings, criteria)
+            removal_counts[filter_name] = initial_count - len(filtered_listings)
+        
+        # Add quality scores
+        return self._add_quality_scores(filtered_listings), removal_counts
+    
+    def filter_listing(self, listing: Dict[str, Any], criteria: SearchCriteria) -> Optional[Dict[str, Any]]:
+        """Apply every filter to a single listing, returning it with a quality score or None"""
+        geo = self._geo_constraints(criteria)
+        # A single listing is tested directly; building an index for it would cost more than the check
+        if geo and geo_contains(listing, **geo) is False:
+            return None
+        
+        for filter_name, filter_func in self.filters.items():
+            if filter_name == "motivation":
+                # Skip motivation filter if no specific motivation signals are requested
+                if criteria.motivation_signals and not self._matches_motivation(listing, criteria):
+                    return None
+                continue
+            
+            if not filter_func([listing], criteria):
+                return None
+        
+        return self._add_quality_scores([listing])[0]
+    
+    def _filter_by_geo(self, listings: List[Dict[str, Any]], criteria: SearchCriteria) -> Tuple[List[Dict[str, Any]], Optional[int], int]:
+        """Keep listings inside the criteria's radius, bounding box and/or polygon, with the removed (None when none is set) and unplaced counts"""
+        geo = self._geo_constraints(criteria)
+        if not geo:
+            return listings, None, 0
+        
+        # One index per listing set, queried once for each shape
+        kept, unplaced = geo_filter(listings, **geo)
+        return kept, len(listings) - len(kept), unplaced
+    
+    def _geo_constraints(self, criteria: SearchCriteria) -> Optional[Dict[str, Any]]:
+        """The criteria's radius, bounding box and polygon, or None when none is set"""
+        has_radius = bool(criteria.radius_miles) and criteria.center_latitude is not None and criteria.center_longitude is not None
+        if not has_radius and not criteria.bbox and not criteria.polygon:
+            return None
+        
+        return {
+            "radius": (criteria.center_latitude, criteria.center_longitude, criteria.radius_miles) if has_radius else None,
+            "bbox": criteria.bbox,
+            "polygon": criteria.polygon
+        }
+    
     def _filter_by_location(self, listings: List[Dict[str, Any]], criteria: SearchCriteria) -> List[Dict[str, Any]]:
         """Filter by location criteria"""
         if not criteria.location:
             return listings
         
         # Extract target city and state
-        location_parts = [part.strip().lower() for part in criteria.location.split(',')]
-        target_city = location_parts[0] if location_parts else ""
-        target_state = location_parts[1] if len(location_parts) > 1 else ""
+        target_city, target_state = parse_location(criteria.location, criteria.whole_state)
         
         filtered = []
         for listing in listings:
             listing_city = listing.get('city', '').lower()
             listing_state = listing.get('state', '').lower()
             
-            # Match city
-            city_match = target_city in listing_city or listing_city in target_city
-            
-            # Match state if provided
-            state_match = True
-            if target_state:
-                state_match = target_state in listing_state or listing_state in target_state
-            
-            if city_match and state_match:
+            # Match city, and state if provided
+            if location_matches(listing_city, listing_state, target_city, target_state):
                 filtered.append(listing)
         
         return filtered
@@ -117,15 +215,15 @@ class FilterAgent:
         if not criteria.property_types:
             return listings
         
+        desired_types = [desired_type.lower() for desired_type in criteria.property_types]
+        
         filtered = []
         for listing in listings:
             listing_type = listing.get('property_type', '').lower()
             
             # Check if listing type matches any of the desired types
-            for desired_type in criteria.property_types:
-                if desired_type.lower() in listing_type or listing_type in desired_type.lower():
-                    filtered.append(listing)
-                    break
+            if property_type_matches(listing_type, desired_types):
+                filtered.append(listing)
         
         return filtered
     
@@ -188,19 +286,7 @@ class FilterAgent:
         filtered = []
         
         for listing in listings:
-            listing_signals = listing.get('motivation_signals', [])
-            
-            # Check if any desired motivation signals are present
-            has_desired_signal = any(
-                desired_signal.lower() in [signal.lower() for signal in listing_signals]
-                for desired_signal in criteria.motivation_signals
-            )
-            
-            # If we have specific motivation criteria, use them
-            # But be more lenient - if a listing has ANY motivation signals, include it
-            if has_desired_signal:
-                filtered.append(listing)
-            elif listing_signals:  # Has some motivation signals, even if not exactly what we want
+            if self._matches_motivation(listing, criteria):
                 filtered.append(listing)
         
         # If no listings match the strict criteria, return some with any motivation signals
@@ -212,6 +298,21 @@ class FilterAgent:
         
         return filtered
     
+    def _matches_motivation(self, listing: Dict[str, Any], criteria: SearchCriteria) -> bool:
+        """Check a single listing against the requested motivation signals"""
+        listing_signals = listing.get('motivation_signals', [])
+        
+        # Check if any desired motivation signals are present (lowercase each list once)
+        listing_signal_set = {signal.lower() for signal in listing_signals}
+        has_desired_signal = any(
+            desired_signal.lower() in listing_signal_set
+            for desired_signal in criteria.motivation_signals
+        )
+        
+        # If we have specific motivation criteria, use them
+        # But be more lenient - if a listing has ANY motivation signals, include it
+        return has_desired_signal or bool(listing_signals)
+    
     def _filter_by_quality(self, listings: List[Dict[str, Any]], criteria: SearchCriteria) -> List[Dict[str, Any]]:
         """Filter out low-quality listings"""
         filtered = []
@@ -231,49 +332,6 @@ class FilterAgent:
     def _add_quality_scores(self, listings: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
         """Add quality scores to listings"""
         for listing in listings:
-            score = 0
-            
-            # Basic information completeness (30 points)
-            if listing.get('price'): score += 10
-            if listing.get('bedrooms'): score += 5
-            if listing.get('bathrooms'): score += 5
-            if listing.get('square_feet'): score += 10
-            
-            # Motivation signals (40 points)
-            motivation_signals = listing.get('motivation_signals', [])
-            high_value_signals = [
-                'motivated_seller', 'price_reduction', 'estate_sale',
-                'financial_distress', 'quick_sale_needed', 'high_equity'
-            ]
-            
-            for signal in motivation_signals:
-                if signal in high_value_signals:
-                    score += 10
-                else:
-                    score += 5
-            
-            # Source quality (20 points)
-            source = listing.get('source', '')
-            if source == 'mls':
-                score += 20
-            elif source == 'fsbo':
-                score += 15
-            elif source == 'zillow':
-                score += 10
-            else:
-                score += 5
-            
-            # Days on market (10 points - inverse scoring)
-            days_on_market = listing.get('days_on_market', 0)
-            if days_on_market > 90:
-                score += 10  # Long time = more motivated
-            elif days_on_market > 30:
-                score += 7
-            elif days_on_market > 7:
-                score += 4
-            else:
-                score += 1
-            
-            listing['quality_score'] = min(score, 100)  # Cap at 100
+            listing['quality_score'] = score_listing_quality(listing)
         
         return listings
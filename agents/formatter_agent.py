@@ -3,6 +3,7 @@ Formatter Agent - Exports leads to various formats (CSV, Google Sheets, CRM)
 """
 
 import asyncio
+import heapq
 import csv
 import json
 import os
@@ -112,6 +113,8 @@ class FormatterAgent:
                 "Mailing Address": lead.mailing_address or "",
                 "Motivation Indicators": ", ".join(lead.motivation_indicators),
                 "Estimated Equity": lead.equity_estimate or "",
+                "Estimated Value": lead.estimated_value or "",
+                "Value Confidence": lead.value_confidence or "",
                 "Source": lead.source,
                 "Status": lead.status,
                 "Human Reviewed": lead.human_reviewed,
@@ -179,6 +182,8 @@ class FormatterAgent:
                 "Mailing Address": lead.mailing_address,
                 "Motivation Indicators": ", ".join(lead.motivation_indicators) if lead.motivation_indicators else "",
                 "Estimated Equity": lead.equity_estimate,
+                "Estimated Value": lead.estimated_value,
+                "Value Confidence": lead.value_confidence,
                 "Source": lead.source,
                 "Status": lead.status,
                 "Human Reviewed": lead.human_reviewed,
@@ -255,7 +260,7 @@ class FormatterAgent:
         for indicator in all_indicators:
             indicator_counts[indicator] = indicator_counts.get(indicator, 0) + 1
         
-        top_indicators = sorted(indicator_counts.items(), key=lambda x: x[1], reverse=True)[:5]
+        top_indicators = heapq.nlargest(5, indicator_counts.items(), key=lambda x: x[1])
         
         # Create report
         report = f"""
@@ -297,9 +302,9 @@ WORKFLOW STEPS:
 TOP 5 LEADS BY SCORE:
 """
         
-        # Sort leads by score and show top 5
-        sorted_leads = sorted(leads, key=lambda x: x.score or 0, reverse=True)[:5]
-        for i, lead in enumerate(sorted_leads, 1):
+        # Show the top 5 leads by score
+        top_leads = heapq.nlargest(5, leads, key=lambda x: x.score or 0)
+        for i, lead in enumerate(top_leads, 1):
             report += f"{i}. {lead.address}, {lead.city} - Score: {lead.score:.1f}\n"
             if lead.owner_phone:
                 report += f"   Phone: {lead.owner_phone}\n"
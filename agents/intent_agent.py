@@ -3,17 +3,68 @@ Intent Agent - Understands user requirements and converts to structured search c
 """
 
 import re
-from typing import Dict, Any
+from typing import Dict, Any, List, Optional, Tuple
 from langchain_openai import ChatOpenAI
 from langchain.prompts import ChatPromptTemplate
 from langchain.output_parsers import PydanticOutputParser
 from utils.models import SearchCriteria, AgentState
 import os
 
+# Keywords recognised by the rule-based parser, mapped to canonical values
+PROPERTY_TYPE_KEYWORDS = {
+    "single-family": ["single-family", "single family", "sfr", "house", "houses", "home", "homes"],
+    "duplex": ["duplex", "duplexes"],
+    "triplex": ["triplex", "triplexes"],
+    "fourplex": ["fourplex", "fourplexes", "quadplex", "quadplexes", "4-plex"],
+    "townhouse": ["townhouse", "townhouses", "townhome", "townhomes"],
+    "condo": ["condo", "condos", "condominium", "condominiums"],
+    "apartment": ["apartment", "apartments", "multifamily", "multi-family"],
+    "commercial": ["commercial", "retail", "office"]
+}
+
+MOTIVATION_KEYWORDS = {
+    "financial_distress": ["distress", "distressed", "foreclosure", "foreclosures", "pre-foreclosure", "behind on payments"],
+    "divorce_sale": ["divorce", "divorces"],
+    "estate_sale": ["estate sale", "estate sales", "probate", "inherited"],
+    "vacant_property": ["vacant", "abandoned"],
+    "high_equity": ["equity", "high equity"],
+    "motivated_seller": ["motivated"],
+    "price_reduction": ["price reduction", "price reductions", "price drop", "price drops", "reduced"],
+    "job_relocation": ["relocation", "relocating"],
+    "needs_repairs": ["fixer", "fixer-upper", "needs repairs", "handyman special"],
+    "long_time_on_market": ["stale", "long time on market", "expired listing", "expired listings"]
+}
+
+LEAD_TYPE_KEYWORDS = {
+    "investor": ["investor", "investors", "investment", "investments", "rental", "rentals", "flip", "flips", "cash flow"],
+    "buyer": ["buyer", "buyers", "looking to buy", "first-time"],
+    "seller": ["seller", "sellers", "owner", "owners", "selling"]
+}
+
+# Price amounts: optional "$", the number and an optional K/M suffix, not followed by a unit such as beds or sq ft
+AMOUNT = (
+    r'(\$)?\s*(?<![\w.])(\d[\d,]*(?:\.\d+)?)\s*([km])?(?!\w)'
+    r'(?!\s*(?:bed|bd|br\b|bath|ba\b|sq|square|sf\b|ft|feet|foot|acre|year|yr|unit|stor|car|%|percent|mile))'
+)
+
+# Range patterns come first so "from $200k to $400k" is not read as a single bound
+PRICE_PATTERNS = [
+    ("range", rf'between\s+{AMOUNT}\s+and\s+{AMOUNT}'),
+    ("range", rf'{AMOUNT}\s*(?:-|to)\s*{AMOUNT}'),
+    ("max", rf'(?:under|below|less than|up to|at most|max(?:imum)?)\s+{AMOUNT}'),
+    ("min", rf'(?:over|above|more than|at least|min(?:imum)?)\s+{AMOUNT}'),
+]
+
+# Words that mark a bare number shortly after them as a price
+PRICE_WORDS = r'\b(?:price[ds]?|budget|cost|asking|listed)\b'
+
+# Smaller amounts are bedroom counts, square footage or years rather than home prices
+MIN_PRICE = 10_000
+
 class IntentAgent:
     """Agent responsible for understanding user intent and extracting search criteria"""
     
-    def __init__(self, model_name: str = "gpt-3.5-turbo"):
+    def __init__(self, model_name: str = "gpt-3.5-turbo", fast_path_threshold: float = 0.7):
         self.llm = ChatOpenAI(
             model=model_name,
             temperature=0.1,
@@ -21,6 +72,9 @@ class IntentAgent:
         )
         self.output_parser = PydanticOutputParser(pydantic_object=SearchCriteria)
         
+        # Queries the rule-based parser is at least this confident about skip the LLM
+        self.fast_path_threshold = fast_path_threshold
+        
         # Intent analysis prompt
         self.prompt = ChatPromptTemplate.from_template("""
 You are a real estate lead generation specialist. Analyze the user query and extract structured search criteria.
@@ -49,17 +103,22 @@ Be specific and detailed. If information is unclear, make reasonable assumptions
     async def process(self, state: AgentState) -> AgentState:
         """Process user query and extract search criteria"""
         try:
-            # Format the prompt
-            formatted_prompt = self.prompt.format(
-                user_query=state.user_query,
-                format_instructions=self.output_parser.get_format_instructions()
-            )
+            # Try the deterministic parser first; templated queries need no LLM call
+            rule_criteria, confidence = self._parse_rule_based(state.user_query)
             
-            # Get LLM response
-            response = await self.llm.ainvoke(formatted_prompt)
-            
-            # Parse the response
-            search_criteria = self.output_parser.parse(response.content)
+            if rule_criteria and confidence >= self.fast_path_threshold:
+                search_criteria = rule_criteria
+                parser = "rule_based"
+            else:
+                try:
+                    search_criteria = await self._parse_with_llm(state.user_query)
+                    parser = "llm"
+                except Exception as e:
+                    if not rule_criteria:
+                        raise
+                    print(f"   ⚠️ LLM intent parsing failed, using rule-based criteria: {str(e)}")
+                    search_criteria = rule_criteria
+                    parser = "rule_based_fallback"
             
             # Update state
             state.search_criteria = search_criteria
@@ -70,57 +129,160 @@ Be specific and detailed. If information is unclear, make reasonable assumptions
                 "original_query": state.user_query,
                 "extracted_location": search_criteria.location,
                 "lead_type": search_criteria.lead_type,
-                "property_types": search_criteria.property_types
+                "property_types": search_criteria.property_types,
+                "parser": parser,
+                "rule_confidence": confidence
             }
             
-            print(f"🎯 Intent Analysis Complete:")
+            print(f"🎯 Intent Analysis Complete ({parser}, confidence {confidence:.2f}):")
             print(f"   📍 Location: {search_criteria.location}")
             print(f"   🏠 Property Types: {', '.join(search_criteria.property_types)}")
             print(f"   💰 Price Range: ${search_criteria.price_min or 'No min'} - ${search_criteria.price_max or 'No max'}")
             print(f"   🎯 Lead Type: {search_criteria.lead_type}")
             
             return state
-            
+        
         except Exception as e:
             error_msg = f"Intent Agent error: {str(e)}"
             state.errors.append(error_msg)
             print(f"❌ {error_msg}")
             return state
     
-    def _extract_price_range(self, query: str) -> tuple[float, float]:
-        """Extract price range from natural language"""
-        price_patterns = [
-            r'under\s+\$?([\d,]+)',
-            r'below\s+\$?([\d,]+)',
-            r'over\s+\$?([\d,]+)',
-            r'above\s+\$?([\d,]+)',
-            r'\$?([\d,]+)\s*-\s*\$?([\d,]+)',
-            r'between\s+\$?([\d,]+)\s+and\s+\$?([\d,]+)',
+    async def _parse_with_llm(self, query: str) -> SearchCriteria:
+        """Extract search criteria with an LLM round-trip"""
+        # Format the prompt
+        formatted_prompt = self.prompt.format(
+            user_query=query,
+            format_instructions=self.output_parser.get_format_instructions()
+        )
+        
+        # Get LLM response
+        response = await self.llm.ainvoke(formatted_prompt)
+        
+        # Parse the response
+        return self.output_parser.parse(response.content)
+    
+    def _parse_rule_based(self, query: str) -> Tuple[Optional[SearchCriteria], float]:
+        """Build search criteria from regex/keyword rules, with a confidence in [0, 1]"""
+        location = self._pick_location(self._extract_locations(query))
+        if not location:
+            # Nothing to search without a location
+            return None, 0.0
+        
+        price_min, price_max, explicit_price = self._extract_price_range(query)
+        property_types = self._extract_property_types(query)
+        motivation_signals = self._extract_motivation_signals(query)
+        lead_type = self._extract_lead_type(query)
+        
+        confidence = 0.5
+        if property_types:
+            confidence += 0.2
+        if explicit_price:
+            confidence += 0.15
+        if lead_type or motivation_signals:
+            confidence += 0.15
+        
+        criteria_data = {
+            "location": location,
+            "price_min": price_min,
+            "price_max": price_max,
+            "lead_type": lead_type or "seller",
+            "motivation_signals": motivation_signals
+        }
+        if property_types:
+            criteria_data["property_types"] = property_types
+        
+        return SearchCriteria(**criteria_data), round(confidence, 2)
+    
+    def _extract_property_types(self, query: str) -> List[str]:
+        """Extract canonical property types from keywords"""
+        return self._match_keywords(query, PROPERTY_TYPE_KEYWORDS)
+    
+    def _extract_motivation_signals(self, query: str) -> List[str]:
+        """Extract canonical motivation signals from keywords"""
+        return self._match_keywords(query, MOTIVATION_KEYWORDS)
+    
+    def _extract_lead_type(self, query: str) -> Optional[str]:
+        """Extract the lead type, preferring investor over buyer over seller"""
+        matches = self._match_keywords(query, LEAD_TYPE_KEYWORDS)
+        return matches[0] if matches else None
+    
+    def _match_keywords(self, query: str, keyword_map: Dict[str, List[str]]) -> List[str]:
+        """Return the canonical values whose keywords appear as whole words in the query"""
+        query_lower = query.lower()
+        return [
+            canonical for canonical, keywords in keyword_map.items()
+            if any(re.search(rf'(?<![\w-]){re.escape(keyword)}(?![\w-])', query_lower) for keyword in keywords)
         ]
+    
+    def _pick_location(self, locations: List[str]) -> Optional[str]:
+        """Choose the most specific location mention and trim leading non-place words"""
+        for location in locations:
+            if ',' not in location:
+                return location  # ZIP code
+            
+            city, state = [part.strip() for part in location.split(',', 1)]
+            # City names are capitalised, so drop any lowercase words captured before them
+            city_words = city.split()
+            while city_words and not city_words[0][0].isupper():
+                city_words.pop(0)
+            
+            # Greedy matches can also swallow capitalised sentence words ("Find ... in Phoenix")
+            if len(city_words) > 3:
+                city_words = city_words[-3:]
+            
+            if city_words:
+                return f"{' '.join(city_words)}, {state}"
         
-        for pattern in price_patterns:
-            match = re.search(pattern, query.lower())
-            if match:
-                if 'under' in pattern or 'below' in pattern:
-                    return None, float(match.group(1).replace(',', ''))
-                elif 'over' in pattern or 'above' in pattern:
-                    return float(match.group(1).replace(',', '')), None
-                else:
-                    # Range pattern
-                    return (
-                        float(match.group(1).replace(',', '')),
-                        float(match.group(2).replace(',', ''))
-                    )
+        return None
+    
+    def _extract_price_range(self, query: str) -> Tuple[Optional[float], Optional[float], bool]:
+        """Extract price range from natural language, and whether the amounts were written as prices"""
+        query_lower = query.lower()
         
-        return None, None
+        for direction, pattern in PRICE_PATTERNS:
+            for match in re.finditer(pattern, query_lower):
+                groups = match.groups()
+                amounts = [groups[i:i + 3] for i in range(0, len(groups), 3)]
+                
+                # Only "$" or a K/M suffix marks an amount as a price; a bare number needs a price word before it
+                explicit = any(dollar or suffix for dollar, _, suffix in amounts)
+                if not explicit and not re.search(PRICE_WORDS, query_lower[max(0, match.start() - 25):match.start()]):
+                    continue
+                
+                values = [self._parse_amount(number, suffix) for _, number, suffix in amounts]
+                if direction == "range":
+                    # "$300-400k": the first amount shares the second's suffix
+                    if amounts[1][2] and not amounts[0][2] and values[0] * self._multiplier(amounts[1][2]) <= values[1]:
+                        values[0] *= self._multiplier(amounts[1][2])
+                
+                if min(values) < MIN_PRICE:
+                    continue
+                
+                if direction == "max":
+                    return None, values[0], explicit
+                if direction == "min":
+                    return values[0], None, explicit
+                return values[0], values[1], explicit
+        
+        return None, None, False
+    
+    def _parse_amount(self, number: str, suffix: Optional[str]) -> float:
+        """Convert a matched amount such as "500", "1,200,000" or "1.5" + "m" to dollars"""
+        value = float(number.replace(',', '').rstrip('.'))
+        return value * self._multiplier(suffix)
+    
+    def _multiplier(self, suffix: Optional[str]) -> int:
+        """Dollar multiplier for a K/M amount suffix"""
+        return {"k": 1_000, "m": 1_000_000}.get(suffix or "", 1)
     
     def _extract_locations(self, query: str) -> list[str]:
         """Extract location mentions from query"""
         # Common location patterns
         location_patterns = [
-            r'in\s+([A-Za-z\s]+,\s*[A-Z]{2})',  # City, ST
-            r'([A-Za-z\s]+,\s*[A-Z]{2})',        # City, ST
-            r'(\d{5})',                          # ZIP code
+            r'\bin\s+([A-Za-z\s]+,\s*[A-Z]{2})\b',  # City, ST
+            r'([A-Za-z\s]+,\s*[A-Z]{2})\b',          # City, ST
+            r'\b(\d{5})\b',                            # ZIP code
         ]
         
         locations = []
@@ -4,8 +4,11 @@ Search Agent - Queries various real estate data sources for property listings
 
 import asyncio
 import aiohttp
-from typing import Dict, List, Any
+import time
+from typing import Dict, List, Any, Tuple, Optional, AsyncIterator
 from utils.models import AgentState, SearchCriteria
+from utils.address import listing_property_key
+from utils.spatial import city_centroid
 import json
 import random
 from datetime import datetime, timedelta
@@ -13,13 +16,22 @@ from datetime import datetime, timedelta
 class SearchAgent:
     """Agent responsible for searching property listings from various sources"""
     
-    def __init__(self):
+    def __init__(self,
+                 fan_out: bool = True,
+                 source_timeout: float = 5.0,
+                 search_deadline: float = 8.0):
         self.sources = {
             "zillow": self._search_zillow,
             "realtor": self._search_realtor,
             "mls": self._search_mls,
             "fsbo": self._search_fsbo
         }
+        
+        # Fan-out settings: every source is launched at once, each source gets
+        # its own timeout and the whole search is bounded by a deadline
+        self.fan_out = fan_out
+        self.source_timeout = source_timeout
+        self.search_deadline = search_deadline
     
     async def process(self, state: AgentState) -> AgentState:
         """Search for properties based on criteria"""
@@ -30,17 +42,18 @@ class SearchAgent:
             print(f"🔍 Starting property search for: {state.search_criteria.location}")
             
             # Search all available sources
-            all_listings = []
+            if self.fan_out:
+                all_listings, search_stats = await self._search_fan_out(state.search_criteria)
+            else:
+                all_listings, search_stats = await self._search_sequential(state.search_criteria)
+            
+            state.metadata["search"] = search_stats
             
-            for source_name, search_func in self.sources.items():
-                try:
-                    print(f"   📡 Searching {source_name}...")
-                    listings = await search_func(state.search_criteria)
-                    all_listings.extend(listings)
-                    print(f"   ✅ Found {len(listings)} listings from {source_name}")
-                except Exception as e:
-                    print(f"   ⚠️  {source_name} search failed: {str(e)}")
-                    continue
+            # A ZIP-scoped (sharded) search only keeps listings inside its ZIP codes
+            if state.search_criteria.zip_codes:
+                in_scope = [listing for listing in all_listings if self._in_zip_scope(listing, state.search_criteria.zip_codes)]
+                search_stats["outside_zip_scope"] = len(all_listings) - len(in_scope)
+                all_listings = in_scope
             
             # Remove duplicates based on address
             unique_listings = self._deduplicate_listings(all_listings)
@@ -58,6 +71,152 @@ class SearchAgent:
             print(f"❌ {error_msg}")
             return state
     
+    async def stream_listings(self, criteria: SearchCriteria, stats: Optional[Dict[str, Any]] = None) -> AsyncIterator[Dict[str, Any]]:
+        """Yield unique listings as each source returns, stopping at the search deadline"""
+        if stats is None:
+            stats = {}
+        stats.update({
+            "mode": "stream",
+            "source_counts": {},
+            "late_sources": [],
+            "failed_sources": []
+        })
+        
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + self.search_deadline
+        seen_keys = set()
+        tasks = {
+            asyncio.create_task(self._run_source(source_name, search_func, criteria)): source_name
+            for source_name, search_func in self.sources.items()
+        }
+        pending = set(tasks)
+        
+        try:
+            while pending:
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    break
+                
+                done, pending = await asyncio.wait(pending, timeout=remaining, return_when=asyncio.FIRST_COMPLETED)
+                
+                for task in done:
+                    source_name = tasks[task]
+                    try:
+                        listings, _ = task.result()
+                    except asyncio.TimeoutError:
+                        stats["late_sources"].append(source_name)
+                        continue
+                    except Exception as e:
+                        stats["failed_sources"].append(source_name)
+                        print(f"   ⚠️  {source_name} search failed: {str(e)}")
+                        continue
+                    
+                    stats["source_counts"][source_name] = len(listings)
+                    print(f"   ✅ Streaming {len(listings)} listings from {source_name}")
+                    
+                    for listing in listings:
+                        listing_key = self._listing_key(listing)
+                        if listing_key in seen_keys:
+                            continue
+                        seen_keys.add(listing_key)
+                        listing['property_key'] = listing_key
+                        yield listing
+        finally:
+            # Anything still running at the deadline (or when the consumer stops) is late
+            for task in pending:
+                task.cancel()
+                stats["late_sources"].append(tasks[task])
+            if pending:
+                await asyncio.gather(*pending, return_exceptions=True)
+    
+    async def _search_sequential(self, criteria: SearchCriteria) -> Tuple[List[Dict[str, Any]], Dict[str, Any]]:
+        """Query each source one after another"""
+        all_listings = []
+        stats = {
+            "mode": "sequential",
+            "source_counts": {},
+            "source_latency": {},
+            "late_sources": [],
+            "failed_sources": []
+        }
+        
+        for source_name, search_func in self.sources.items():
+            started = time.perf_counter()
+            try:
+                print(f"   📡 Searching {source_name}...")
+                listings = await search_func(criteria)
+                all_listings.extend(listings)
+                stats["source_counts"][source_name] = len(listings)
+                print(f"   ✅ Found {len(listings)} listings from {source_name}")
+            except Exception as e:
+                stats["failed_sources"].append(source_name)
+                print(f"   ⚠️  {source_name} search failed: {str(e)}")
+            finally:
+                stats["source_latency"][source_name] = round(time.perf_counter() - started, 3)
+        
+        return all_listings, stats
+    
+    async def _search_fan_out(self, criteria: SearchCriteria) -> Tuple[List[Dict[str, Any]], Dict[str, Any]]:
+        """Query every source concurrently and keep whatever arrives before the deadline"""
+        started = time.perf_counter()
+        stats = {
+            "mode": "fan_out",
+            "source_timeout": self.source_timeout,
+            "search_deadline": self.search_deadline,
+            "source_counts": {},
+            "source_latency": {},
+            "late_sources": [],
+            "failed_sources": []
+        }
+        
+        print(f"   📡 Searching {len(self.sources)} sources concurrently...")
+        tasks = {
+            asyncio.create_task(self._run_source(source_name, search_func, criteria)): source_name
+            for source_name, search_func in self.sources.items()
+        }
+        
+        done, pending = await asyncio.wait(tasks.keys(), timeout=self.search_deadline)
+        
+        # Sources still running at the deadline are cancelled and reported as late
+        for task in pending:
+            task.cancel()
+        if pending:
+            await asyncio.gather(*pending, return_exceptions=True)
+        
+        all_listings = []
+        # Keep results in registration order so output does not depend on timing
+        for task, source_name in tasks.items():
+            if task in pending:
+                stats["late_sources"].append(source_name)
+                print(f"   ⏰ {source_name} missed the {self.search_deadline}s search deadline")
+                continue
+            
+            try:
+                listings, elapsed = task.result()
+            except asyncio.TimeoutError:
+                stats["late_sources"].append(source_name)
+                stats["source_latency"][source_name] = self.source_timeout
+                print(f"   ⏰ {source_name} timed out after {self.source_timeout}s")
+                continue
+            except Exception as e:
+                stats["failed_sources"].append(source_name)
+                print(f"   ⚠️  {source_name} search failed: {str(e)}")
+                continue
+            
+            all_listings.extend(listings)
+            stats["source_counts"][source_name] = len(listings)
+            stats["source_latency"][source_name] = round(elapsed, 3)
+            print(f"   ✅ Found {len(listings)} listings from {source_name}")
+        
+        stats["elapsed_seconds"] = round(time.perf_counter() - started, 3)
+        return all_listings, stats
+    
+    async def _run_source(self, source_name: str, search_func, criteria: SearchCriteria) -> Tuple[List[Dict[str, Any]], float]:
+        """Run a single source search under its own timeout"""
+        started = time.perf_counter()
+        listings = await asyncio.wait_for(search_func(criteria), timeout=self.source_timeout)
+        return listings, time.perf_counter() - started
+    
     async def _search_zillow(self, criteria: SearchCriteria) -> List[Dict[str, Any]]:
         """Search Zillow (mock implementation - replace with real API)"""
         # Mock data for demonstration
@@ -70,7 +229,7 @@ class SearchAgent:
                 "address": f"{random.randint(100, 9999)} {random.choice(['Main', 'Oak', 'Pine', 'Elm', 'Cedar'])} {random.choice(['St', 'Ave', 'Dr', 'Ln'])}",
                 "city": criteria.location.split(',')[0].strip() if ',' in criteria.location else criteria.location,
                 "state": criteria.location.split(',')[1].strip() if ',' in criteria.location else "AZ",
-                "zip_code": f"{random.randint(10000, 99999)}",
+                "zip_code": self._mock_zip_code(criteria),
                 "property_type": random.choice(criteria.property_types),
                 "price": random.randint(200000, 800000),
                 "bedrooms": random.randint(2, 5),
@@ -90,6 +249,7 @@ class SearchAgent:
             if criteria.price_max and listing["price"] > criteria.price_max:
                 continue
                 
+            listing["latitude"], listing["longitude"] = self._mock_coordinates(criteria, listing)
             mock_listings.append(listing)
         
         return mock_listings
@@ -105,7 +265,7 @@ class SearchAgent:
                 "address": f"{random.randint(100, 9999)} {random.choice(['Broadway', 'First', 'Second', 'Third', 'Fourth'])} {random.choice(['St', 'Ave', 'Blvd'])}",
                 "city": criteria.location.split(',')[0].strip() if ',' in criteria.location else criteria.location,
                 "state": criteria.location.split(',')[1].strip() if ',' in criteria.location else "AZ",
-                "zip_code": f"{random.randint(10000, 99999)}",
+                "zip_code": self._mock_zip_code(criteria),
                 "property_type": random.choice(criteria.property_types),
                 "price": random.randint(150000, 700000),
                 "bedrooms": random.randint(1, 4),
@@ -124,6 +284,7 @@ class SearchAgent:
             if criteria.price_max and listing["price"] > criteria.price_max:
                 continue
                 
+            listing["latitude"], listing["longitude"] = self._mock_coordinates(criteria, listing)
             mock_listings.append(listing)
         
         return mock_listings
@@ -140,7 +301,7 @@ class SearchAgent:
                 "address": f"{random.randint(1000, 9999)} {random.choice(['Professional', 'Executive', 'Corporate', 'Business'])} {random.choice(['Way', 'Circle', 'Court'])}",
                 "city": criteria.location.split(',')[0].strip() if ',' in criteria.location else criteria.location,
                 "state": criteria.location.split(',')[1].strip() if ',' in criteria.location else "AZ",
-                "zip_code": f"{random.randint(10000, 99999)}",
+                "zip_code": self._mock_zip_code(criteria),
                 "property_type": random.choice(criteria.property_types),
                 "price": random.randint(300000, 1200000),
                 "bedrooms": random.randint(3, 6),
@@ -159,6 +320,7 @@ class SearchAgent:
             if criteria.price_max and listing["price"] > criteria.price_max:
                 continue
                 
+            listing["latitude"], listing["longitude"] = self._mock_coordinates(criteria, listing)
             mock_listings.append(listing)
         
         return mock_listings
@@ -174,7 +336,7 @@ class SearchAgent:
                 "address": f"{random.randint(100, 9999)} {random.choice(['Residential', 'Homeowner', 'Private', 'Owner'])} {random.choice(['Dr', 'Ln', 'Ct'])}",
                 "city": criteria.location.split(',')[0].strip() if ',' in criteria.location else criteria.location,
                 "state": criteria.location.split(',')[1].strip() if ',' in criteria.location else "AZ",
-                "zip_code": f"{random.randint(10000, 99999)}",
+                "zip_code": self._mock_zip_code(criteria),
                 "property_type": random.choice(criteria.property_types),
                 "price": random.randint(180000, 600000),
                 "bedrooms": random.randint(2, 4),
@@ -193,10 +355,31 @@ class SearchAgent:
             if criteria.price_max and listing["price"] > criteria.price_max:
                 continue
                 
+            listing["latitude"], listing["longitude"] = self._mock_coordinates(criteria, listing)
             mock_listings.append(listing)
         
         return mock_listings
     
+    def _in_zip_scope(self, listing: Dict[str, Any], zip_codes: List[str]) -> bool:
+        """Listing ZIP matches one of the ZIP codes or ZIP prefixes"""
+        zip_code = str(listing.get('zip_code') or "")
+        return any(zip_code.startswith(prefix) for prefix in zip_codes)
+    
+    def _mock_zip_code(self, criteria: SearchCriteria) -> str:
+        """Random ZIP code, inside the criteria's ZIP scope when it has one"""
+        if criteria.zip_codes:
+            prefix = random.choice(criteria.zip_codes)
+            return prefix + "".join(random.choice("0123456789") for _ in range(5 - len(prefix)))
+        return f"{random.randint(10000, 99999)}"
+    
+    def _mock_coordinates(self, criteria: SearchCriteria, listing: Dict[str, Any]) -> Tuple[float, float]:
+        """Random point within about 10 miles of the search center or the listing's city"""
+        if criteria.center_latitude is not None and criteria.center_longitude is not None:
+            latitude, longitude = criteria.center_latitude, criteria.center_longitude
+        else:
+            latitude, longitude = city_centroid(listing.get('city', ''), listing.get('state', ''))
+        return round(latitude + random.uniform(-0.15, 0.15), 6), round(longitude + random.uniform(-0.15, 0.15), 6)
+    
     def _generate_motivation_signals(self, high_quality: bool = False, fsbo: bool = False) -> List[str]:
         """Generate realistic motivation signals"""
         all_signals = [
@@ -246,9 +429,14 @@ class SearchAgent:
         unique_listings = []
         
         for listing in listings:
-            address_key = f"{listing['address']}, {listing['city']}, {listing['state']}"
+            address_key = self._listing_key(listing)
             if address_key not in seen_addresses:
                 seen_addresses.add(address_key)
+                listing['property_key'] = address_key
                 unique_listings.append(listing)
         
         return unique_listings
+    
+    def _listing_key(self, listing: Dict[str, Any]) -> str:
+        """Key used to recognise the same property across sources, whatever its address formatting"""
+        return listing_property_key(listing)
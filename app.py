@@ -8,6 +8,7 @@ import os
 import sys
 from dotenv import load_dotenv
 import argparse
+from typing import Optional
 
 # Add current directory to Python path
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
@@ -25,6 +26,10 @@ def main():
                        help='Run in CLI mode or launch Streamlit UI')
     parser.add_argument('--query', type=str, 
                        help='Search query for CLI mode')
+    parser.add_argument('--refresh', action='store_true',
+                       help='Ignore cached search, filter and enrichment results')
+    parser.add_argument('--resume', type=str, metavar='RUN_ID',
+                       help='Resume an interrupted CLI run from its last checkpoint')
     
     args = parser.parse_args()
     
@@ -32,20 +37,34 @@ def main():
         print("🏡 Launching RealEstateGenAI Streamlit UI...")
         launch_hitl_ui()
     elif args.mode == 'cli':
+        if args.resume:
+            print(f"⏯️ Resuming run: {args.resume}")
+            asyncio.run(run_cli_mode(None, resume=args.resume))
+            return
+        
         if not args.query:
             args.query = input("Enter your real estate search query: ")
         
         print(f"🔍 Running search: {args.query}")
-        asyncio.run(run_cli_mode(args.query))
+        asyncio.run(run_cli_mode(args.query, refresh=args.refresh))
 
-async def run_cli_mode(query: str):
+async def run_cli_mode(query: Optional[str], refresh: bool = False, resume: Optional[str] = None):
     """Run the lead generation in CLI mode"""
     try:
         # Initialize the graph
         graph = RealEstateLeadGenGraph()
         
         # Run the workflow
-        result = await graph.run_workflow(query)
+        if resume:
+            result = await graph.resume_workflow(resume)
+        else:
+            result = await graph.run_workflow(query, refresh=refresh)
+        
+        if not result.get('success', True):
+            print(f"❌ Error: {result.get('error')}")
+            if result.get('run_id') and not resume:
+                print(f"⏯️ Resume with: python app.py --mode cli --resume {result['run_id']}")
+            return
         
         print("\n✅ Lead generation complete!")
         print(f"📊 Found {len(result.get('leads', []))} leads")
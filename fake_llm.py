@@ -0,0 +1,119 @@
+"""
+Local fake chat model used by test_app.py to exercise LLM scoring without network calls
+Simulates response latency and provider rate limits (HTTP 429)
+"""
+
+import asyncio
+import hashlib
+import json
+import random
+import re
+import time
+from collections import deque
+from typing import Any, Dict, Optional, Tuple
+from langchain_core.messages import AIMessage
+
+class FakeRateLimitError(Exception):
+    """Raised by the fake chat model when its simulated rate limit is exceeded"""
+    
+    def __init__(self, retry_after: Optional[float] = None):
+        super().__init__("Error code: 429 - rate limit exceeded")
+        self.status_code = 429
+        self.retry_after = retry_after
+
+class FakeChatModel:
+    """Drop-in stand-in for ChatOpenAI.ainvoke that returns lead scoring JSON"""
+    
+    def __init__(self,
+                 latency: Tuple[float, float] = (0.05, 0.2),
+                 max_requests_per_window: Optional[int] = None,
+                 window_seconds: float = 1.0,
+                 retry_after: Optional[float] = None,
+                 fenced: bool = False):
+        self.latency = latency
+        self.max_requests_per_window = max_requests_per_window
+        self.window_seconds = window_seconds
+        self.retry_after = retry_after
+        # Wrap replies in ```json fences the way chat models often do
+        self.fenced = fenced
+        
+        self._recent_requests = deque()
+        self.stats = {
+            "calls": 0,
+            "rate_limited": 0,
+            "max_in_flight": 0
+        }
+        self._in_flight = 0
+    
+    async def ainvoke(self, prompt: Any) -> AIMessage:
+        """Simulate one chat completion"""
+        self.stats["calls"] += 1
+        self._check_rate_limit()
+        
+        self._in_flight += 1
+        self.stats["max_in_flight"] = max(self.stats["max_in_flight"], self._in_flight)
+        try:
+            await asyncio.sleep(random.uniform(*self.latency))
+        finally:
+            self._in_flight -= 1
+        
+        prompt_text = str(prompt)
+        
+        # Batched prompts list one JSON object per lead; answer with an array keyed by lead id
+        batch_leads = [
+            json.loads(line)
+            for line in prompt_text.splitlines()
+            if line.startswith("{") and '"lead_id"' in line
+        ]
+        if batch_leads:
+            return self._message([
+                {"lead_id": lead["lead_id"], **self._score_response(json.dumps(lead, sort_keys=True))}
+                for lead in batch_leads
+            ])
+        
+        return self._message(self._score_response(prompt_text))
+    
+    def _message(self, payload: Any) -> AIMessage:
+        """Serialize a reply, fenced if configured"""
+        content = json.dumps(payload)
+        if self.fenced:
+            content = f"```json\n{content}\n```"
+        return AIMessage(content=content)
+    
+    def _check_rate_limit(self):
+        """Raise a 429 when too many requests arrived inside the window"""
+        if not self.max_requests_per_window:
+            return
+        
+        now = time.monotonic()
+        while self._recent_requests and now - self._recent_requests[0] >= self.window_seconds:
+            self._recent_requests.popleft()
+        
+        if len(self._recent_requests) >= self.max_requests_per_window:
+            self.stats["rate_limited"] += 1
+            raise FakeRateLimitError(self.retry_after)
+        
+        self._recent_requests.append(now)
+    
+    def _score_response(self, prompt: str) -> Dict[str, Any]:
+        """Build a deterministic score object from the prompt contents"""
+        digest = int(hashlib.sha256(prompt.encode("utf-8")).hexdigest(), 16)
+        has_phone = bool(re.search(r'Phone Available: Yes|"has_phone": "Yes"', prompt))
+        
+        contact_score = 20 if has_phone else 8
+        motivation_score = 10 + digest % 21
+        deal_potential_score = 8 + (digest >> 8) % 18
+        lead_type_match_score = 6 + (digest >> 16) % 15
+        overall_score = contact_score + motivation_score + deal_potential_score + lead_type_match_score
+        
+        return {
+            "overall_score": overall_score,
+            "contact_score": contact_score,
+            "motivation_score": motivation_score,
+            "deal_potential_score": deal_potential_score,
+            "lead_type_match_score": lead_type_match_score,
+            "key_strengths": ["Phone available"] if has_phone else [],
+            "key_concerns": [],
+            "recommended_approach": "Standard follow-up",
+            "priority_level": "high" if overall_score >= 70 else "medium" if overall_score >= 50 else "low"
+        }
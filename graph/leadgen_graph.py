@@ -3,32 +3,72 @@ LangGraph StateGraph for Real Estate Lead Generation workflow
 """
 
 import asyncio
-from typing import Dict, Any, List
+from typing import Dict, Any, List, Optional, AsyncIterator
 from langgraph.graph import StateGraph, START, END
 from langgraph.graph.state import CompiledStateGraph
-from utils.models import AgentState
+from langgraph.checkpoint.base import BaseCheckpointSaver
+from utils.models import AgentState, Lead, WorkflowConfig
+from utils.stage_cache import WorkflowStageCache
+from utils.run_checkpoints import StageCheckpointStore, DEFAULT_CHECKPOINT_PATH, new_run_id, open_checkpointer, stage_items_path
 from agents.intent_agent import IntentAgent
 from agents.search_agent import SearchAgent
+from agents.dedup_agent import DedupAgent
 from agents.filter_agent import FilterAgent
+from agents.change_agent import ChangeDetectionAgent
 from agents.enrichment_agent import EnrichmentAgent
 from agents.scoring_agent import ScoringAgent
 from agents.formatter_agent import FormatterAgent
+from graph.streaming_pipeline import StreamingLeadPipeline
+from graph.metro_scan import MetroScanner
 
 class RealEstateLeadGenGraph:
     """LangGraph-based workflow for real estate lead generation"""
     
-    def __init__(self):
+    def __init__(self,
+                 use_stage_cache: bool = True,
+                 config: Optional[WorkflowConfig] = None,
+                 checkpoint_path: Optional[str] = DEFAULT_CHECKPOINT_PATH):
+        self.config = config or WorkflowConfig()
         self.graph = self._build_graph()
         
+        # Search, filter and enrichment results are reused across runs with the same inputs
+        self.stage_cache = WorkflowStageCache() if use_stage_cache else None
+        
+        # State is checkpointed after every node, and enrichment/scoring progress per lead,
+        # so an interrupted run can be resumed by its run id (None disables checkpointing)
+        self.checkpoint_path = checkpoint_path
+        self.stage_checkpoints = StageCheckpointStore(stage_items_path(checkpoint_path)) if checkpoint_path else None
+        
         # Initialize agents
         self.intent_agent = IntentAgent()
         self.search_agent = SearchAgent()
-        self.filter_agent = FilterAgent()
-        self.enrichment_agent = EnrichmentAgent()
-        self.scoring_agent = ScoringAgent()
+        self.dedup_agent = DedupAgent()
+        # Only the best max_leads_per_search listings continue past filtering
+        self.filter_agent = FilterAgent(top_k=self.config.max_leads_per_search)
+        # Incremental rescans only enrich and score listings that changed since the last scan
+        self.change_agent = ChangeDetectionAgent()
+        # Gating is opt-in: the bound covers the heuristic score, not what the LLM might give
+        self.enrichment_agent = EnrichmentAgent(
+            approval_threshold=self.config.auto_approve_score if self.config.gate_enrichment else None,
+            checkpoint_store=self.stage_checkpoints
+        )
+        self.scoring_agent = ScoringAgent(
+            cascade=True,
+            approval_threshold=self.config.auto_approve_score,
+            checkpoint_store=self.stage_checkpoints
+        )
         self.formatter_agent = FormatterAgent()
+        
+        # Streaming execution mode shares the same agents
+        self.streaming_pipeline = StreamingLeadPipeline(
+            self.search_agent,
+            self.filter_agent,
+            self.enrichment_agent,
+            self.scoring_agent,
+            dedup_agent=self.dedup_agent
+        )
     
-    def _build_graph(self) -> CompiledStateGraph:
+    def _build_graph(self, checkpointer: Optional[BaseCheckpointSaver] = None) -> CompiledStateGraph:
         """Build the LangGraph StateGraph workflow"""
         
         # Create the graph
@@ -37,38 +77,87 @@ class RealEstateLeadGenGraph:
         # Add nodes (agents)
         workflow.add_node("intent", self._intent_node)
         workflow.add_node("search", self._search_node)
+        workflow.add_node("dedup", self._dedup_node)
         workflow.add_node("filter", self._filter_node)
+        workflow.add_node("changes", self._change_detection_node)
         workflow.add_node("enrichment", self._enrichment_node)
         workflow.add_node("scoring", self._scoring_node)
+        workflow.add_node("carry_forward", self._carry_forward_node)
         workflow.add_node("human_review", self._human_review_node)
         workflow.add_node("formatter", self._formatter_node)
         
         # Define the workflow edges
         workflow.add_edge(START, "intent")
         workflow.add_edge("intent", "search")
-        workflow.add_edge("search", "filter")
-        workflow.add_edge("filter", "enrichment")
+        workflow.add_edge("search", "dedup")
+        workflow.add_edge("dedup", "filter")
+        workflow.add_edge("filter", "changes")
+        workflow.add_edge("changes", "enrichment")
         workflow.add_edge("enrichment", "scoring")
-        workflow.add_edge("scoring", "human_review")
+        workflow.add_edge("scoring", "carry_forward")
+        workflow.add_edge("carry_forward", "human_review")
         workflow.add_edge("human_review", "formatter")
         workflow.add_edge("formatter", END)
         
         # Compile the graph
-        return workflow.compile()
+        return workflow.compile(checkpointer=checkpointer)
     
-    async def run_workflow(self, user_query: str, config: Dict[str, Any] = None) -> Dict[str, Any]:
-        """Run the complete lead generation workflow"""
+    async def run_workflow(self,
+                           user_query: str,
+                           config: Dict[str, Any] = None,
+                           refresh: bool = False,
+                           incremental: bool = False,
+                           run_id: Optional[str] = None) -> Dict[str, Any]:
+        """Run the complete lead generation workflow (refresh bypasses stage caches, incremental reuses unchanged leads)"""
+        
+        run_id = run_id or new_run_id()
         
         print("🏡 Starting Real Estate Lead Generation Workflow...")
         print(f"📝 Query: {user_query}")
+        if self.checkpoint_path:
+            print(f"💾 Run ID: {run_id} (resume with resume_workflow if interrupted)")
         print("=" * 60)
         
         # Initialize state
-        initial_state = AgentState(user_query=user_query)
+        initial_state = AgentState(
+            user_query=user_query,
+            metadata={"force_refresh": refresh, "incremental": incremental, "run_id": run_id}
+        )
+        
+        return await self._invoke(initial_state, run_id, config)
+    
+    async def resume_workflow(self, run_id: str, config: Dict[str, Any] = None) -> Dict[str, Any]:
+        """Continue an interrupted run from its last checkpoint"""
+        
+        print(f"⏯️ Resuming Real Estate Lead Generation Workflow {run_id}...")
+        print("=" * 60)
+        
+        # No input: LangGraph continues from the run's latest checkpoint
+        return await self._invoke(None, run_id, config)
+    
+    async def _invoke(self, initial_state: Optional[AgentState], run_id: str, config: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+        """Run the graph for a new (initial_state) or resumed (None) run, checkpointing under the run id"""
+        config = config or {}
         
         try:
             # Run the workflow
-            final_state = await self.graph.ainvoke(initial_state, config=config or {})
+            if self.checkpoint_path:
+                run_config = {**config, "configurable": {**config.get("configurable", {}), "thread_id": run_id}}
+                async with open_checkpointer(self.checkpoint_path) as checkpointer:
+                    graph = self._build_graph(checkpointer)
+                    if initial_state is None:
+                        checkpoint = await graph.aget_state(run_config)
+                        if not checkpoint.values:
+                            raise ValueError(f"No checkpoint found for run {run_id}")
+                        print(f"   ⏯️ Continuing at: {', '.join(checkpoint.next) or 'already complete'}")
+                    final_state = await graph.ainvoke(initial_state, config=run_config)
+                
+                # Per-lead progress is only needed until the stage's node checkpoint exists
+                self.stage_checkpoints.clear(run_id)
+            else:
+                if initial_state is None:
+                    raise ValueError("Checkpointing is disabled, so runs cannot be resumed")
+                final_state = await self.graph.ainvoke(initial_state, config=config)
             
             # Ensure final_leads is set
             if not hasattr(final_state, 'final_leads') or final_state.final_leads is None:
@@ -81,20 +170,105 @@ class RealEstateLeadGenGraph:
             print("=" * 60)
             print("🎉 Workflow Complete!")
             
-            # Get final leads handling both state types
-            final_leads = final_state.final_leads if hasattr(final_state, 'final_leads') else final_state.get('final_leads', [])
-            output_file = final_state.output_file if hasattr(final_state, 'output_file') else final_state.get('output_file')
-            errors = final_state.errors if hasattr(final_state, 'errors') else final_state.get('errors', [])
-            metadata = final_state.metadata if hasattr(final_state, 'metadata') else final_state.get('metadata', {})
+            return {**self._workflow_result(final_state), "run_id": run_id}
             
+        except Exception as e:
+            print(f"❌ Workflow failed: {str(e)}")
             return {
-                "success": True,
-                "leads": [lead.dict() for lead in (final_leads or [])],
-                "total_leads": len(final_leads or []),
-                "output_file": output_file,
-                "errors": errors,
-                "metadata": metadata
+                "success": False,
+                "error": str(e),
+                "leads": [],
+                "total_leads": 0,
+                "run_id": run_id
+            }
+    
+    async def stream_leads(self, user_query: str, state: Optional[AgentState] = None) -> AsyncIterator[Lead]:
+        """Run intent analysis, then yield scored leads as the streaming pipeline produces them"""
+        state = state or AgentState(user_query=user_query)
+        
+        state = await self._intent_node(state)
+        if not state.search_criteria:
+            return
+        
+        print("⚡ Steps 2-5: Streaming search → filter → enrichment → scoring...")
+        async for lead in self.streaming_pipeline.stream(state):
+            print(f"   📊 Scored {lead.address}: {lead.score or 0:.1f}")
+            yield lead
+    
+    async def run_streaming_workflow(self, user_query: str) -> Dict[str, Any]:
+        """Run the workflow with overlapping streaming stages instead of barriers"""
+        
+        print("🏡 Starting Real Estate Lead Generation Workflow (streaming)...")
+        print(f"📝 Query: {user_query}")
+        print("=" * 60)
+        
+        state = AgentState(user_query=user_query)
+        
+        try:
+            async for _ in self.stream_leads(user_query, state):
+                pass
+            
+            # Leads arrive in completion order; review and export expect them ranked
+            state.scored_leads.sort(key=lambda x: x.score or 0, reverse=True)
+            state.current_step = "human_review"
+            
+            state = await self._human_review_node(state)
+            state = await self._formatter_node(state)
+            
+            print("=" * 60)
+            print("🎉 Workflow Complete!")
+            
+            return self._workflow_result(state)
+            
+        except Exception as e:
+            print(f"❌ Workflow failed: {str(e)}")
+            return {
+                "success": False,
+                "error": str(e),
+                "leads": [],
+                "total_leads": 0
             }
+    
+    async def run_metro_scan(self,
+                             user_query: str,
+                             zip_codes: Optional[List[str]] = None,
+                             max_workers: Optional[int] = None) -> Dict[str, Any]:
+        """Scan a whole metro or state: search and filter run per ZIP shard in worker processes"""
+        
+        print("🏡 Starting Real Estate Lead Generation Workflow (metro scan)...")
+        print(f"📝 Query: {user_query}")
+        print("=" * 60)
+        
+        state = AgentState(user_query=user_query)
+        
+        try:
+            state = await self._intent_node(state)
+            if not state.search_criteria:
+                raise ValueError("No search criteria provided")
+            
+            print("🗺️  Steps 2-3: Sharded search and filtering...")
+            scanner = MetroScanner(
+                max_workers=max_workers,
+                filter_engine=self.filter_agent.engine,
+                top_k=self.filter_agent.top_k,
+                deduplicator=self.dedup_agent.deduplicator
+            )
+            state.filtered_listings, scan_report = await scanner.scan(state.search_criteria, zip_codes)
+            state.metadata["metro_scan"] = scan_report
+            for shard_report in scan_report["shard_reports"]:
+                state.errors.extend(f"{shard_report.get('shard_id', 'shard')}: {error}" for error in shard_report.get("errors", []))
+            if not state.filtered_listings:
+                raise ValueError("No listings found in any shard")
+            
+            state = await self._enrichment_node(state)
+            state = await self._scoring_node(state)
+            state = await self._human_review_node(state)
+            state = await self._formatter_node(state)
+            
+            print("=" * 60)
+            print("🎉 Workflow Complete!")
+            
+            return self._workflow_result(state)
             
         except Exception as e:
             print(f"❌ Workflow failed: {str(e)}")
@@ -105,6 +279,25 @@ class RealEstateLeadGenGraph:
                 "total_leads": 0
             }
     
+    def _workflow_result(self, final_state) -> Dict[str, Any]:
+        """Build the workflow result dict from a final state"""
+        # Get final leads handling both state types
+        final_leads = final_state.final_leads if hasattr(final_state, 'final_leads') else final_state.get('final_leads', [])
+        output_file = final_state.output_file if hasattr(final_state, 'output_file') else final_state.get('output_file')
+        errors = final_state.errors if hasattr(final_state, 'errors') else final_state.get('errors', [])
+        metadata = final_state.metadata if hasattr(final_state, 'metadata') else final_state.get('metadata', {})
+        change_events = final_state.change_events if hasattr(final_state, 'change_events') else final_state.get('change_events', [])
+        
+        return {
+            "success": True,
+            "leads": [lead.dict() for lead in (final_leads or [])],
+            "total_leads": len(final_leads or []),
+            "output_file": output_file,
+            "errors": errors,
+            "metadata": metadata,
+            "change_events": change_events
+        }
+    
     async def _intent_node(self, state: AgentState) -> AgentState:
         """Intent analysis node"""
         print("🎯 Step 1: Analyzing Intent...")
@@ -113,33 +306,136 @@ class RealEstateLeadGenGraph:
     async def _search_node(self, state: AgentState) -> AgentState:
         """Property search node"""
         print("🔍 Step 2: Searching Properties...")
-        return await self.search_agent.process(state)
+        if not self.stage_cache or not state.search_criteria:
+            return await self.search_agent.process(state)
+        
+        key = self.stage_cache.search_key(state.search_criteria)
+        cached = self._get_cached_stage(state, "search", key)
+        if cached is not None:
+            state.raw_listings = cached
+            state.current_step = "filter"
+            print(f"   ♻️ Reusing {len(cached)} cached listings")
+            return state
+        
+        errors_before = len(state.errors)
+        state = await self.search_agent.process(state)
+        if len(state.errors) == errors_before:
+            self.stage_cache.set_listings("search", key, state.raw_listings)
+        return state
+    
+    async def _dedup_node(self, state: AgentState) -> AgentState:
+        """Fuzzy cross-source deduplication node"""
+        print("🧬 Step 2b: Merging Duplicate Listings...")
+        return await self.dedup_agent.process(state)
     
     async def _filter_node(self, state: AgentState) -> AgentState:
         """Filtering node"""
         print("🎯 Step 3: Filtering Results...")
-        return await self.filter_agent.process(state)
+        if not self.stage_cache or not state.search_criteria:
+            return await self.filter_agent.process(state)
+        
+        key = self.stage_cache.filter_key(state.search_criteria, state.raw_listings, self.filter_agent.top_k)
+        cached = self._get_cached_stage(state, "filter", key)
+        if cached is not None:
+            state.filtered_listings = cached
+            state.current_step = "enrichment"
+            print(f"   ♻️ Reusing {len(cached)} cached filtered listings")
+            return state
+        
+        errors_before = len(state.errors)
+        state = await self.filter_agent.process(state)
+        if len(state.errors) == errors_before:
+            self.stage_cache.set_listings("filter", key, state.filtered_listings)
+        return state
+    
+    async def _change_detection_node(self, state: AgentState) -> AgentState:
+        """Change detection node (incremental rescans only)"""
+        if not state.metadata.get("incremental"):
+            return state
+        
+        print("🔁 Step 3b: Detecting Changes Since Last Scan...")
+        return await self.change_agent.process(state)
     
     async def _enrichment_node(self, state: AgentState) -> AgentState:
         """Lead enrichment node"""
         print("📞 Step 4: Enriching Contact Data...")
-        return await self.enrichment_agent.process(state)
+        if self._nothing_changed(state, state.filtered_listings):
+            return state
+        if not self.stage_cache:
+            return await self.enrichment_agent.process(state)
+        
+        key = self.stage_cache.enrichment_key(state.filtered_listings, self.enrichment_agent.approval_threshold)
+        cached = self._get_cached_stage(state, "enrichment", key)
+        if cached is not None:
+            state.enriched_leads = cached
+            state.current_step = "scoring"
+            print(f"   ♻️ Reusing {len(cached)} cached enriched leads")
+            return state
+        
+        errors_before = len(state.errors)
+        state = await self.enrichment_agent.process(state)
+        if len(state.errors) == errors_before:
+            self.stage_cache.set_leads(key, state.enriched_leads)
+        return state
+    
+    def _get_cached_stage(self, state: AgentState, stage: str, key: str) -> Optional[Any]:
+        """Look up a stage result unless a refresh or incremental rescan was requested, recording the outcome"""
+        stage_status = state.metadata.setdefault("stage_cache", {})
+        
+        if state.metadata.get("force_refresh"):
+            stage_status[stage] = "refresh"
+            return None
+        
+        # A rescan must see the current listings, not a cached search from up to an hour ago
+        if state.metadata.get("incremental"):
+            stage_status[stage] = "incremental"
+            return None
+        
+        try:
+            if stage == "enrichment":
+                cached = self.stage_cache.get_leads(key)
+            else:
+                cached = self.stage_cache.get_listings(stage, key)
+        except Exception as e:
+            print(f"   ⚠️ Stage cache lookup failed: {str(e)}")
+            cached = None
+        
+        stage_status[stage] = "hit" if cached is not None else "miss"
+        return cached
     
     async def _scoring_node(self, state: AgentState) -> AgentState:
         """Lead scoring node"""
         print("📊 Step 5: Scoring Leads...")
+        if self._nothing_changed(state, state.enriched_leads):
+            return state
         return await self.scoring_agent.process(state)
     
+    async def _carry_forward_node(self, state: AgentState) -> AgentState:
+        """Merge unchanged leads from the last scan back in (incremental rescans only)"""
+        if not state.metadata.get("incremental") or "changes" not in state.metadata:
+            return state
+        
+        print("♻️ Step 5b: Carrying Forward Unchanged Leads...")
+        return await self.change_agent.carry_forward(state)
+    
+    def _nothing_changed(self, state: AgentState, items: List[Any]) -> bool:
+        """True when an incremental rescan has nothing new for a stage to process"""
+        if state.metadata.get("incremental") and "changes" in state.metadata and not items:
+            print("   ⏭️ Nothing changed since the last scan")
+            return True
+        return False
+    
     async def _human_review_node(self, state: AgentState) -> AgentState:
         """Human review node - will be bypassed in CLI mode"""
         print("👤 Step 6: Human Review...")
         
-        # For now, auto-approve all leads with score >= 50
+        # For now, auto-approve all leads with score >= auto_approve_score
         # In the UI version, this will wait for human input
         approved_leads = []
+        threshold = self.config.auto_approve_score
         
         for lead in state.scored_leads:
-            if (lead.score or 0) >= 50:
+            if (lead.score or 0) >= threshold:
                 lead.human_reviewed = True
                 lead.human_approved = True
                 lead.status = "approved"
@@ -152,7 +448,7 @@ class RealEstateLeadGenGraph:
         state.human_reviewed_leads = approved_leads
         state.current_step = "formatter"
         
-        print(f"   ✅ Auto-approved {len(approved_leads)} leads with score >= 50")
+        print(f"   ✅ Auto-approved {len(approved_leads)} leads with score >= {threshold}")
         
         return state
     
@@ -172,12 +468,18 @@ START
   ↓
 🔍 Search Agent (Find properties)
   ↓
+🧬 Dedup Agent (Merge cross-source duplicates)
+  ↓
 🎯 Filter Agent (Apply criteria)
   ↓
+🔁 Change Detection (Incremental rescans: skip unchanged listings)
+  ↓
 📞 Enrichment Agent (Get contact info)
   ↓
 📊 Scoring Agent (Score lead quality)
   ↓
+♻️ Carry Forward (Incremental rescans: reuse unchanged leads)
+  ↓
 👤 Human Review (Quality control)
   ↓
 📁 Formatter Agent (Export results)
@@ -186,7 +488,13 @@ END
 """
 
 # Utility function for standalone testing
-async def run_lead_generation(query: str) -> Dict[str, Any]:
+async def run_lead_generation(query: str,
+                              streaming: bool = False,
+                              refresh: bool = False,
+                              config: Optional[WorkflowConfig] = None,
+                              incremental: bool = False) -> Dict[str, Any]:
     """Standalone function to run lead generation"""
-    graph = RealEstateLeadGenGraph()
-    return await graph.run_workflow(query)
+    graph = RealEstateLeadGenGraph(config=config)
+    if streaming:
+        return await graph.run_streaming_workflow(query)
+    return await graph.run_workflow(query, refresh=refresh, incremental=incremental)
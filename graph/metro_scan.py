@@ -0,0 +1,129 @@
+"""
+Geo-sharded metro and state scanning
+
+A large location is split into ZIP shards (see utils/geo_shards.py); search and
+filter run for each shard in a pool of worker processes, each with its own event
+loop, and the shard results are merged with a global dedup and top-K selection.
+"""
+
+import asyncio
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, List, Optional, Tuple
+from utils.models import AgentState, SearchCriteria
+from utils.geo_shards import plan_shards
+from utils.fuzzy_dedup import FuzzyDeduplicator
+from agents.search_agent import SearchAgent
+from agents.filter_agent import FilterAgent
+
+def scan_shard(shard: Dict[str, Any], criteria_data: Dict[str, Any], filter_engine: str, top_k: Optional[int]) -> Dict[str, Any]:
+    """Worker process entry point: search and filter one shard in a fresh event loop"""
+    return asyncio.run(_scan_shard(shard, criteria_data, filter_engine, top_k))
+
+async def _scan_shard(shard: Dict[str, Any], criteria_data: Dict[str, Any], filter_engine: str, top_k: Optional[int]) -> Dict[str, Any]:
+    """Search and filter one shard"""
+    started = time.perf_counter()
+    # State shards cover every city in the state, so the location only constrains the state
+    criteria = SearchCriteria(**{**criteria_data, "zip_codes": shard["zip_codes"], "whole_state": shard["kind"] == "zip3"})
+    state = AgentState(user_query=f"shard {shard['shard_id']}", search_criteria=criteria)
+    
+    state = await SearchAgent().process(state)
+    raw_count = len(state.raw_listings)
+    if state.raw_listings:
+        # A shard's own top K is enough, since the global top K is drawn from them
+        state = await FilterAgent(engine=filter_engine, top_k=top_k).process(state)
+    
+    return {
+        "shard_id": shard["shard_id"],
+        "zip_codes": shard["zip_codes"],
+        "listings": state.filtered_listings,
+        "completed": True,
+        "raw_listings": raw_count,
+        "filtered_listings": len(state.filtered_listings),
+        "errors": state.errors,
+        "elapsed_seconds": round(time.perf_counter() - started, 3),
+        "worker_pid": os.getpid()
+    }
+
+class MetroScanner:
+    """Plans shards for a large location and scans them across worker processes"""
+    
+    def __init__(self,
+                 max_workers: Optional[int] = None,
+                 zips_per_shard: int = 1,
+                 filter_engine: str = "fused",
+                 top_k: Optional[int] = None,
+                 deduplicator: Optional[FuzzyDeduplicator] = None):
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self.zips_per_shard = zips_per_shard
+        self.filter_engine = filter_engine
+        self.top_k = top_k
+        self.deduplicator = deduplicator or FuzzyDeduplicator()
+        # Ranks merged listings with the same heap-based top-K as the filter stage
+        self.ranker = FilterAgent(top_k=top_k)
+    
+    async def scan(self,
+                   criteria: SearchCriteria,
+                   zip_codes: Optional[List[str]] = None) -> Tuple[List[Dict[str, Any]], Dict[str, Any]]:
+        """Search and filter every shard, returning the merged top listings and a per-shard report"""
+        started = time.perf_counter()
+        shards = plan_shards(criteria.location, zip_codes or criteria.zip_codes, self.zips_per_shard)
+        worker_count = min(self.max_workers, len(shards))
+        criteria_data = criteria.dict()
+        
+        print(f"🗺️  Scanning {criteria.location}: {len(shards)} shards on {worker_count} worker processes")
+        
+        loop = asyncio.get_running_loop()
+        shard_reports = []
+        all_listings = []
+        
+        # Spawned workers start clean instead of inheriting this process's event loop and threads
+        with ProcessPoolExecutor(max_workers=worker_count, mp_context=multiprocessing.get_context("spawn")) as pool:
+            futures = {
+                loop.run_in_executor(pool, scan_shard, shard, criteria_data, self.filter_engine, self.top_k): shard
+                for shard in shards
+            }
+            pending = set(futures)
+            
+            # Report each shard as soon as its worker finishes
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for future in done:
+                    shard = futures[future]
+                    scope = ", ".join(shard["zip_codes"]) or criteria.location
+                    progress = f"Shard {len(shard_reports) + 1}/{len(shards)} ({scope})"
+                    
+                    try:
+                        result = future.result()
+                    except Exception as e:
+                        shard_reports.append({"shard_id": shard["shard_id"], "zip_codes": shard["zip_codes"], "completed": False, "errors": [str(e)]})
+                        print(f"   ⚠️ {progress} failed: {str(e)}")
+                        continue
+                    
+                    all_listings.extend(result.pop("listings"))
+                    shard_reports.append(result)
+                    print(f"   📦 {progress}: {result['raw_listings']} raw → {result['filtered_listings']} kept "
+                          f"in {result['elapsed_seconds']}s")
+        
+        merged_listings, dedup_stats = self.deduplicator.run(all_listings)
+        dedup_stats.pop("decisions")
+        top_listings = self.ranker.select_top(merged_listings)
+        
+        report = {
+            "shards": len(shards),
+            "workers": worker_count,
+            "failed_shards": sum(1 for shard_report in shard_reports if not shard_report.get("completed")),
+            "shard_listings": len(all_listings),
+            "dedup": dedup_stats,
+            "top_k": self.top_k,
+            "listings": len(top_listings),
+            "elapsed_seconds": round(time.perf_counter() - started, 3),
+            "shard_reports": sorted(shard_reports, key=lambda shard_report: shard_report.get("shard_id", ""))
+        }
+        
+        print(f"✅ Metro scan complete: {len(all_listings)} shard listings → {len(top_listings)} after dedup and top-K "
+              f"({report['elapsed_seconds']}s)")
+        
+        return top_listings, report
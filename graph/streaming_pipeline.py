@@ -0,0 +1,176 @@
+"""
+Streaming execution mode for the lead generation pipeline
+
+Listings flow through search, dedup, filter, enrichment and scoring as soon as
+they are available, with bounded queues between stages, so the first scored leads
+are produced while slower sources are still returning.
+"""
+
+import asyncio
+import time
+from typing import Any, AsyncIterator, Awaitable, Callable, Optional
+from utils.models import AgentState, Lead
+from agents.search_agent import SearchAgent
+from agents.dedup_agent import DedupAgent
+from agents.filter_agent import FilterAgent
+from agents.enrichment_agent import EnrichmentAgent
+from agents.scoring_agent import ScoringAgent
+from utils.fuzzy_dedup import StreamingDeduplicator
+
+# Marker placed on a queue when the upstream stage has finished
+_DONE = object()
+
+class StreamingLeadPipeline:
+    """Runs search, dedup, filter, enrichment and scoring as overlapping streaming stages"""
+    
+    def __init__(self,
+                 search_agent: SearchAgent,
+                 filter_agent: FilterAgent,
+                 enrichment_agent: EnrichmentAgent,
+                 scoring_agent: ScoringAgent,
+                 dedup_agent: Optional[DedupAgent] = None,
+                 queue_size: int = 20,
+                 enrichment_workers: int = 5,
+                 scoring_workers: int = 3):
+        self.search_agent = search_agent
+        self.filter_agent = filter_agent
+        self.enrichment_agent = enrichment_agent
+        self.scoring_agent = scoring_agent
+        self.dedup_agent = dedup_agent or DedupAgent()
+        
+        self.queue_size = queue_size
+        self.enrichment_workers = enrichment_workers
+        self.scoring_workers = scoring_workers
+    
+    async def stream(self, state: AgentState) -> AsyncIterator[Lead]:
+        """Yield scored leads as they come out of the pipeline, recording progress on the state"""
+        if not state.search_criteria:
+            raise ValueError("No search criteria provided")
+        
+        criteria = state.search_criteria
+        started = time.perf_counter()
+        search_stats = {}
+        stream_stats = {
+            "queue_size": self.queue_size,
+            "enrichment_workers": self.enrichment_workers,
+            "scoring_workers": self.scoring_workers,
+            "top_k": self.filter_agent.top_k,
+            "dropped_over_limit": 0,
+            "heuristic_scored": 0,
+            "time_to_first_lead": None
+        }
+        state.metadata["search"] = search_stats
+        state.metadata["streaming"] = stream_stats
+        self.enrichment_agent.reset_gate_stats()
+        
+        # Duplicates of a listing already sent downstream are dropped, since it may be enriched by now
+        deduplicator = StreamingDeduplicator(self.dedup_agent.deduplicator)
+        stream_stats["dedup"] = deduplicator.stats
+        
+        listings_queue = asyncio.Queue(maxsize=self.queue_size)
+        unique_queue = asyncio.Queue(maxsize=self.queue_size)
+        filtered_queue = asyncio.Queue(maxsize=self.queue_size)
+        enriched_queue = asyncio.Queue(maxsize=self.queue_size)
+        scored_queue = asyncio.Queue(maxsize=self.queue_size)
+        
+        async def search_stage():
+            try:
+                async for listing in self.search_agent.stream_listings(criteria, search_stats):
+                    state.raw_listings.append(listing)
+                    await listings_queue.put(listing)
+            finally:
+                await listings_queue.put(_DONE)
+        
+        async def dedup_listing(listing):
+            if deduplicator.add(listing) is not None:
+                return None
+            return listing
+        
+        async def filter_listing(listing):
+            filtered = self.filter_agent.filter_listing(listing, criteria)
+            if filtered is None:
+                return None
+            
+            # Without the full result set there is no global ranking, so the first K matches are admitted
+            top_k = self.filter_agent.top_k
+            if top_k and len(state.filtered_listings) >= top_k:
+                stream_stats["dropped_over_limit"] += 1
+                return None
+            
+            state.filtered_listings.append(filtered)
+            return filtered
+        
+        async def enrich_listing(listing):
+            lead = await self.enrichment_agent.enrich_listing(listing)
+            self.enrichment_agent.value_leads([lead])
+            state.enriched_leads.append(lead)
+            return lead
+        
+        async def score_lead(lead):
+            # Same cascade as batch scoring; a single lead has no ranking, so only the uncertainty band goes to the LLM
+            scored = (await self.scoring_agent.score_leads([lead], criteria.lead_type))[0]
+            if scored.metadata.get("scoring_tier") == "heuristic":
+                stream_stats["heuristic_scored"] += 1
+            state.scored_leads.append(scored)
+            return scored
+        
+        tasks = [
+            asyncio.create_task(search_stage()),
+            asyncio.create_task(self._run_stage("Dedup", state, dedup_listing, listings_queue, unique_queue, 1)),
+            asyncio.create_task(self._run_stage("Filter", state, filter_listing, unique_queue, filtered_queue, 1)),
+            asyncio.create_task(self._run_stage("Enrichment", state, enrich_listing, filtered_queue, enriched_queue, self.enrichment_workers)),
+            asyncio.create_task(self._run_stage("Scoring", state, score_lead, enriched_queue, scored_queue, self.scoring_workers))
+        ]
+        
+        try:
+            while True:
+                lead = await scored_queue.get()
+                if lead is _DONE:
+                    break
+                
+                if stream_stats["time_to_first_lead"] is None:
+                    stream_stats["time_to_first_lead"] = round(time.perf_counter() - started, 3)
+                    print(f"   ⚡ First scored lead after {stream_stats['time_to_first_lead']}s")
+                
+                yield lead
+            
+            # Surface any stage failure that ended the stream early
+            await asyncio.gather(*tasks)
+        finally:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            stream_stats["elapsed_seconds"] = round(time.perf_counter() - started, 3)
+            stream_stats["enrichment_gating"] = self.enrichment_agent.get_gate_stats()
+    
+    async def _run_stage(self,
+                         stage_name: str,
+                         state: AgentState,
+                         handler: Callable[[Any], Awaitable[Optional[Any]]],
+                         inbox: asyncio.Queue,
+                         outbox: asyncio.Queue,
+                         worker_count: int):
+        """Run a pool of workers between two queues and signal completion downstream"""
+        
+        async def worker():
+            while True:
+                item = await inbox.get()
+                if item is _DONE:
+                    # Nothing follows the marker, so putting it back never blocks
+                    # and lets sibling workers see the end of the stream too
+                    await inbox.put(_DONE)
+                    return
+                
+                try:
+                    result = await handler(item)
+                except Exception as e:
+                    error_msg = f"Streaming {stage_name} error: {str(e)}"
+                    state.errors.append(error_msg)
+                    print(f"     ⚠️ {error_msg}")
+                    continue
+                
+                if result is not None:
+                    await outbox.put(result)
+        
+        await asyncio.gather(*(worker() for _ in range(worker_count)))
+        await outbox.put(_DONE)
@@ -18,6 +18,7 @@ sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from graph.leadgen_graph import RealEstateLeadGenGraph
 from utils.models import Lead, AgentState
+from utils.spatial import SpatialIndex, city_centroid
 
 # Configure Streamlit page
 st.set_page_config(
@@ -329,6 +330,32 @@ class StreamlitHITLInterface:
                 notes = st.text_input("Notes:", key=f"notes_{lead_key}", placeholder="Add notes about this lead...")
                 if notes:
                     lead['notes'] = notes
+            
+            # Nearby leads for territory routing
+            if lead.get('latitude') is not None and lead.get('longitude') is not None:
+                radius = st.number_input("📍 Nearby leads within (miles):", min_value=0.5, max_value=50.0,
+                                         value=5.0, step=0.5, key=f"radius_{lead_key}")
+                nearby = self._nearby_leads(lead, radius)
+                if nearby:
+                    st.dataframe(pd.DataFrame([
+                        {"Address": other.get('address'), "Miles": distance, "Score": round(other.get('score', 0), 1), "Status": other.get('status')}
+                        for other, distance in nearby
+                    ]), hide_index=True)
+                else:
+                    st.caption(f"No other leads within {radius} miles")
+    
+    def _nearby_leads(self, lead: Dict[str, Any], miles: float) -> List[Any]:
+        """Other leads within a radius of a lead, nearest first"""
+        leads = st.session_state.leads_data
+        
+        # Rebuild the spatial index only when the lead set changes
+        signature = (id(leads), len(leads))
+        if st.session_state.get('lead_index_signature') != signature:
+            st.session_state.lead_index = SpatialIndex.from_records(leads)
+            st.session_state.lead_index_signature = signature
+        
+        matches = st.session_state.lead_index.query_radius(lead['latitude'], lead['longitude'], miles)
+        return [(leads[row], distance) for row, distance in matches if leads[row] is not lead]
     
     def _render_review_summary(self):
         """Render review summary and analytics"""
@@ -446,12 +473,14 @@ class StreamlitHITLInterface:
         import random
         
         mock_leads = []
+        city = criteria.get("location", "Phoenix").split(",")[0]
+        center_latitude, center_longitude = city_centroid(city, "AZ")
         
         for i in range(random.randint(15, 30)):
             lead = {
                 "id": f"lead_{i+1:03d}",
                 "address": f"{random.randint(100, 9999)} {random.choice(['Main', 'Oak', 'Pine', 'Elm'])} {random.choice(['St', 'Ave', 'Dr'])}",
-                "city": criteria.get("location", "Phoenix").split(",")[0],
+                "city": city,
                 "state": "AZ",
                 "zip_code": f"{random.randint(85000, 85999)}",
                 "property_type": random.choice(criteria.get("property_types", ["single-family"])),
@@ -466,6 +495,8 @@ class StreamlitHITLInterface:
                 "score": random.uniform(20, 95),
                 "motivation_indicators": random.sample(criteria.get("motivation_signals", []), k=random.randint(0, 2)),
                 "source": random.choice(["zillow", "mls", "fsbo"]),
+                "latitude": round(center_latitude + random.uniform(-0.15, 0.15), 6),
+                "longitude": round(center_longitude + random.uniform(-0.15, 0.15), 6),
                 "human_reviewed": False,
                 "human_approved": False,
                 "status": "new"
@@ -78,6 +78,376 @@ async def test_individual_agents():
     except Exception as e:
         print(f"   ❌ Intent Agent test failed: {str(e)}")
 
+def test_scoring_scheduler():
+    """Test concurrent scoring against a local fake chat model with rate limits"""
+    
+    print("\n🧪 Testing Scoring Scheduler")
+    print("=" * 30)
+    
+    from agents.scoring_agent import ScoringAgent
+    from fake_llm import FakeChatModel
+    from utils.models import AgentState, Lead, SearchCriteria
+    
+    # Fake model allows 8 requests per second and answers in 50-150ms
+    fake_llm = FakeChatModel(latency=(0.05, 0.15), max_requests_per_window=8, window_seconds=1.0)
+    scoring_agent = ScoringAgent(llm=fake_llm, max_concurrent=10, cache_scores=False)
+    scoring_agent.scheduler.base_backoff = 0.2
+    
+    leads = [
+        Lead(
+            id=f"lead_{i:03d}",
+            address=f"{100 + i} Main St",
+            city="Phoenix",
+            state="AZ",
+            zip_code="85001",
+            property_type="duplex",
+            price=300000 + i * 1000,
+            owner_phone="(602) 555-0100" if i % 2 == 0 else None,
+            motivation_indicators=["price_reduction"],
+            source="zillow"
+        )
+        for i in range(24)
+    ]
+    state = AgentState(
+        user_query="Find duplexes in Phoenix, AZ",
+        search_criteria=SearchCriteria(location="Phoenix, AZ"),
+        enriched_leads=leads
+    )
+    
+    result_state = asyncio.run(scoring_agent.process(state))
+    scheduler_stats = result_state.metadata["scoring"]["scheduler"]
+    
+    assert len(result_state.scored_leads) == len(leads)
+    assert all(lead.score is not None for lead in result_state.scored_leads)
+    assert fake_llm.stats["max_in_flight"] > 1, "Scoring should run concurrently"
+    assert fake_llm.stats["rate_limited"] > 0, "Fake model should have returned 429s"
+    assert scheduler_stats["succeeded"] == len(leads), "Every 429 should be retried to success"
+    
+    print(f"   ✅ Scored {len(result_state.scored_leads)} leads "
+          f"(peak concurrency {fake_llm.stats['max_in_flight']}, "
+          f"{scheduler_stats['rate_limited']} rate limits retried)")
+
+def test_batched_scoring():
+    """Test multi-lead batched scoring against the local fake chat model"""
+    
+    print("\n🧪 Testing Batched Scoring")
+    print("=" * 30)
+    
+    from agents.scoring_agent import ScoringAgent
+    from fake_llm import FakeChatModel
+    from utils.models import AgentState, Lead, SearchCriteria
+    
+    fake_llm = FakeChatModel(latency=(0.01, 0.05))
+    scoring_agent = ScoringAgent(llm=fake_llm, batch_size=5, cache_scores=False)
+    
+    leads = [
+        Lead(
+            id=f"lead_{i:03d}",
+            address=f"{200 + i} Oak Ave",
+            city="Phoenix",
+            state="AZ",
+            zip_code="85001",
+            property_type="single-family",
+            price=250000 + i * 1000,
+            source="mls"
+        )
+        for i in range(12)
+    ]
+    state = AgentState(
+        user_query="Find homes in Phoenix, AZ",
+        search_criteria=SearchCriteria(location="Phoenix, AZ"),
+        enriched_leads=leads
+    )
+    
+    result_state = asyncio.run(scoring_agent.process(state))
+    
+    assert len(result_state.scored_leads) == len(leads)
+    assert fake_llm.stats["calls"] == 3, "12 leads in batches of 5 should take 3 requests"
+    assert result_state.metadata["scoring"]["rescored_individually"] == 0
+    
+    print(f"   ✅ Scored {len(leads)} leads with {fake_llm.stats['calls']} requests")
+
+def test_fenced_scoring_responses():
+    """Test that scoring parses LLM replies wrapped in ```json fences"""
+    
+    print("\n🧪 Testing Fenced Scoring Responses")
+    print("=" * 30)
+    
+    from agents.scoring_agent import ScoringAgent, parse_json_response
+    from fake_llm import FakeChatModel
+    from utils.models import AgentState, Lead, SearchCriteria
+    
+    assert parse_json_response('Here you go:\n[{"lead_id": "a"}]\nDone.') == [{"lead_id": "a"}]
+    
+    for batch_size in (1, 2):
+        leads = [
+            Lead(
+                id=f"lead_{i:03d}",
+                address=f"{300 + i} Elm St",
+                city="Phoenix",
+                state="AZ",
+                zip_code="85001",
+                property_type="single-family",
+                price=250000 + i * 1000,
+                source="mls"
+            )
+            for i in range(4)
+        ]
+        fake_llm = FakeChatModel(latency=(0.001, 0.005), fenced=True)
+        scoring_agent = ScoringAgent(llm=fake_llm, batch_size=batch_size, cache_scores=False)
+        state = AgentState(
+            user_query="Find homes in Phoenix, AZ",
+            search_criteria=SearchCriteria(location="Phoenix, AZ"),
+            enriched_leads=leads
+        )
+        
+        result_state = asyncio.run(scoring_agent.process(state))
+        
+        assert len(result_state.scored_leads) == len(leads)
+        assert all(lead.metadata["scoring"].get("contact_score") == 8 for lead in result_state.scored_leads), \
+            "Fenced replies should be parsed rather than falling back to text extraction"
+        assert result_state.metadata["scoring"].get("rescored_individually", 0) == 0
+    
+    print("   ✅ Parsed fenced replies for single and batched scoring")
+
+def test_scoring_cascade():
+    """Test that the scoring cascade only changes approvals of leads it scored heuristically"""
+    
+    print("\n🧪 Testing Scoring Cascade")
+    print("=" * 30)
+    
+    from agents.scoring_agent import ScoringAgent
+    from fake_llm import FakeChatModel
+    from utils.models import AgentState, Lead, SearchCriteria
+    
+    approval_threshold = 50
+    
+    def make_leads():
+        # Strong leads, weak leads and leads near the approval threshold
+        leads = []
+        for i in range(30):
+            kind = i % 3
+            leads.append(Lead(
+                id=f"lead_{i:03d}",
+                address=f"{300 + i} Elm St",
+                city="Phoenix",
+                state="AZ",
+                zip_code="85001",
+                property_type="single-family",
+                price=280000 + i * 1000,
+                bedrooms=3 if kind != 1 else None,
+                bathrooms=2 if kind != 1 else None,
+                square_feet=1600 if kind == 0 else None,
+                year_built=1995 if kind == 0 else None,
+                owner_phone="(602) 555-0100" if kind != 1 else None,
+                owner_email="owner@example.com" if kind == 0 else None,
+                motivation_indicators=["price_reduction", "high_equity", "motivated_seller"] if kind == 0 else [],
+                source="mls" if kind != 1 else "other"
+            ))
+        return leads
+    
+    def run(cascade):
+        fake_llm = FakeChatModel(latency=(0.001, 0.005))
+        scoring_agent = ScoringAgent(llm=fake_llm, cache_scores=False, cascade=cascade)
+        state = AgentState(
+            user_query="Find homes in Phoenix, AZ",
+            search_criteria=SearchCriteria(location="Phoenix, AZ"),
+            enriched_leads=make_leads()
+        )
+        result_state = asyncio.run(scoring_agent.process(state))
+        return {lead.id: lead for lead in result_state.scored_leads}, fake_llm.stats["calls"], scoring_agent.uncertainty_band
+    
+    full_leads, full_calls, _ = run(cascade=False)
+    cascade_leads, cascade_calls, (low, high) = run(cascade=True)
+    
+    assert set(full_leads) == set(cascade_leads)
+    assert cascade_calls < full_calls, "The cascade should skip LLM calls"
+    
+    changed = [
+        lead_id for lead_id in full_leads
+        if (full_leads[lead_id].score >= approval_threshold) != (cascade_leads[lead_id].score >= approval_threshold)
+    ]
+    for lead_id, lead in cascade_leads.items():
+        if lead.metadata.get("scoring_tier") == "heuristic":
+            # Only leads whose heuristic score is well clear of the threshold skip the LLM
+            assert not low <= lead.score <= high
+        else:
+            assert lead.score == full_leads[lead_id].score, "LLM-scored leads should score the same either way"
+    assert all(cascade_leads[lead_id].metadata.get("scoring_tier") == "heuristic" for lead_id in changed)
+    
+    print(f"   ✅ {len(full_leads) - len(changed)}/{len(full_leads)} approvals unchanged "
+          f"with {cascade_calls} instead of {full_calls} LLM calls")
+
+def test_score_upper_bounds():
+    """Test that enrichment gating bounds are never below the heuristic score of the enriched lead"""
+    
+    print("\n🧪 Testing Score Upper Bounds")
+    print("=" * 30)
+    
+    from utils.filter_engines import score_listing_quality
+    from utils.lead_heuristics import heuristic_scores, score_upper_bounds
+    from utils.models import Lead
+    
+    signal_sets = [[], ["price_reduction"], ["motivated_seller", "estate_sale"], ["vacant_property"]]
+    listings = []
+    for i in range(40):
+        listing = {
+            "address": f"{400 + i} Pine St",
+            "city": "Phoenix",
+            "state": "AZ",
+            "zip_code": "85001",
+            "property_type": "single-family",
+            "price": 200000 + i * 5000 if i % 5 else None,
+            "bedrooms": 3 if i % 2 else None,
+            "bathrooms": 2 if i % 3 else None,
+            "square_feet": 1500 if i % 4 else None,
+            "year_built": 1990 if i % 6 else None,
+            "days_on_market": i * 7,
+            "motivation_signals": signal_sets[i % len(signal_sets)],
+            "source": ["mls", "fsbo", "zillow", "craigslist"][i % 4]
+        }
+        # Some listings skip the filter's quality score
+        if i % 7:
+            listing["quality_score"] = score_listing_quality(listing)
+        listings.append(listing)
+    
+    # Many motivation signals lift the quality score above the rubric score
+    listing = {
+        "address": "500 Pine St",
+        "city": "Phoenix",
+        "state": "AZ",
+        "zip_code": "85001",
+        "property_type": "single-family",
+        "price": 250000,
+        "bedrooms": 3,
+        "bathrooms": 2,
+        "square_feet": 1500,
+        "year_built": None,
+        "days_on_market": 120,
+        "motivation_signals": ["divorce_sale", "vacant_property", "job_relocation", "needs_repairs",
+                               "long_time_on_market", "absentee_owner", "tax_delinquent", "code_violation"],
+        "source": "mls"
+    }
+    listing["quality_score"] = score_listing_quality(listing)
+    listings.append(listing)
+    
+    # Leads as enrichment builds them, with both phone and email found
+    leads = [
+        Lead(
+            id=f"lead_{i:03d}",
+            address=listing["address"],
+            city=listing["city"],
+            state=listing["state"],
+            zip_code=listing["zip_code"],
+            property_type=listing["property_type"],
+            price=listing["price"],
+            bedrooms=listing["bedrooms"],
+            bathrooms=listing["bathrooms"],
+            square_feet=listing["square_feet"],
+            year_built=listing["year_built"],
+            owner_phone="(602) 555-0100",
+            owner_email="owner@example.com",
+            motivation_indicators=listing["motivation_signals"],
+            source=listing["source"],
+            metadata={"quality_score": listing["quality_score"]} if "quality_score" in listing else {}
+        )
+        for i, listing in enumerate(listings)
+    ]
+    
+    bounds = score_upper_bounds(listings)
+    scores = heuristic_scores(leads)
+    
+    assert (bounds >= scores).all(), "An upper bound fell below the score it should bound"
+    
+    print(f"   ✅ {len(listings)} bounds cover their heuristic scores (largest {scores.max():.1f})")
+
+def test_incremental_rescan():
+    """Test that an incremental rescan sees a listing that changed since the previous one"""
+    
+    print("\n🧪 Testing Incremental Rescans")
+    print("=" * 30)
+    
+    import copy
+    import tempfile
+    from fake_llm import FakeChatModel
+    
+    listings = [
+        {
+            "address": f"{600 + i} Cedar St",
+            "city": "Phoenix",
+            "state": "AZ",
+            "zip_code": "85001",
+            "price": 250000 + i * 5000,
+            "property_type": "single-family",
+            "bedrooms": 3,
+            "bathrooms": 2.0,
+            "square_feet": 1500,
+            "year_built": 1995,
+            "days_on_market": 40,
+            "listing_type": "for_sale",
+            "motivation_signals": ["price_reduction"],
+            "source": "mls"
+        }
+        for i in range(8)
+    ]
+    
+    async def search(state):
+        state.raw_listings = copy.deepcopy(listings)
+        state.current_step = "filter"
+        return state
+    
+    # Caches and snapshots are written under the working directory
+    original_cwd = os.getcwd()
+    with tempfile.TemporaryDirectory() as workdir:
+        os.chdir(workdir)
+        try:
+            # The query takes the rule-based intent path and scoring uses the fake model, so no requests are sent
+            os.environ.setdefault("OPENAI_API_KEY", "test-key")
+            graph = RealEstateLeadGenGraph(checkpoint_path=None)
+            graph.search_agent.process = search
+            graph.scoring_agent.llm = FakeChatModel(latency=(0.001, 0.005))
+            query = "Find single-family homes in Phoenix, AZ under $500K"
+            
+            first = asyncio.run(graph.run_workflow(query, incremental=True))
+            listings[0]["price"] -= 20000
+            second = asyncio.run(graph.run_workflow(query, incremental=True))
+        finally:
+            os.chdir(original_cwd)
+    
+    assert first["success"] and second["success"]
+    assert second["metadata"]["stage_cache"]["search"] == "incremental", "Rescans should not reuse cached search results"
+    events = [event["event"] for event in second["change_events"]]
+    assert events == ["price_drop"], f"Expected one price drop, got {events}"
+    
+    print(f"   ✅ Second rescan reported {events[0]} for {second['change_events'][0]['address']}")
+
+def test_comps_skip_unusable_sales():
+    """Test that comparable-sales valuation ignores sales without a square footage or price"""
+    
+    print("\n🧪 Testing Comparable-Sales Valuation")
+    print("=" * 30)
+    
+    from utils.comps import CompsEngine, SalesTable
+    
+    sale = {"latitude": 33.45, "longitude": -112.07, "square_feet": 1500, "bedrooms": 3,
+            "bathrooms": 2, "year_built": 2000, "sale_price": 300000, "sale_age_days": 30}
+    sales = [{**sale, "latitude": 33.45 + i * 0.001} for i in range(5)]
+    # The closest sales are missing their size or price, or report zero
+    sales.append({**sale, "square_feet": None, "sale_price": 900000, "sale_age_days": 1})
+    sales.append({**sale, "square_feet": 0, "sale_price": 900000, "sale_age_days": 1})
+    sales.append({**sale, "sale_price": None, "sale_age_days": 1})
+    
+    engine = CompsEngine(SalesTable.from_records(sales), mock_sales=False)
+    subject = {"latitude": 33.45, "longitude": -112.07, "square_feet": 1500, "bedrooms": 3,
+               "bathrooms": 2, "year_built": 2000, "city": "Phoenix", "state": "AZ"}
+    estimate = engine.estimate([subject])[0]
+    
+    assert estimate is not None
+    assert estimate["comps"] == 5, "Unusable sales should not count as comps"
+    assert estimate["value"] == 300000 and estimate["price_per_sqft"] == 200.0
+    
+    print(f"   ✅ Valued at ${estimate['value']:,.0f} from {estimate['comps']} usable comps")
+
 def main():
     """Main test function"""
     print("🚀 Starting Real Estate Lead Generation AI Tests\n")
@@ -96,6 +466,13 @@ def main():
     # Run async tests
     asyncio.run(test_workflow())
     asyncio.run(test_individual_agents())
+    test_scoring_scheduler()
+    test_batched_scoring()
+    test_fenced_scoring_responses()
+    test_scoring_cascade()
+    test_score_upper_bounds()
+    test_incremental_rescan()
+    test_comps_skip_unusable_sales()
     
     print("\n🏁 Tests completed!")
     print("\nNext steps:")
@@ -0,0 +1,114 @@
+"""
+Address canonicalization
+Normalizes street suffixes, directionals, units, case, whitespace, states and
+ZIP codes, and derives a stable property key used to recognise the same
+property across sources, caches and runs
+"""
+
+import hashlib
+import re
+from functools import lru_cache
+from typing import Dict
+
+# USPS standard street suffix abbreviations
+STREET_SUFFIXES = {
+    "alley": "aly", "avenue": "ave", "av": "ave", "boulevard": "blvd", "circle": "cir",
+    "court": "ct", "cove": "cv", "crossing": "xing", "drive": "dr", "expressway": "expy",
+    "freeway": "fwy", "highway": "hwy", "lane": "ln", "loop": "loop", "parkway": "pkwy",
+    "place": "pl", "plaza": "plz", "point": "pt", "road": "rd", "square": "sq",
+    "street": "st", "str": "st", "terrace": "ter", "trail": "trl", "way": "way"
+}
+
+DIRECTIONALS = {
+    "north": "n", "south": "s", "east": "e", "west": "w",
+    "northeast": "ne", "northwest": "nw", "southeast": "se", "southwest": "sw"
+}
+
+UNIT_DESIGNATORS = (
+    "apartment", "apt", "unit", "suite", "ste", "building", "bldg",
+    "floor", "fl", "room", "rm", "space", "spc", "lot"
+)
+
+STATE_ABBREVIATIONS = {
+    "alabama": "al", "alaska": "ak", "arizona": "az", "arkansas": "ar", "california": "ca",
+    "colorado": "co", "connecticut": "ct", "delaware": "de", "district of columbia": "dc",
+    "florida": "fl", "georgia": "ga", "hawaii": "hi", "idaho": "id", "illinois": "il",
+    "indiana": "in", "iowa": "ia", "kansas": "ks", "kentucky": "ky", "louisiana": "la",
+    "maine": "me", "maryland": "md", "massachusetts": "ma", "michigan": "mi", "minnesota": "mn",
+    "mississippi": "ms", "missouri": "mo", "montana": "mt", "nebraska": "ne", "nevada": "nv",
+    "new hampshire": "nh", "new jersey": "nj", "new mexico": "nm", "new york": "ny",
+    "north carolina": "nc", "north dakota": "nd", "ohio": "oh", "oklahoma": "ok", "oregon": "or",
+    "pennsylvania": "pa", "rhode island": "ri", "south carolina": "sc", "south dakota": "sd",
+    "tennessee": "tn", "texas": "tx", "utah": "ut", "vermont": "vt", "virginia": "va",
+    "washington": "wa", "west virginia": "wv", "wisconsin": "wi", "wyoming": "wy"
+}
+
+# Trailing unit: "apt 4b", "ste. 200", "unit #3", "# 12", "suite a"; the value must start with
+# a digit or be a single letter so "100 Lot Rd" keeps its street
+_UNIT_PATTERN = re.compile(
+    r'(?:\s|^)(?:(?:' + "|".join(UNIT_DESIGNATORS) + r')\s*#?|#)\s*(\d[a-z0-9-]*|[a-z](?:-?\d[a-z0-9-]*)?)\s*$'
+)
+
+def _clean(value: str) -> str:
+    """Lowercase, turn punctuation (except '#' and '-') into spaces and collapse whitespace"""
+    value = re.sub(r'[^a-z0-9#\-\s]', ' ', str(value or "").lower())
+    return " ".join(value.split())
+
+def parse_address(address: str, city: str = "", state: str = "", zip_code: str = "") -> Dict[str, str]:
+    """Split an address into canonical street, unit, city, state and 5-digit ZIP parts"""
+    street = _clean(address)
+    
+    unit = ""
+    unit_match = _UNIT_PATTERN.search(street)
+    if unit_match:
+        unit = unit_match.group(1).strip("-")
+        street = street[:unit_match.start()].strip()
+    
+    tokens = [
+        DIRECTIONALS.get(token, STREET_SUFFIXES.get(token, token))
+        for token in street.replace("#", " ").split()
+    ]
+    
+    state_name = _clean(state).replace("#", "")
+    zip_match = re.match(r'\d{5}', str(zip_code or "").strip())
+    
+    return {
+        "street": " ".join(tokens),
+        "unit": unit,
+        "city": _clean(city).replace("#", ""),
+        "state": STATE_ABBREVIATIONS.get(state_name, state_name),
+        "zip": zip_match.group(0) if zip_match else ""
+    }
+
+@lru_cache(maxsize=65536)
+def canonical_address(address: str, city: str = "", state: str = "", zip_code: str = "") -> str:
+    """Canonical "street|unit|city|state|zip" string"""
+    parts = parse_address(address, city, state, zip_code)
+    return "|".join([parts["street"], parts["unit"], parts["city"], parts["state"], parts["zip"]])
+
+@lru_cache(maxsize=65536)
+def property_key(address: str, city: str = "", state: str = "", zip_code: str = "") -> str:
+    """Stable identifier for a property, the same for every formatting of its address"""
+    parts = parse_address(address, city, state, zip_code)
+    
+    # Not every source reports a ZIP, so it only stands in for a missing city
+    locality = parts["city"] or parts["zip"]
+    identity = "|".join([parts["street"], parts["unit"], locality, parts["state"]])
+    return hashlib.sha1(identity.encode("utf-8")).hexdigest()[:16]
+
+def listing_property_key(listing: Dict[str, str]) -> str:
+    """Property key for a listing dict"""
+    return property_key(
+        str(listing.get('address') or ""),
+        str(listing.get('city') or ""),
+        str(listing.get('state') or ""),
+        str(listing.get('zip_code') or "")
+    )
+
+def cluster_property_key(listing: Dict[str, str]) -> str:
+    """Property key for a listing and the duplicates merged into it, whichever of them was kept"""
+    # The lowest member key is the same however the merge picked its surviving record
+    member_keys = [key for key in listing.get('merged_property_keys') or [] if key]
+    if member_keys:
+        return min(member_keys)
+    return listing.get('property_key') or listing_property_key(listing)
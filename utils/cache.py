@@ -0,0 +1,143 @@
+"""
+Persistent cache utilities
+SQLite-backed key/value store with per-entry TTL, size-bounded LRU eviction
+and hit/miss counters, shared by the agents that cache paid API results
+"""
+
+import hashlib
+import json
+import os
+import sqlite3
+import time
+from typing import Any, Dict, Optional
+
+DEFAULT_CACHE_PATH = os.getenv("LEADGEN_CACHE_PATH", ".cache/leadgen_cache.sqlite")
+
+def make_cache_key(*parts: Any) -> str:
+    """Stable hash of JSON-serializable parts (dict key order does not matter)"""
+    payload = json.dumps(parts, sort_keys=True, default=str, separators=(",", ":"))
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+class PersistentCache:
+    """SQLite-backed cache namespace with TTL expiry and LRU eviction"""
+    
+    def __init__(self,
+                 namespace: str,
+                 path: str = DEFAULT_CACHE_PATH,
+                 ttl_seconds: Optional[float] = None,
+                 max_entries: Optional[int] = 10000):
+        self.namespace = namespace
+        self.path = path
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        
+        self.hits = 0
+        self.misses = 0
+        self._conn = None
+    
+    def get(self, key: str) -> Optional[Any]:
+        """Return the cached value, or None if missing or expired"""
+        conn = self._connection()
+        now = time.time()
+        
+        row = conn.execute(
+            "SELECT value, expires_at FROM cache_entries WHERE namespace = ? AND key = ?",
+            (self.namespace, key)
+        ).fetchone()
+        
+        if row is None or (row[1] is not None and row[1] <= now):
+            if row is not None:
+                self.delete(key)
+            self.misses += 1
+            return None
+        
+        # Touch the entry so eviction removes least recently used entries first
+        conn.execute(
+            "UPDATE cache_entries SET last_accessed = ? WHERE namespace = ? AND key = ?",
+            (now, self.namespace, key)
+        )
+        self.hits += 1
+        return json.loads(row[0])
+    
+    def set(self, key: str, value: Any, ttl_seconds: Optional[float] = None):
+        """Store a JSON-serializable value, evicting old entries past max_entries"""
+        conn = self._connection()
+        now = time.time()
+        ttl = ttl_seconds if ttl_seconds is not None else self.ttl_seconds
+        expires_at = now + ttl if ttl is not None else None
+        
+        conn.execute(
+            "INSERT OR REPLACE INTO cache_entries (namespace, key, value, created_at, expires_at, last_accessed) "
+            "VALUES (?, ?, ?, ?, ?, ?)",
+            (self.namespace, key, json.dumps(value, default=str), now, expires_at, now)
+        )
+        
+        if self.max_entries:
+            self._evict(now)
+    
+    def delete(self, key: str):
+        """Remove a single entry"""
+        self._connection().execute(
+            "DELETE FROM cache_entries WHERE namespace = ? AND key = ?",
+            (self.namespace, key)
+        )
+    
+    def clear(self):
+        """Remove every entry in this namespace"""
+        self._connection().execute("DELETE FROM cache_entries WHERE namespace = ?", (self.namespace,))
+    
+    def stats(self) -> Dict[str, Any]:
+        """Hit/miss counters for this process plus the stored entry count"""
+        entries = self._connection().execute(
+            "SELECT COUNT(*) FROM cache_entries WHERE namespace = ?", (self.namespace,)
+        ).fetchone()[0]
+        lookups = self.hits + self.misses
+        
+        return {
+            "namespace": self.namespace,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+            "entries": entries
+        }
+    
+    def _evict(self, now: float):
+        """Drop expired entries, then the least recently used ones above max_entries"""
+        conn = self._connection()
+        conn.execute(
+            "DELETE FROM cache_entries WHERE namespace = ? AND expires_at IS NOT NULL AND expires_at <= ?",
+            (self.namespace, now)
+        )
+        
+        count = conn.execute(
+            "SELECT COUNT(*) FROM cache_entries WHERE namespace = ?", (self.namespace,)
+        ).fetchone()[0]
+        overflow = count - self.max_entries
+        
+        if overflow > 0:
+            conn.execute(
+                "DELETE FROM cache_entries WHERE rowid IN ("
+                "SELECT rowid FROM cache_entries WHERE namespace = ? ORDER BY last_accessed ASC LIMIT ?)",
+                (self.namespace, overflow)
+            )
+    
+    def _connection(self) -> sqlite3.Connection:
+        """Open the cache database on first use"""
+        if self._conn is None:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            
+            self._conn = sqlite3.connect(self.path, isolation_level=None, check_same_thread=False)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS cache_entries ("
+                "namespace TEXT NOT NULL, key TEXT NOT NULL, value TEXT NOT NULL, "
+                "created_at REAL NOT NULL, expires_at REAL, last_accessed REAL NOT NULL, "
+                "PRIMARY KEY (namespace, key))"
+            )
+            self._conn.execute(
+                "CREATE INDEX IF NOT EXISTS idx_cache_lru ON cache_entries (namespace, last_accessed)"
+            )
+        
+        return self._conn
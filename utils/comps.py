@@ -0,0 +1,259 @@
+"""
+Comparable-sales valuation
+Keeps a local table of recent sales and values many properties in one batch from
+their k nearest comparables (location, size, beds/baths, age and sale recency),
+using the KD-tree in utils/spatial.py to limit candidates to nearby sales
+"""
+
+import hashlib
+import os
+import threading
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+import numpy as np
+import pandas as pd
+from utils.spatial import SpatialIndex, haversine_miles, radius_bbox, city_centroid
+
+DEFAULT_SALES_PATH = os.getenv("LEADGEN_COMPS_PATH", ".cache/recent_sales.csv")
+
+SALE_COLUMNS = ["latitude", "longitude", "square_feet", "bedrooms", "bathrooms", "year_built", "sale_price", "sale_age_days"]
+
+# One unit of comp distance: a mile, 500 sq ft, a bedroom, a bathroom, 15 years of age or a year since sale
+FEATURE_SCALES = {
+    "miles": 1.0,
+    "square_feet": 500.0,
+    "bedrooms": 1.0,
+    "bathrooms": 1.0,
+    "year_built": 15.0,
+    "sale_age_days": 365.0
+}
+
+class SalesTable:
+    """Recent sales as NumPy columns with a spatial index over their locations"""
+    
+    def __init__(self, columns: Optional[Dict[str, np.ndarray]] = None):
+        columns = columns or {}
+        self.columns = {name: np.asarray(columns.get(name, []), dtype=float) for name in SALE_COLUMNS}
+        self.index = SpatialIndex(self.columns["latitude"], self.columns["longitude"])
+        self.markets = set()
+    
+    @classmethod
+    def from_records(cls, sales: List[Dict[str, Any]]) -> "SalesTable":
+        """Build a table from sale dicts (sale_date or sale_age_days gives the recency)"""
+        today = datetime.now()
+        columns = {name: [] for name in SALE_COLUMNS}
+        for sale in sales:
+            if sale.get("sale_age_days") is None and sale.get("sale_date"):
+                sale = {**sale, "sale_age_days": (today - pd.Timestamp(sale["sale_date"]).to_pydatetime()).days}
+            for name in SALE_COLUMNS:
+                value = sale.get(name)
+                columns[name].append(np.nan if value is None else value)
+        return cls(columns)
+    
+    @classmethod
+    def load(cls, path: str = DEFAULT_SALES_PATH) -> "SalesTable":
+        """Read sales from a CSV file, or an empty table if there is none"""
+        if not os.path.exists(path):
+            return cls()
+        
+        try:
+            frame = pd.read_csv(path)
+            return cls.from_records(frame.where(frame.notna(), None).to_dict("records"))
+        except Exception as e:
+            print(f"     ⚠️ Ignoring unreadable sales table: {str(e)}")
+            return cls()
+    
+    def save(self, path: str = DEFAULT_SALES_PATH):
+        """Write the sales to a CSV file"""
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        pd.DataFrame(self.columns).to_csv(path, index=False)
+    
+    def extend(self, columns: Dict[str, np.ndarray]):
+        """Append sales and rebuild the spatial index"""
+        self.columns = {
+            name: np.concatenate([self.columns[name], np.asarray(columns[name], dtype=float)])
+            for name in SALE_COLUMNS
+        }
+        self.index = SpatialIndex(self.columns["latitude"], self.columns["longitude"])
+    
+    def add_mock_market(self, city: str, state: str, count: int = 500):
+        """Generate recent sales around a city (mock implementation)"""
+        market = f"{city.strip().lower()}, {state.strip().lower()}"
+        if market in self.markets:
+            return
+        self.markets.add(market)
+        
+        # Seeded per market so repeated runs value the same property the same way
+        rng = np.random.default_rng(int(hashlib.sha1(market.encode("utf-8")).hexdigest()[:8], 16))
+        latitude, longitude = city_centroid(city, state)
+        base_price_per_sqft = rng.uniform(150, 350)
+        
+        lat_offset = rng.uniform(-0.2, 0.2, count)
+        lon_offset = rng.uniform(-0.2, 0.2, count)
+        square_feet = rng.integers(900, 4000, count).astype(float)
+        year_built = rng.integers(1950, 2024, count).astype(float)
+        # Prices vary smoothly across the market, with newer homes worth a little more per foot
+        price_per_sqft = base_price_per_sqft * (1 + 0.8 * lat_offset - 0.5 * lon_offset) * (1 + (year_built - 1990) * 0.003)
+        
+        self.extend({
+            "latitude": latitude + lat_offset,
+            "longitude": longitude + lon_offset,
+            "square_feet": square_feet,
+            "bedrooms": np.clip(np.round(square_feet / 600), 1, 6),
+            "bathrooms": np.clip(np.round(square_feet / 900 * 2) / 2, 1, 4),
+            "year_built": year_built,
+            "sale_price": np.round(price_per_sqft * square_feet * rng.normal(1.0, 0.06, count), -2),
+            "sale_age_days": rng.integers(0, 365, count).astype(float)
+        })
+    
+    def __len__(self) -> int:
+        return len(self.columns["sale_price"])
+
+class CompsEngine:
+    """Batch k-nearest-comparables valuation over a sales table"""
+    
+    def __init__(self,
+                 sales: Optional[SalesTable] = None,
+                 k: int = 6,
+                 radius_miles: float = 2.0,
+                 max_radius_miles: float = 10.0,
+                 min_comps: int = 3,
+                 mock_sales: Optional[bool] = None):
+        self.sales = sales if sales is not None else SalesTable.load()
+        self.k = k
+        # Comps are searched within radius_miles, widening to max_radius_miles when fewer than min_comps are found
+        self.radius_miles = radius_miles
+        self.max_radius_miles = max_radius_miles
+        self.min_comps = min_comps
+        # Without a sales file, mock sales are generated for each market that gets valued
+        self.mock_sales = len(self.sales) == 0 if mock_sales is None else mock_sales
+        self._lock = threading.Lock()
+    
+    def estimate(self, subjects: List[Any]) -> List[Optional[Dict[str, Any]]]:
+        """Value estimate and confidence (0-1) for each listing dict or Lead, or None without comps"""
+        if not subjects:
+            return []
+        
+        with self._lock:
+            if self.mock_sales:
+                for subject in subjects:
+                    self.sales.add_mock_market(self._field(subject, "city") or "", self._field(subject, "state") or "")
+            
+            features = self._subject_features(subjects)
+            results = [None] * len(subjects)
+            
+            rows = np.arange(len(subjects))
+            estimates = self._estimate_rows(features, rows, self.radius_miles)
+            short = [row for row in rows if estimates[row] is None or estimates[row]["comps"] < self.min_comps]
+            if short and self.max_radius_miles > self.radius_miles:
+                wider = self._estimate_rows(features, np.array(short), self.max_radius_miles)
+                estimates.update({row: estimate for row, estimate in wider.items() if estimate is not None})
+            
+            for row, estimate in estimates.items():
+                results[row] = estimate
+            return results
+    
+    def _estimate_rows(self, features: Dict[str, np.ndarray], rows: np.ndarray, radius: float) -> Dict[int, Optional[Dict[str, Any]]]:
+        """Estimates for some subjects from the sales within a radius of each"""
+        sales = self.sales.columns
+        
+        # Spatial pre-filter: candidate sales per subject from the KD-tree, flattened into pairs
+        subject_parts, sale_parts = [], []
+        for row in rows:
+            candidates = self.sales.index.query_bbox(*radius_bbox(features["latitude"][row], features["longitude"][row], radius))
+            subject_parts.append(np.full(len(candidates), row))
+            sale_parts.append(np.asarray(candidates, dtype=int))
+        
+        estimates = {int(row): None for row in rows}
+        if not subject_parts:
+            return estimates
+        pair_subject = np.concatenate(subject_parts).astype(int)
+        pair_sale = np.concatenate(sale_parts).astype(int)
+        
+        miles = haversine_miles(features["latitude"][pair_subject], features["longitude"][pair_subject],
+                                sales["latitude"][pair_sale], sales["longitude"][pair_sale])
+        # Sales without a usable price or size cannot give a price per square foot
+        sale_price, sale_sqft = sales["sale_price"][pair_sale], sales["square_feet"][pair_sale]
+        usable = np.isfinite(sale_price) & (sale_price > 0) & np.isfinite(sale_sqft) & (sale_sqft > 0)
+        inside = (miles <= radius) & usable
+        pair_subject, pair_sale, miles = pair_subject[inside], pair_sale[inside], miles[inside]
+        if not len(pair_subject):
+            return estimates
+        
+        # Scaled feature distance for every pair at once; features a subject lacks do not count
+        distance = miles / FEATURE_SCALES["miles"] + np.nan_to_num(sales["sale_age_days"][pair_sale] / FEATURE_SCALES["sale_age_days"])
+        for name in ("square_feet", "bedrooms", "bathrooms", "year_built"):
+            difference = np.abs(features[name][pair_subject] - sales[name][pair_sale]) / FEATURE_SCALES[name]
+            distance += np.nan_to_num(difference)
+        
+        # Keep the k closest comps per subject
+        order = np.lexsort((distance, pair_subject))
+        pair_subject, pair_sale, distance = pair_subject[order], pair_sale[order], distance[order]
+        group_start = np.searchsorted(pair_subject, pair_subject, side="left")
+        keep = np.arange(len(pair_subject)) - group_start < self.k
+        pair_subject, pair_sale, distance = pair_subject[keep], pair_sale[keep], distance[keep]
+        
+        # Each comp's price per square foot applied to the subject's size (its sale price when size is unknown)
+        price_per_sqft = sales["sale_price"][pair_sale] / sales["square_feet"][pair_sale]
+        subject_sqft = features["square_feet"][pair_subject]
+        adjusted = np.where(np.isnan(subject_sqft), sales["sale_price"][pair_sale], price_per_sqft * subject_sqft)
+        weights = 1.0 / (1.0 + distance)
+        
+        size = len(features["latitude"])
+        comps = np.bincount(pair_subject, minlength=size)
+        weight_sum = np.bincount(pair_subject, weights=weights, minlength=size)
+        value = np.bincount(pair_subject, weights=weights * adjusted, minlength=size) / np.maximum(weight_sum, 1e-12)
+        ppsf = np.bincount(pair_subject, weights=weights * price_per_sqft, minlength=size) / np.maximum(weight_sum, 1e-12)
+        ppsf_var = np.bincount(pair_subject, weights=weights * (price_per_sqft - ppsf[pair_subject]) ** 2, minlength=size) / np.maximum(weight_sum, 1e-12)
+        mean_distance = np.bincount(pair_subject, weights=distance, minlength=size) / np.maximum(comps, 1)
+        
+        # Confidence falls with fewer comps, more spread in their prices and less similar comps
+        coverage = np.minimum(comps / self.k, 1.0)
+        spread = np.sqrt(ppsf_var) / np.maximum(ppsf, 1e-12)
+        confidence = coverage * (0.5 * np.clip(1 - spread / 0.25, 0, 1) + 0.5 / (1 + mean_distance))
+        confidence *= np.where(features["approximate_location"], 0.5, 1.0)
+        
+        for row in rows:
+            if comps[row]:
+                estimates[int(row)] = {
+                    "value": round(float(value[row]), -2),
+                    "confidence": round(float(confidence[row]), 3),
+                    "comps": int(comps[row]),
+                    "price_per_sqft": round(float(ppsf[row]), 2),
+                    "radius_miles": radius
+                }
+        return estimates
+    
+    def _subject_features(self, subjects: List[Any]) -> Dict[str, np.ndarray]:
+        """Feature columns for the subjects; a missing location falls back to the city centroid"""
+        features = {name: [] for name in ("latitude", "longitude", "square_feet", "bedrooms", "bathrooms", "year_built", "approximate_location")}
+        for subject in subjects:
+            latitude, longitude = self._field(subject, "latitude"), self._field(subject, "longitude")
+            approximate = latitude is None or longitude is None
+            if approximate:
+                latitude, longitude = city_centroid(self._field(subject, "city") or "", self._field(subject, "state") or "")
+            features["latitude"].append(latitude)
+            features["longitude"].append(longitude)
+            features["approximate_location"].append(approximate)
+            for name in ("square_feet", "bedrooms", "bathrooms", "year_built"):
+                value = self._field(subject, name)
+                features[name].append(np.nan if value is None else value)
+        return {name: np.asarray(values, dtype=bool if name == "approximate_location" else float) for name, values in features.items()}
+    
+    def _field(self, subject: Any, name: str) -> Any:
+        """A field of a listing dict or Lead"""
+        return subject.get(name) if isinstance(subject, dict) else getattr(subject, name, None)
+
+# Shared by enrichment agents unless one is passed in explicitly
+_default_engine = None
+_default_engine_lock = threading.Lock()
+
+def get_comps_engine() -> CompsEngine:
+    """Return the process-wide comps engine"""
+    global _default_engine
+    with _default_engine_lock:
+        if _default_engine is None:
+            _default_engine = CompsEngine()
+        return _default_engine
@@ -0,0 +1,90 @@
+"""
+Enrichment result cache
+Remembers provider lookups per property key (see utils/address.py), including "no hit"
+results, so repeat lookups on overlapping territories are not billed again
+"""
+
+from typing import Any, Dict, Optional
+from utils.cache import PersistentCache, DEFAULT_CACHE_PATH, make_cache_key
+
+DAY = 24 * 3600
+
+# How long a successful lookup stays valid for each provider
+DEFAULT_POSITIVE_TTLS = {
+    "property_records": 30 * DAY,   # Ownership changes rarely
+    "public_records": 30 * DAY,
+    "skiptracing": 14 * DAY,        # Phones and emails churn faster
+    "social_media": 7 * DAY,
+    "property_records_api": 30 * DAY,
+    "skiptracing_api": 14 * DAY
+}
+
+# "No hit" results expire sooner, since providers add new records over time
+DEFAULT_NEGATIVE_TTL = 2 * DAY
+
+class EnrichmentCache:
+    """Persistent per-provider cache of enrichment results with negative caching"""
+    
+    def __init__(self,
+                 path: str = DEFAULT_CACHE_PATH,
+                 positive_ttls: Optional[Dict[str, float]] = None,
+                 negative_ttl: float = DEFAULT_NEGATIVE_TTL,
+                 default_ttl: float = 7 * DAY,
+                 max_entries: int = 200000):
+        self.positive_ttls = {**DEFAULT_POSITIVE_TTLS, **(positive_ttls or {})}
+        self.negative_ttl = negative_ttl
+        self.default_ttl = default_ttl
+        self.cache = PersistentCache("enrichment", path=path, max_entries=max_entries)
+        
+        self.counters = {
+            "hits": 0,
+            "negative_hits": 0,
+            "misses": 0,
+            "stored": 0,
+            "stored_negative": 0
+        }
+    
+    def get(self, provider: str, address_key: str) -> Optional[Dict[str, Any]]:
+        """Cached provider result ({} or the provider's empty response for a cached miss), or None"""
+        try:
+            entry = self.cache.get(make_cache_key(provider, address_key))
+        except Exception as e:
+            print(f"     ⚠️ Enrichment cache read failed: {str(e)}")
+            return None
+        
+        if entry is None:
+            self.counters["misses"] += 1
+            return None
+        
+        self.counters["hits" if entry["found"] else "negative_hits"] += 1
+        return entry["data"]
+    
+    def set(self, provider: str, address_key: str, data: Dict[str, Any], found: Optional[bool] = None):
+        """Store a provider result; misses get the shorter negative TTL"""
+        if found is None:
+            found = any(value for key, value in data.items() if key != "confidence_score")
+        ttl = self.positive_ttls.get(provider, self.default_ttl) if found else self.negative_ttl
+        
+        try:
+            self.cache.set(make_cache_key(provider, address_key), {"found": found, "data": data}, ttl_seconds=ttl)
+        except Exception as e:
+            print(f"     ⚠️ Enrichment cache write failed: {str(e)}")
+            return
+        
+        self.counters["stored" if found else "stored_negative"] += 1
+    
+    def stats(self) -> Dict[str, Any]:
+        """Lookup counters for this process plus the stored entry count"""
+        lookups = self.counters["hits"] + self.counters["negative_hits"] + self.counters["misses"]
+        served = lookups - self.counters["misses"]
+        
+        try:
+            entries = self.cache.stats()["entries"]
+        except Exception:
+            entries = None
+        
+        return {
+            **self.counters,
+            "hit_rate": round(served / lookups, 3) if lookups else 0.0,
+            "entries": entries
+        }
@@ -0,0 +1,429 @@
+"""
+Listing filter engines
+Alternative implementations of the FilterAgent filters for large listing sets;
+every engine returns the surviving listings plus per-filter removal counts that
+match the sequential per-filter implementation
+"""
+
+from datetime import datetime
+from itertools import chain
+from typing import Any, Dict, List, Optional, Tuple
+import numpy as np
+import pandas as pd
+from utils.models import SearchCriteria
+from utils.geo_shards import state_code
+from utils.address import STATE_ABBREVIATIONS
+
+# Signals worth double points in the listing quality score
+HIGH_VALUE_SIGNALS = {
+    'motivated_seller', 'price_reduction', 'estate_sale',
+    'financial_distress', 'quick_sale_needed', 'high_equity'
+}
+
+# Quality score points per listing source
+SOURCE_QUALITY_POINTS = {
+    'mls': 20,
+    'fsbo': 15,
+    'zillow': 10
+}
+DEFAULT_SOURCE_POINTS = 5
+
+FILTER_ORDER = ["location", "price", "property_type", "size", "age", "motivation", "quality"]
+
+# Removal count per filter; None means the filter was skipped
+FilterCounts = Dict[str, Optional[int]]
+
+def normalize_state(state: str) -> str:
+    """Lowercased two-letter code for a state name or code ("Arizona" and "AZ" both give "az")"""
+    name = " ".join(state.strip().lower().split())
+    return STATE_ABBREVIATIONS.get(name, name)
+
+def parse_location(location: str, whole_state: bool = False) -> Tuple[str, str]:
+    """Lowercased target city and normalized state from a "City, ST" location (with whole_state, a bare state matches any city)"""
+    # "New York" or "Washington" alone is a city unless a state scan asked for the whole state
+    state = state_code(location) if whole_state else None
+    if state:
+        return "", state
+    
+    location_parts = [part.strip().lower() for part in location.split(',')]
+    target_city = location_parts[0] if location_parts else ""
+    target_state = normalize_state(location_parts[1]) if len(location_parts) > 1 else ""
+    return target_city, target_state
+
+def location_matches(listing_city: str, listing_state: str, target_city: str, target_state: str) -> bool:
+    """City match in either direction, and the same state when one is given"""
+    city_match = target_city in listing_city or listing_city in target_city
+    if not target_state:
+        return city_match
+    return city_match and normalize_state(listing_state) == target_state
+
+def property_type_matches(listing_type: str, desired_types: List[str]) -> bool:
+    """Listing type matches any desired type in either direction (all lowercase)"""
+    return any(desired in listing_type or listing_type in desired for desired in desired_types)
+
+def score_listing_quality(listing: Dict[str, Any]) -> int:
+    """Quality score (0-100) from data completeness, motivation, source and days on market"""
+    score = 0
+    
+    # Basic information completeness (30 points)
+    if listing.get('price'): score += 10
+    if listing.get('bedrooms'): score += 5
+    if listing.get('bathrooms'): score += 5
+    if listing.get('square_feet'): score += 10
+    
+    # Motivation signals (40 points)
+    for signal in listing.get('motivation_signals', []):
+        if signal in HIGH_VALUE_SIGNALS:
+            score += 10
+        else:
+            score += 5
+    
+    # Source quality (20 points)
+    score += SOURCE_QUALITY_POINTS.get(listing.get('source', ''), DEFAULT_SOURCE_POINTS)
+    
+    # Days on market (10 points - inverse scoring)
+    days_on_market = listing.get('days_on_market', 0)
+    if days_on_market > 90:
+        score += 10  # Long time = more motivated
+    elif days_on_market > 30:
+        score += 7
+    elif days_on_market > 7:
+        score += 4
+    else:
+        score += 1
+    
+    return min(score, 100)  # Cap at 100
+
+class ColumnarFilterEngine:
+    """Evaluates the listing filters as boolean masks over NumPy columns"""
+    
+    def run(self, listings: List[Dict[str, Any]], criteria: SearchCriteria) -> Tuple[List[Dict[str, Any]], FilterCounts]:
+        """Filter listings and add quality scores, returning survivors and removal counts"""
+        if not listings:
+            return [], {name: (None if name == "motivation" and not criteria.motivation_signals else 0) for name in FILTER_ORDER}
+        
+        # Load each needed field into a column once; missing values use the per-row filters' defaults
+        row_count = len(listings)
+        current_year = datetime.now().year
+        
+        price = self._numeric_column(listings, 'price', 0)
+        bedrooms = self._numeric_column(listings, 'bedrooms', 0)
+        square_feet = self._numeric_column(listings, 'square_feet', 0)
+        year_built = self._numeric_column(listings, 'year_built', current_year)
+        signal_rows, signal_codes, signal_names = self._signal_columns(listings)
+        has_signals = np.bincount(signal_rows, minlength=row_count) > 0
+        
+        masks = {
+            "location": self._location_mask(listings, criteria),
+            "price": self._price_mask(price, criteria),
+            "property_type": self._property_type_mask(listings, criteria),
+            "size": self._size_mask(bedrooms, square_feet, criteria),
+            "age": (year_built >= 1900) & (year_built <= current_year),
+            "motivation": None,
+            "quality": (price > 0) & self._non_blank_mask(listings, 'address') & self._non_blank_mask(listings, 'property_type')
+        }
+        if criteria.motivation_signals:
+            masks["motivation"] = self._motivation_mask(signal_rows, signal_codes, signal_names, has_signals, criteria)
+        
+        # Apply masks in the original order so removal counts match the sequential filters
+        alive = np.ones(row_count, dtype=bool)
+        counts = {}
+        for filter_name in FILTER_ORDER:
+            mask = masks[filter_name]
+            if mask is None:
+                counts[filter_name] = None
+                continue
+            
+            if filter_name == "motivation" and not (alive & mask).any():
+                # Same fallback as the per-row filter: keep listings with any motivation signals
+                print("   ℹ️  No listings match specific motivation criteria, including any with motivation signals")
+                mask = has_signals
+            
+            survivors = alive & mask
+            counts[filter_name] = int(alive.sum() - survivors.sum())
+            alive = survivors
+            
+            if filter_name == "age" and criteria.lead_type == "investor":
+                self._assign_age_categories(listings, alive, current_year - year_built)
+        
+        survivor_rows = np.flatnonzero(alive)
+        quality_scores = self._quality_scores(listings, survivor_rows, price, bedrooms, square_feet,
+                                              signal_rows, signal_codes, signal_names)
+        
+        result = []
+        for index, quality_score in zip(survivor_rows.tolist(), quality_scores.tolist()):
+            listing = listings[index]
+            listing['quality_score'] = quality_score
+            result.append(listing)
+        
+        return result, counts
+    
+    def _location_mask(self, listings: List[Dict[str, Any]], criteria: SearchCriteria) -> np.ndarray:
+        """Location match, evaluated once per distinct city/state pair"""
+        if not criteria.location:
+            return np.ones(len(listings), dtype=bool)
+        
+        target_city, target_state = parse_location(criteria.location, criteria.whole_state)
+        city_codes, cities = self._factorize([listing.get('city') or '' for listing in listings])
+        state_codes, states = self._factorize([listing.get('state') or '' for listing in listings])
+        
+        # Match each distinct city and state once, then combine per row
+        city_matches = np.array([
+            target_city in city.lower() or city.lower() in target_city for city in cities
+        ], dtype=bool)
+        if not target_state:
+            return city_matches[city_codes]
+        
+        state_matches = np.array([normalize_state(state) == target_state for state in states], dtype=bool)
+        return city_matches[city_codes] & state_matches[state_codes]
+    
+    def _price_mask(self, price: np.ndarray, criteria: SearchCriteria) -> np.ndarray:
+        """Price inside the requested range"""
+        mask = np.ones(len(price), dtype=bool)
+        if criteria.price_min:
+            mask &= price >= criteria.price_min
+        if criteria.price_max:
+            mask &= price <= criteria.price_max
+        return mask
+    
+    def _property_type_mask(self, listings: List[Dict[str, Any]], criteria: SearchCriteria) -> np.ndarray:
+        """Property type match, evaluated once per distinct type"""
+        if not criteria.property_types:
+            return np.ones(len(listings), dtype=bool)
+        
+        desired_types = [desired.lower() for desired in criteria.property_types]
+        codes, unique_types = self._factorize([listing.get('property_type') or '' for listing in listings])
+        matches = np.array([property_type_matches(t.lower(), desired_types) for t in unique_types], dtype=bool)
+        return matches[codes]
+    
+    def _size_mask(self, bedrooms: np.ndarray, square_feet: np.ndarray, criteria: SearchCriteria) -> np.ndarray:
+        """Size limits for investors (too small) and buyers (too large)"""
+        if criteria.lead_type == "investor":
+            return ~((bedrooms < 2) | (square_feet < 800))
+        if criteria.lead_type == "buyer":
+            return ~((bedrooms > 5) | (square_feet > 4000))
+        return np.ones(len(bedrooms), dtype=bool)
+    
+    def _motivation_mask(self,
+                         signal_rows: np.ndarray,
+                         signal_codes: np.ndarray,
+                         signal_names: List[str],
+                         has_signals: np.ndarray,
+                         criteria: SearchCriteria) -> np.ndarray:
+        """Listings with a requested motivation signal (or, leniently, any signal)"""
+        desired = {signal.lower() for signal in criteria.motivation_signals}
+        desired_codes = np.array([str(name).lower() in desired for name in signal_names], dtype=bool)
+        
+        has_desired = np.zeros(len(has_signals), dtype=bool)
+        has_desired[signal_rows[desired_codes[signal_codes]]] = True
+        return has_desired | has_signals
+    
+    def _non_blank_mask(self, listings: List[Dict[str, Any]], name: str) -> np.ndarray:
+        """Field present and not just whitespace"""
+        return np.array([bool((listing.get(name) or '').strip()) for listing in listings], dtype=bool)
+    
+    def _assign_age_categories(self, listings: List[Dict[str, Any]], alive: np.ndarray, property_age: np.ndarray):
+        """Tag investor listings that passed the age filter with an age category"""
+        categories = np.select([property_age > 50, property_age > 20], ['vintage', 'mature'], default='modern')
+        for index in np.flatnonzero(alive):
+            listings[index]['age_category'] = str(categories[index])
+    
+    def _quality_scores(self,
+                        listings: List[Dict[str, Any]],
+                        rows: np.ndarray,
+                        price: np.ndarray,
+                        bedrooms: np.ndarray,
+                        square_feet: np.ndarray,
+                        signal_rows: np.ndarray,
+                        signal_codes: np.ndarray,
+                        signal_names: List[str]) -> np.ndarray:
+        """Vectorized version of FilterAgent._add_quality_scores for the given rows"""
+        selected = [listings[index] for index in rows.tolist()]
+        bathrooms = self._numeric_column(selected, 'bathrooms', 0)
+        days_on_market = self._numeric_column(selected, 'days_on_market', 0)
+        
+        # Basic information completeness (30 points)
+        score = np.where(price[rows] != 0, 10, 0)
+        score += np.where(bedrooms[rows] != 0, 5, 0)
+        score += np.where(bathrooms != 0, 5, 0)
+        score += np.where(square_feet[rows] != 0, 10, 0)
+        
+        # Motivation signals: 10 points for high-value signals, 5 for others
+        code_points = np.array([10 if name in HIGH_VALUE_SIGNALS else 5 for name in signal_names], dtype=np.int64)
+        points_per_row = np.bincount(signal_rows, weights=code_points[signal_codes], minlength=len(price))
+        score += points_per_row[rows].astype(np.int64)
+        
+        # Source quality
+        source_codes, sources = self._factorize([listing.get('source', '') for listing in selected])
+        source_points = np.array([SOURCE_QUALITY_POINTS.get(source, DEFAULT_SOURCE_POINTS) for source in sources], dtype=np.int64)
+        score += source_points[source_codes] if len(source_codes) else 0
+        
+        # Days on market (longer = more motivated)
+        score += np.select([days_on_market > 90, days_on_market > 30, days_on_market > 7], [10, 7, 4], default=1)
+        
+        return np.minimum(score, 100)
+    
+    def _signal_columns(self, listings: List[Dict[str, Any]]) -> Tuple[np.ndarray, np.ndarray, List[str]]:
+        """Flatten motivation signals into (row index, signal code) arrays plus the code names"""
+        signal_lists = [listing.get('motivation_signals') or [] for listing in listings]
+        lengths = np.array([len(signals) for signals in signal_lists], dtype=np.int64)
+        signal_rows = np.repeat(np.arange(len(signal_lists)), lengths)
+        signal_codes, signal_names = self._factorize(list(chain.from_iterable(signal_lists)))
+        return signal_rows, signal_codes, signal_names
+    
+    def _numeric_column(self, listings: List[Dict[str, Any]], name: str, default: float) -> np.ndarray:
+        """Float column with missing values replaced by a default"""
+        values = np.array([listing.get(name, default) for listing in listings], dtype=float)
+        values[np.isnan(values)] = default  # None becomes NaN in a float array
+        return values
+    
+    def _factorize(self, values: List[Any]) -> Tuple[np.ndarray, List[Any]]:
+        """Integer codes per value plus the distinct values, so string work runs once per distinct value"""
+        if not values:
+            return np.zeros(0, dtype=np.int64), []
+        codes, uniques = pd.factorize(pd.Series(values, dtype=object))
+        return codes, list(uniques)
+
+# Relative per-listing cost of each check, used with selectivity to order them
+FUSED_CHECK_COSTS = {
+    "location": 2.0,
+    "price": 1.0,
+    "property_type": 2.0,
+    "size": 1.0,
+    "age": 1.0,
+    "motivation": 1.0,
+    "quality": 1.5
+}
+
+class FusedFilterEngine:
+    """Compiles search criteria into one short-circuiting predicate evaluated in a single pass"""
+    
+    def __init__(self, reorder_interval: int = 2048):
+        # Checks are re-ordered every reorder_interval listings from the rejection rates seen so far
+        self.reorder_interval = reorder_interval
+        # Observed [evaluated, rejected] per check, kept across runs
+        self.observed = {name: [0, 0] for name in FILTER_ORDER}
+        self.last_order = []
+    
+    def run(self, listings: List[Dict[str, Any]], criteria: SearchCriteria) -> Tuple[List[Dict[str, Any]], FilterCounts]:
+        """Filter listings and add quality scores, returning survivors and removal counts"""
+        checks = self.compile(criteria)
+        rejected = {name: 0 for name in FILTER_ORDER}
+        survivors = []
+        
+        for start in range(0, len(listings), self.reorder_interval):
+            chunk = listings[start:start + self.reorder_interval]
+            ordered = self._order_checks(checks)
+            chunk_rejected = {name: 0 for name, _ in ordered}
+            
+            for listing in chunk:
+                for name, check in ordered:
+                    if not check(listing):
+                        chunk_rejected[name] += 1
+                        break
+                else:
+                    survivors.append(listing)
+            
+            # Each check only saw the listings that passed the checks before it
+            remaining = len(chunk)
+            for name, _ in ordered:
+                self.observed[name][0] += remaining
+                self.observed[name][1] += chunk_rejected[name]
+                rejected[name] += chunk_rejected[name]
+                remaining -= chunk_rejected[name]
+        
+        if criteria.motivation_signals and not survivors and rejected["motivation"]:
+            print("   ℹ️  No listings match specific motivation criteria, including any with motivation signals")
+        
+        for listing in survivors:
+            if criteria.lead_type == "investor":
+                listing['age_category'] = self._age_category(listing)
+            listing['quality_score'] = score_listing_quality(listing)
+        
+        # Rejections are attributed to the first failing check in evaluation order
+        counts = {
+            name: (None if name == "motivation" and not criteria.motivation_signals else rejected[name])
+            for name in FILTER_ORDER
+        }
+        return survivors, counts
+    
+    def compile(self, criteria: SearchCriteria) -> Dict[str, Any]:
+        """Build one check per filter with lowercased targets and match tables precomputed"""
+        checks = {}
+        current_year = datetime.now().year
+        price_min = criteria.price_min
+        price_max = criteria.price_max
+        
+        if criteria.location:
+            target_city, target_state = parse_location(criteria.location, criteria.whole_state)
+            location_cache = {}
+            
+            def check_location(listing):
+                key = (listing.get('city', ''), listing.get('state', ''))
+                match = location_cache.get(key)
+                if match is None:
+                    match = location_cache[key] = location_matches(key[0].lower(), key[1].lower(), target_city, target_state)
+                return match
+            
+            checks["location"] = check_location
+        
+        if price_min or price_max:
+            def check_price(listing):
+                price = listing.get('price', 0)
+                return not ((price_min and price < price_min) or (price_max and price > price_max))
+            
+            checks["price"] = check_price
+        
+        if criteria.property_types:
+            desired_types = [desired.lower() for desired in criteria.property_types]
+            type_cache = {}
+            
+            def check_property_type(listing):
+                listing_type = listing.get('property_type', '')
+                match = type_cache.get(listing_type)
+                if match is None:
+                    match = type_cache[listing_type] = property_type_matches(listing_type.lower(), desired_types)
+                return match
+            
+            checks["property_type"] = check_property_type
+        
+        if criteria.lead_type == "investor":
+            checks["size"] = lambda listing: listing.get('bedrooms', 0) >= 2 and listing.get('square_feet', 0) >= 800
+        elif criteria.lead_type == "buyer":
+            checks["size"] = lambda listing: listing.get('bedrooms', 0) <= 5 and listing.get('square_feet', 0) <= 4000
+        
+        checks["age"] = lambda listing: 1900 <= listing.get('year_built', current_year) <= current_year
+        
+        if criteria.motivation_signals:
+            # The lenient rule accepts any listing with a signal, which already covers
+            # every listing carrying one of the requested signals
+            checks["motivation"] = lambda listing: bool(listing.get('motivation_signals'))
+        
+        checks["quality"] = lambda listing: (
+            listing.get('price', 0) > 0
+            and bool(listing.get('address', '').strip())
+            and bool(listing.get('property_type', '').strip())
+        )
+        
+        return checks
+    
+    def _order_checks(self, checks: Dict[str, Any]) -> List[Tuple[str, Any]]:
+        """Most selective checks per unit of cost first"""
+        def priority(name):
+            evaluated, rejected = self.observed[name]
+            # Smoothed rejection rate so unobserved checks keep their default position
+            rejection_rate = (rejected + 1) / (evaluated + 2)
+            return -rejection_rate / FUSED_CHECK_COSTS[name]
+        
+        ordered_names = sorted(checks, key=lambda name: (priority(name), FILTER_ORDER.index(name)))
+        self.last_order = ordered_names
+        return [(name, checks[name]) for name in ordered_names]
+    
+    def _age_category(self, listing: Dict[str, Any]) -> str:
+        """Age bucket used by investors"""
+        property_age = datetime.now().year - listing.get('year_built', datetime.now().year)
+        if property_age > 50:
+            return 'vintage'
+        if property_age > 20:
+            return 'mature'
+        return 'modern'
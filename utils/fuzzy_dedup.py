@@ -0,0 +1,299 @@
+"""
+Fuzzy cross-source deduplication
+Groups listings that describe the same property even when their addresses are
+formatted differently, using blocking (ZIP or city plus street-name token and
+house number) so only plausible pairs are compared, then merges each group into
+one listing
+"""
+
+import json
+import os
+import re
+import time
+from collections import defaultdict
+from difflib import SequenceMatcher
+from typing import Any, Dict, List, Optional, Tuple
+from utils.address import parse_address, listing_property_key, STREET_SUFFIXES, DIRECTIONALS
+
+# Weight of each signal in the similarity score; missing values are left out of the average
+SIMILARITY_WEIGHTS = {
+    "address": 0.5,
+    "price": 0.2,
+    "bedrooms": 0.1,
+    "bathrooms": 0.1,
+    "square_feet": 0.1
+}
+
+# Abbreviated suffixes and directionals say nothing about which street it is
+_GENERIC_TOKENS = set(STREET_SUFFIXES.values()) | set(DIRECTIONALS.values())
+
+class _UnionFind:
+    """Disjoint sets over listing indexes"""
+    
+    def __init__(self, size: int):
+        self.parent = list(range(size))
+    
+    def find(self, item: int) -> int:
+        while self.parent[item] != item:
+            self.parent[item] = self.parent[self.parent[item]]
+            item = self.parent[item]
+        return item
+    
+    def union(self, a: int, b: int):
+        root_a, root_b = self.find(a), self.find(b)
+        if root_a != root_b:
+            self.parent[max(root_a, root_b)] = min(root_a, root_b)
+
+class FuzzyDeduplicator:
+    """Blocking-based fuzzy duplicate detection and merging for listings"""
+    
+    def __init__(self,
+                 threshold: float = 0.85,
+                 max_block_size: int = 200,
+                 window: int = 20,
+                 audit_path: Optional[str] = None):
+        # Minimum weighted similarity for two listings to be merged
+        self.threshold = threshold
+        # Larger blocks are compared in a sliding window over house number and street name instead of all pairs
+        self.max_block_size = max_block_size
+        self.window = window
+        # Merge decisions are appended here as JSON lines when set
+        self.audit_path = audit_path
+    
+    def run(self, listings: List[Dict[str, Any]]) -> Tuple[List[Dict[str, Any]], Dict[str, Any]]:
+        """Merge fuzzy duplicates, returning the merged listings and run statistics with the audit log"""
+        started = time.perf_counter()
+        records = [self._prepare(listing) for listing in listings]
+        blocks = self._build_blocks(records)
+        
+        union_find = _UnionFind(len(listings))
+        pair_scores = {}
+        comparisons = 0
+        
+        for members in blocks.values():
+            if len(members) < 2:
+                continue
+            for a, b in self._candidate_pairs(members, records):
+                # Pairs already linked through another block or pair need no comparison
+                if union_find.find(a) == union_find.find(b):
+                    continue
+                comparisons += 1
+                score = self.similarity(records[a], records[b])
+                if score >= self.threshold:
+                    union_find.union(a, b)
+                    pair_scores[(a, b)] = score
+        
+        clusters = defaultdict(list)
+        for index in range(len(listings)):
+            clusters[union_find.find(index)].append(index)
+        
+        cluster_scores = defaultdict(list)
+        for (a, b), score in pair_scores.items():
+            cluster_scores[union_find.find(a)].append(round(score, 3))
+        
+        merged_listings = []
+        audit = []
+        for root in sorted(clusters):
+            members = clusters[root]
+            if len(members) == 1:
+                merged_listings.append(listings[members[0]])
+                continue
+            
+            merged = self.merge([listings[index] for index in members])
+            merged_listings.append(merged)
+            audit.append({
+                "kept": merged.get("property_key"),
+                "merged": [listings[index].get("property_key") for index in members],
+                "addresses": [listings[index].get("address") for index in members],
+                "sources": [listings[index].get("source") for index in members],
+                "scores": cluster_scores[root]
+            })
+        
+        self._write_audit(audit)
+        
+        return merged_listings, {
+            "input": len(listings),
+            "output": len(merged_listings),
+            "merged": len(listings) - len(merged_listings),
+            "blocks": len(blocks),
+            "comparisons": comparisons,
+            "elapsed_seconds": round(time.perf_counter() - started, 3),
+            "decisions": audit
+        }
+    
+    def similarity(self, a: Dict[str, Any], b: Dict[str, Any]) -> float:
+        """Weighted similarity (0-1) of two prepared records"""
+        # Different house numbers, units or ZIPs are different properties however similar the rest is
+        if a["number"] != b["number"]:
+            return 0.0
+        if (a["unit"] and b["unit"] and a["unit"] != b["unit"]) or (a["zip"] and b["zip"] and a["zip"] != b["zip"]):
+            return 0.0
+        
+        # A suffix or directional only counts against a match when both records have one and they differ
+        address_score = 1.0 if a["name"] == b["name"] else SequenceMatcher(None, a["name"], b["name"]).ratio()
+        if a["generic"] and b["generic"] and a["generic"] != b["generic"]:
+            address_score *= 0.5
+        
+        scores = {"address": address_score}
+        scores["price"] = self._relative_match(a["price"], b["price"], 0.1)
+        scores["square_feet"] = self._relative_match(a["square_feet"], b["square_feet"], 0.05)
+        for field in ("bedrooms", "bathrooms"):
+            if a[field] is not None and b[field] is not None:
+                scores[field] = 1.0 if a[field] == b[field] else 0.0
+        
+        available = {field: score for field, score in scores.items() if score is not None}
+        total_weight = sum(SIMILARITY_WEIGHTS[field] for field in available)
+        return sum(SIMILARITY_WEIGHTS[field] * score for field, score in available.items()) / total_weight
+    
+    def merge(self, listings: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """Combine duplicates, starting from the most complete record and filling its gaps"""
+        ranked = sorted(listings, key=lambda listing: sum(1 for value in listing.values() if value), reverse=True)
+        merged = dict(ranked[0])
+        
+        for listing in ranked[1:]:
+            for field, value in listing.items():
+                if value and not merged.get(field):
+                    merged[field] = value
+        
+        merged["motivation_signals"] = list(dict.fromkeys(
+            signal for listing in ranked for signal in (listing.get("motivation_signals") or [])
+        ))
+        merged["merged_sources"] = list(dict.fromkeys(listing.get("source", "") for listing in ranked))
+        merged["merged_property_keys"] = [listing.get("property_key") for listing in ranked]
+        return merged
+    
+    def _prepare(self, listing: Dict[str, Any]) -> Dict[str, Any]:
+        """Pre-compute the normalized fields used for blocking and comparison"""
+        parts = parse_address(
+            str(listing.get('address') or ""),
+            str(listing.get('city') or ""),
+            str(listing.get('state') or ""),
+            str(listing.get('zip_code') or "")
+        )
+        if not listing.get("property_key"):
+            listing["property_key"] = listing_property_key(listing)
+        
+        number_match = re.match(r'0*(\d+)', parts["street"])
+        street_name = parts["street"][number_match.end():].strip() if number_match else parts["street"]
+        name_tokens = [token for token in street_name.split() if token not in _GENERIC_TOKENS]
+        
+        return {
+            "number": number_match.group(1) if number_match else "",
+            "name": " ".join(name_tokens) or street_name,
+            "generic": [token for token in street_name.split() if token in _GENERIC_TOKENS],
+            "street_token": max(name_tokens, key=len) if name_tokens else street_name,
+            "unit": parts["unit"],
+            "zip": parts["zip"],
+            "locality": f"{parts['city']}|{parts['state']}" if parts["city"] else "",
+            "price": self._number(listing.get("price")),
+            "square_feet": self._number(listing.get("square_feet")),
+            "bedrooms": listing.get("bedrooms"),
+            "bathrooms": listing.get("bathrooms")
+        }
+    
+    def _build_blocks(self, records: List[Dict[str, Any]]) -> Dict[str, List[int]]:
+        """Index listings by ZIP or city plus street token and house number"""
+        blocks = defaultdict(list)
+        for index, record in enumerate(records):
+            for block_key in self._block_keys(record):
+                blocks[block_key].append(index)
+        return blocks
+    
+    def _block_keys(self, record: Dict[str, Any]) -> List[str]:
+        """Blocks a prepared record belongs to"""
+        # Listings with different house numbers never match, so the number is part of every block
+        number = record["number"]
+        keys = []
+        for area in (f"zip:{record['zip']}" if record["zip"] else None,
+                     f"city:{record['locality']}" if record["locality"] else None):
+            if area:
+                keys.append(f"{area}:{record['street_token']}:{number}")
+                # Catches misspelled or renamed streets that land under another token
+                keys.append(f"{area}:*:{number}")
+        return keys
+    
+    def _candidate_pairs(self, members: List[int], records: List[Dict[str, Any]]):
+        """All pairs in a small block; neighbours by house number and street name in a large one"""
+        if len(members) <= self.max_block_size:
+            for i, a in enumerate(members):
+                for b in members[i + 1:]:
+                    yield a, b
+            return
+        
+        ordered = sorted(members, key=lambda index: (int(records[index]["number"] or 0), records[index]["name"]))
+        for i, a in enumerate(ordered):
+            for b in ordered[i + 1:i + 1 + self.window]:
+                yield a, b
+    
+    def _relative_match(self, a: Optional[float], b: Optional[float], tolerance: float) -> Optional[float]:
+        """1.0 for equal values falling linearly to 0.0 at the given relative difference"""
+        if not a or not b:
+            return None
+        difference = abs(a - b) / max(a, b)
+        return max(0.0, 1.0 - difference / tolerance)
+    
+    def _number(self, value: Any) -> Optional[float]:
+        """Numeric value of a field, or None"""
+        try:
+            return float(value) if value is not None else None
+        except (TypeError, ValueError):
+            return None
+    
+    def _write_audit(self, audit: List[Dict[str, Any]]):
+        """Append merge decisions to the audit log file"""
+        if not self.audit_path or not audit:
+            return
+        
+        try:
+            directory = os.path.dirname(self.audit_path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            with open(self.audit_path, "a") as f:
+                for decision in audit:
+                    f.write(json.dumps({"timestamp": time.time(), **decision}, default=str) + "\n")
+        except Exception as e:
+            print(f"     ⚠️ Failed to write dedup audit log: {str(e)}")
+
+class StreamingDeduplicator:
+    """Incremental fuzzy duplicate detection for listings that arrive one at a time"""
+    
+    def __init__(self, deduplicator: FuzzyDeduplicator):
+        self.deduplicator = deduplicator
+        self.listings = []
+        self.records = []
+        self.blocks = defaultdict(list)
+        self.stats = {"input": 0, "duplicates": 0, "comparisons": 0}
+    
+    def add(self, listing: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """Earlier listing this one duplicates, or None after indexing it as a new property"""
+        self.stats["input"] += 1
+        record = self.deduplicator._prepare(listing)
+        block_keys = self.deduplicator._block_keys(record)
+        
+        # Only the most recent members of an oversized block are compared
+        candidates = dict.fromkeys(
+            index
+            for block_key in block_keys
+            for index in self.blocks.get(block_key, [])[-self.deduplicator.max_block_size:]
+        )
+        for index in candidates:
+            self.stats["comparisons"] += 1
+            score = self.deduplicator.similarity(record, self.records[index])
+            if score >= self.deduplicator.threshold:
+                self.stats["duplicates"] += 1
+                kept = self.listings[index]
+                self.deduplicator._write_audit([{
+                    "kept": kept.get("property_key"),
+                    "merged": [kept.get("property_key"), listing.get("property_key")],
+                    "addresses": [kept.get("address"), listing.get("address")],
+                    "sources": [kept.get("source"), listing.get("source")],
+                    "scores": [round(score, 3)]
+                }])
+                return kept
+        
+        index = len(self.listings)
+        self.listings.append(listing)
+        self.records.append(record)
+        for block_key in block_keys:
+            self.blocks[block_key].append(index)
+        return None
@@ -0,0 +1,63 @@
+"""
+Geographic shard planning
+Splits a large search location (a state, or an explicit list of ZIP codes for
+a metro) into ZIP-scoped shards that can be searched and filtered independently
+"""
+
+from typing import Any, Dict, List, Optional
+from utils.address import STATE_ABBREVIATIONS
+
+# 3-digit ZIP prefixes (sectional center tiles) used by each state, as inclusive ranges
+STATE_ZIP3_RANGES = {
+    "al": [(350, 369)], "ak": [(995, 999)], "az": [(850, 865)], "ar": [(716, 729)],
+    "ca": [(900, 961)], "co": [(800, 816)], "ct": [(60, 69)], "de": [(197, 199)],
+    "dc": [(200, 205)], "fl": [(320, 349)], "ga": [(300, 319), (398, 399)], "hi": [(967, 968)],
+    "id": [(832, 838)], "il": [(600, 629)], "in": [(460, 479)], "ia": [(500, 528)],
+    "ks": [(660, 679)], "ky": [(400, 427)], "la": [(700, 714)], "me": [(39, 49)],
+    "md": [(206, 219)], "ma": [(10, 27)], "mi": [(480, 499)], "mn": [(550, 567)],
+    "ms": [(386, 397)], "mo": [(630, 658)], "mt": [(590, 599)], "ne": [(680, 693)],
+    "nv": [(889, 898)], "nh": [(30, 38)], "nj": [(70, 89)], "nm": [(870, 884)],
+    "ny": [(100, 149)], "nc": [(270, 289)], "nd": [(580, 588)], "oh": [(430, 459)],
+    "ok": [(730, 749)], "or": [(970, 979)], "pa": [(150, 196)], "ri": [(28, 29)],
+    "sc": [(290, 299)], "sd": [(570, 577)], "tn": [(370, 385)], "tx": [(750, 799), (885, 885)],
+    "ut": [(840, 847)], "vt": [(50, 59)], "va": [(201, 201), (220, 246)], "wa": [(980, 994)],
+    "wv": [(247, 268)], "wi": [(530, 549)], "wy": [(820, 831)]
+}
+
+def state_code(location: str) -> Optional[str]:
+    """Two-letter state code when the location names a whole state ("AZ", "Arizona", ", TX"), else None"""
+    parts = [part.strip().lower() for part in location.split(',') if part.strip()]
+    if len(parts) != 1:
+        return None
+    name = " ".join(parts[0].split())
+    code = STATE_ABBREVIATIONS.get(name, name)
+    return code if code in STATE_ZIP3_RANGES else None
+
+def state_zip_prefixes(code: str) -> List[str]:
+    """All 3-digit ZIP prefixes for a state"""
+    return [f"{zip3:03d}" for start, end in STATE_ZIP3_RANGES[code] for zip3 in range(start, end + 1)]
+
+def plan_shards(location: str,
+                zip_codes: Optional[List[str]] = None,
+                zips_per_shard: int = 1) -> List[Dict[str, Any]]:
+    """Shards for a location: explicit ZIP codes, a state's ZIP3 tiles, or the location as a single shard"""
+    if zip_codes:
+        scopes = sorted({str(zip_code).strip() for zip_code in zip_codes if str(zip_code).strip()})
+        kind = "zip"
+    elif state_code(location):
+        scopes = state_zip_prefixes(state_code(location))
+        kind = "zip3"
+    else:
+        return [{"shard_id": "shard_000", "location": location, "kind": "location", "zip_codes": []}]
+    
+    zips_per_shard = max(1, zips_per_shard)
+    shards = []
+    for start in range(0, len(scopes), zips_per_shard):
+        group = scopes[start:start + zips_per_shard]
+        shards.append({
+            "shard_id": f"shard_{len(shards):03d}",
+            "location": location,
+            "kind": kind,
+            "zip_codes": group
+        })
+    return shards
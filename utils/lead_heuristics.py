@@ -0,0 +1,130 @@
+"""
+Heuristic lead scoring
+Rule-based lead scores used as the LLM fallback and as the cheap first tier of
+the scoring cascade, computed for many leads at once with NumPy
+"""
+
+from typing import Any, Dict, List
+import numpy as np
+from utils.models import Lead
+
+HIGH_VALUE_INDICATORS = [
+    "motivated_seller", "price_reduction", "estate_sale",
+    "financial_distress", "quick_sale_needed", "high_equity"
+]
+
+SOURCE_SCORES = {
+    "mls": 20,
+    "fsbo": 15,
+    "zillow": 12,
+    "realtor": 10
+}
+
+DEFAULT_SOURCE_SCORE = 5
+
+# Property fields that each add points for data completeness
+COMPLETENESS_FIELDS = ("price", "bedrooms", "bathrooms", "square_feet", "year_built")
+
+# Share of the heuristic taken from FilterAgent's listing quality score when a lead has one
+QUALITY_WEIGHT = 0.3
+
+def fallback_score(lead: Lead) -> float:
+    """Rule-based score (0-100) from contact data, motivation, completeness and source"""
+    score = 0
+    
+    # Contact information (30 points)
+    if lead.owner_phone:
+        score += 20
+    if lead.owner_email:
+        score += 10
+    
+    # Motivation indicators (30 points)
+    for indicator in lead.motivation_indicators:
+        if indicator in HIGH_VALUE_INDICATORS:
+            score += 8
+        else:
+            score += 3
+    
+    # Property completeness (20 points)
+    if lead.price:
+        score += 5
+    if lead.bedrooms:
+        score += 3
+    if lead.bathrooms:
+        score += 3
+    if lead.square_feet:
+        score += 5
+    if lead.year_built:
+        score += 4
+    
+    # Source quality (20 points)
+    score += SOURCE_SCORES.get(lead.source, DEFAULT_SOURCE_SCORE)
+    
+    return min(score, 100)  # Cap at 100
+
+def _rubric_scores(has_phone: np.ndarray,
+                   has_email: np.ndarray,
+                   indicators: List[List[str]],
+                   fields: Dict[str, List[Any]],
+                   sources: List[str]) -> np.ndarray:
+    """Vectorized fallback_score over columns of lead or listing fields"""
+    def flag(values: List[Any]) -> np.ndarray:
+        return np.array([bool(value) for value in values])
+    
+    high_value = set(HIGH_VALUE_INDICATORS)
+    high_count = np.array([sum(1 for i in row if i in high_value) for row in indicators])
+    other_count = np.array([len(row) for row in indicators]) - high_count
+    
+    scores = (
+        20 * has_phone + 10 * has_email
+        + 8 * high_count + 3 * other_count
+        + 5 * flag(fields["price"])
+        + 3 * flag(fields["bedrooms"])
+        + 3 * flag(fields["bathrooms"])
+        + 5 * flag(fields["square_feet"])
+        + 4 * flag(fields["year_built"])
+        + np.array([SOURCE_SCORES.get(source, DEFAULT_SOURCE_SCORE) for source in sources])
+    )
+    return np.minimum(scores, 100).astype(float)
+
+def heuristic_scores(leads: List[Lead], quality_weight: float = QUALITY_WEIGHT) -> np.ndarray:
+    """Vectorized fallback scores blended with each lead's listing quality score"""
+    if not leads:
+        return np.zeros(0)
+    
+    scores = _rubric_scores(
+        np.array([bool(lead.owner_phone) for lead in leads]),
+        np.array([bool(lead.owner_email) for lead in leads]),
+        [lead.motivation_indicators for lead in leads],
+        {field: [getattr(lead, field) for lead in leads] for field in COMPLETENESS_FIELDS},
+        [lead.source for lead in leads]
+    )
+    
+    # Leads built from filtered listings carry the filter's quality score
+    quality = np.array([lead.metadata.get("quality_score", np.nan) for lead in leads], dtype=float)
+    return _blend_quality(scores, quality, quality_weight)
+
+def _blend_quality(scores: np.ndarray, quality: np.ndarray, quality_weight: float) -> np.ndarray:
+    """Blend rubric scores with quality scores where known (NaN keeps the rubric score)"""
+    has_quality = ~np.isnan(quality)
+    scores[has_quality] = (1 - quality_weight) * scores[has_quality] + quality_weight * quality[has_quality]
+    return np.round(scores, 1)
+
+def score_upper_bounds(listings: List[Dict[str, Any]], quality_weight: float = QUALITY_WEIGHT) -> np.ndarray:
+    """Best heuristic score each listing could reach after enrichment, assuming phone and email are found"""
+    if not listings:
+        return np.zeros(0)
+    
+    # Enrichment only adds contact and owner data, so everything else is already known
+    found = np.ones(len(listings), dtype=bool)
+    scores = _rubric_scores(
+        found,
+        found,
+        [listing.get('motivation_signals') or [] for listing in listings],
+        {field: [listing.get(field) for listing in listings] for field in COMPLETENESS_FIELDS},
+        [listing.get('source', '') for listing in listings]
+    )
+    
+    # The lead keeps the listing's quality score, so the bound blends it the same way heuristic_scores does
+    quality = np.array([listing.get('quality_score', np.nan) for listing in listings], dtype=float)
+    return _blend_quality(scores, quality, quality_weight)
@@ -0,0 +1,191 @@
+"""
+LLM request scheduler
+Runs many LLM calls concurrently while staying inside requests-per-minute and
+tokens-per-minute budgets, backing off adaptively when the provider returns 429s
+"""
+
+import asyncio
+import random
+import time
+from collections import deque
+from typing import Any, Awaitable, Callable, Dict
+
+def is_rate_limit_error(error: Exception) -> bool:
+    """Check whether an exception is a provider rate-limit (HTTP 429) response"""
+    if getattr(error, "status_code", None) == 429:
+        return True
+    if type(error).__name__ == "RateLimitError":
+        return True
+    return "429" in str(error) and "rate" in str(error).lower()
+
+class LLMRequestScheduler:
+    """Concurrent LLM call scheduler with RPM/TPM budgets and adaptive 429 backoff"""
+    
+    def __init__(self,
+                 requests_per_minute: int = 500,
+                 tokens_per_minute: int = 90000,
+                 max_concurrent: int = 10,
+                 max_retries: int = 5,
+                 base_backoff: float = 1.0,
+                 max_backoff: float = 30.0,
+                 window_seconds: float = 60.0):
+        self.requests_per_minute = requests_per_minute
+        self.tokens_per_minute = tokens_per_minute
+        self.max_concurrent = max_concurrent
+        self.max_retries = max_retries
+        self.base_backoff = base_backoff
+        self.max_backoff = max_backoff
+        self.window_seconds = window_seconds
+        
+        # Sliding window of (timestamp, tokens) for requests already sent
+        self._window = deque()
+        self._window_tokens = 0
+        
+        # Adaptive concurrency: halved when a 429 arrives, grows back gradually on success
+        self._concurrency = float(max_concurrent)
+        self._in_flight = 0
+        self._cooldown_until = 0.0
+        
+        self._loop = None
+        self._condition = None
+        self._budget_lock = None
+        
+        self.stats = {
+            "requests": 0,
+            "succeeded": 0,
+            "rate_limited": 0,
+            "retries": 0,
+            "failed": 0,
+            "tokens_reserved": 0
+        }
+    
+    @property
+    def current_concurrency(self) -> int:
+        """Concurrency limit currently in effect"""
+        return max(1, int(self._concurrency))
+    
+    async def submit(self, call: Callable[[], Awaitable[Any]], estimated_tokens: int = 0) -> Any:
+        """Run an LLM call once budget and a concurrency slot are available, retrying on 429s"""
+        attempt = 0
+        
+        while True:
+            await self._acquire_slot()
+            backoff = None
+            
+            try:
+                await self._reserve_budget(estimated_tokens)
+                self.stats["requests"] += 1
+                result = await call()
+            except Exception as e:
+                if not is_rate_limit_error(e) or attempt >= self.max_retries:
+                    self.stats["failed"] += 1
+                    raise
+                
+                attempt += 1
+                backoff = self._on_rate_limited(attempt, e)
+            else:
+                self._on_success()
+                return result
+            finally:
+                await self._release_slot()
+            
+            # Back off outside the concurrency slot so other calls are not blocked by it
+            self.stats["retries"] += 1
+            await asyncio.sleep(backoff)
+    
+    def _primitives(self):
+        """Return the lock and condition for the running event loop"""
+        loop = asyncio.get_running_loop()
+        
+        if self._loop is not loop:
+            self._condition = asyncio.Condition()
+            self._budget_lock = asyncio.Lock()
+            self._in_flight = 0
+            self._loop = loop
+        
+        return self._condition, self._budget_lock
+    
+    async def _acquire_slot(self):
+        """Wait for a free slot under the adaptive concurrency limit"""
+        condition, _ = self._primitives()
+        
+        async with condition:
+            await condition.wait_for(lambda: self._in_flight < self.current_concurrency)
+            self._in_flight += 1
+    
+    async def _release_slot(self):
+        """Free a concurrency slot and wake waiting calls"""
+        condition, _ = self._primitives()
+        
+        async with condition:
+            self._in_flight -= 1
+            condition.notify_all()
+    
+    async def _reserve_budget(self, tokens: int):
+        """Wait until the request and token budgets allow another call, then reserve it"""
+        _, budget_lock = self._primitives()
+        
+        # The lock queues callers in arrival order so budget is handed out fairly
+        async with budget_lock:
+            while True:
+                now = time.monotonic()
+                
+                if now < self._cooldown_until:
+                    await asyncio.sleep(self._cooldown_until - now)
+                    continue
+                
+                self._expire_window(now)
+                
+                within_requests = len(self._window) < self.requests_per_minute
+                # A single oversized request is allowed through an empty window
+                within_tokens = not self._window or self._window_tokens + tokens <= self.tokens_per_minute
+                
+                if within_requests and within_tokens:
+                    self._window.append((now, tokens))
+                    self._window_tokens += tokens
+                    self.stats["tokens_reserved"] += tokens
+                    return
+                
+                # Sleep until the oldest reservation leaves the window
+                await asyncio.sleep(max(self._window[0][0] + self.window_seconds - now, 0.01))
+    
+    def _expire_window(self, now: float):
+        """Drop reservations older than the budget window"""
+        while self._window and now - self._window[0][0] >= self.window_seconds:
+            _, tokens = self._window.popleft()
+            self._window_tokens -= tokens
+    
+    def _on_rate_limited(self, attempt: int, error: Exception) -> float:
+        """Shrink concurrency and compute the backoff delay after a 429"""
+        self.stats["rate_limited"] += 1
+        
+        # A burst of 429s from calls already in flight counts as a single signal
+        if time.monotonic() >= self._cooldown_until:
+            self._concurrency = max(1.0, self._concurrency / 2)
+        
+        retry_after = getattr(error, "retry_after", None)
+        if retry_after is None:
+            backoff = min(self.base_backoff * (2 ** (attempt - 1)), self.max_backoff)
+            backoff *= random.uniform(0.5, 1.0)  # Jitter avoids synchronized retries
+        else:
+            backoff = float(retry_after)
+        
+        # Pause new requests too, since the provider limit is shared by every call
+        self._cooldown_until = max(self._cooldown_until, time.monotonic() + backoff)
+        
+        print(f"     ⏳ Rate limited, backing off {backoff:.2f}s (concurrency now {self.current_concurrency})")
+        return backoff
+    
+    def _on_success(self):
+        """Grow concurrency back towards the configured maximum"""
+        self.stats["succeeded"] += 1
+        self._concurrency = min(float(self.max_concurrent), self._concurrency + 1.0 / max(self._concurrency, 1.0))
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """Scheduler counters plus the current limits"""
+        return {
+            **self.stats,
+            "current_concurrency": self.current_concurrency,
+            "requests_per_minute": self.requests_per_minute,
+            "tokens_per_minute": self.tokens_per_minute
+        }
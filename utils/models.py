@@ -33,6 +33,10 @@ class Lead(BaseModel):
     score: Optional[float] = Field(None, description="Lead quality score (0-100)")
     motivation_indicators: List[str] = Field(default_factory=list, description="Signs of seller motivation")
     equity_estimate: Optional[float] = Field(None, description="Estimated equity amount")
+    estimated_value: Optional[float] = Field(None, description="Market value estimated from comparable sales")
+    value_confidence: Optional[float] = Field(None, description="Confidence (0-1) of the estimated value")
+    latitude: Optional[float] = Field(None, description="Property latitude")
+    longitude: Optional[float] = Field(None, description="Property longitude")
     
     # Metadata
     source: str = Field(description="Data source (Zillow, MLS, etc.)")
@@ -53,6 +57,13 @@ class SearchCriteria(BaseModel):
     price_max: Optional[float] = Field(None, description="Maximum price")
     lead_type: Literal["buyer", "seller", "investor"] = Field(default="seller")
     motivation_signals: List[str] = Field(default_factory=list, description="Specific motivation indicators to look for")
+    zip_codes: List[str] = Field(default_factory=list, description="Restrict the search to these ZIP codes or ZIP prefixes")
+    center_latitude: Optional[float] = Field(None, description="Latitude of the radius search center")
+    center_longitude: Optional[float] = Field(None, description="Longitude of the radius search center")
+    radius_miles: Optional[float] = Field(None, description="Only keep listings within this distance of the center")
+    bbox: Optional[List[float]] = Field(None, description="Only keep listings inside [min_lat, min_lon, max_lat, max_lon]")
+    polygon: Optional[List[List[float]]] = Field(None, description="Only keep listings inside this polygon of [lat, lon] vertices")
+    whole_state: bool = Field(False, description="Match any city when the location names a state (set for state shard scans)")
 
 class AgentState(BaseModel):
     """Shared state passed between agents in the workflow"""
@@ -67,6 +78,10 @@ class AgentState(BaseModel):
     enriched_leads: List[Lead] = Field(default_factory=list, description="Enriched lead data")
     scored_leads: List[Lead] = Field(default_factory=list, description="Scored leads")
     
+    # Incremental rescans
+    carried_forward_leads: List[Lead] = Field(default_factory=list, description="Unchanged leads reused from the last scan")
+    change_events: List[Dict[str, Any]] = Field(default_factory=list, description="New, changed, price-drop and removed listing events")
+    
     # Human-in-the-Loop
     human_reviewed_leads: List[Lead] = Field(default_factory=list, description="Human-approved leads")
     
@@ -89,6 +104,8 @@ class WorkflowConfig(BaseModel):
     
     # Workflow Settings
     max_leads_per_search: int = Field(default=50, description="Maximum leads to process per search")
+    auto_approve_score: float = Field(default=50, description="Minimum score for a lead to be approved")
+    gate_enrichment: bool = Field(default=False, description="Skip paid enrichment for listings whose heuristic score bound is below auto_approve_score")
     require_human_review: bool = Field(default=True, description="Require human review before output")
     auto_export: bool = Field(default=False, description="Automatically export after human review")
     
@@ -0,0 +1,186 @@
+"""
+Provider performance tracking
+Running hit rate, latency and cost statistics per enrichment provider (globally
+and per market), persisted between runs and used to order provider waterfalls
+"""
+
+import json
+import os
+import threading
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+DEFAULT_STATS_PATH = os.getenv("LEADGEN_PROVIDER_STATS_PATH", ".cache/provider_stats.json")
+
+# Approximate price per lookup in USD
+DEFAULT_PROVIDER_COSTS = {
+    "property_records": 0.02,
+    "public_records": 0.01,
+    "skiptracing": 0.15,
+    "social_media": 0.0,
+    "truepeoplesearch": 0.05,
+    "spokeo": 0.10,
+    "whitepages": 0.08,
+    "beenverified": 0.12
+}
+
+GLOBAL_MARKET = "global"
+
+def market_key(city: str, state: str) -> str:
+    """Market identifier for per-market statistics"""
+    city = " ".join(str(city or "").lower().split())
+    state = str(state or "").strip().lower()
+    return f"{city}, {state}" if city else state or GLOBAL_MARKET
+
+def _percentile(values: List[float], fraction: float) -> Optional[float]:
+    """Nearest-rank percentile of a list of values"""
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+class ProviderStatsStore:
+    """Persistent per-provider statistics with cost- and latency-aware waterfall ordering"""
+    
+    def __init__(self,
+                 path: str = DEFAULT_STATS_PATH,
+                 costs: Optional[Dict[str, float]] = None,
+                 latency_weight: float = 0.05,
+                 min_market_calls: int = 20,
+                 max_samples: int = 200,
+                 save_interval: float = 5.0):
+        self.path = path
+        self.costs = {**DEFAULT_PROVIDER_COSTS, **(costs or {})}
+        # Dollar value of one second of latency when comparing providers
+        self.latency_weight = latency_weight
+        # Below this many calls a market falls back to the global statistics
+        self.min_market_calls = min_market_calls
+        self.max_samples = max_samples
+        self.save_interval = save_interval
+        
+        self._lock = threading.Lock()
+        self._stats = self._load()
+        self._dirty = False
+        self._last_saved = time.monotonic()
+    
+    def record(self, provider: str, market: Optional[str], hit: bool, latency: float):
+        """Record the outcome of one provider call"""
+        with self._lock:
+            for key in {GLOBAL_MARKET, market or GLOBAL_MARKET}:
+                entry = self._stats.setdefault(key, {}).setdefault(
+                    provider, {"calls": 0, "hits": 0, "latencies": []}
+                )
+                entry["calls"] += 1
+                entry["hits"] += 1 if hit else 0
+                entry["latencies"].append(round(latency, 4))
+                del entry["latencies"][:-self.max_samples]
+            self._dirty = True
+        
+        if time.monotonic() - self._last_saved >= self.save_interval:
+            self.save()
+    
+    def order(self, providers: List[str], market: Optional[str] = None) -> List[str]:
+        """Order providers by expected cost per successful lookup, cheapest first"""
+        summary = self.summary(providers, market)
+        # Sorting by cost / hit probability minimises the expected cost of a stop-at-first-hit waterfall;
+        # ties keep the configured order
+        return sorted(providers, key=lambda provider: summary[provider]["expected_cost"])
+    
+    def summary(self, providers: List[str], market: Optional[str] = None) -> Dict[str, Dict[str, Any]]:
+        """Hit rate, latency percentiles, cost and ranking score for each provider"""
+        result = {}
+        
+        with self._lock:
+            for provider in providers:
+                entry = self._entry(provider, market)
+                latencies = entry["latencies"]
+                
+                # Smoothed so untried providers still get a fair chance
+                hit_rate = (entry["hits"] + 1) / (entry["calls"] + 2)
+                p50 = _percentile(latencies, 0.5)
+                p95 = _percentile(latencies, 0.95)
+                cost = self.costs.get(provider, 0.0)
+                effective_cost = cost + self.latency_weight * (p50 or 0.0)
+                
+                result[provider] = {
+                    "calls": entry["calls"],
+                    "hit_rate": round(hit_rate, 3),
+                    "p50_latency": p50,
+                    "p95_latency": p95,
+                    "cost_per_call": cost,
+                    "expected_cost": round(effective_cost / hit_rate, 4)
+                }
+        
+        return result
+    
+    def latency_percentile(self, provider: str, market: Optional[str] = None, fraction: float = 0.95) -> Optional[float]:
+        """Observed latency percentile for a provider, or None before any calls"""
+        with self._lock:
+            return _percentile(self._entry(provider, market)["latencies"], fraction)
+    
+    def waterfall_estimate(self, providers: List[str], market: Optional[str] = None) -> Tuple[float, float]:
+        """Expected (calls, cost) for one lead going through providers in order until a hit"""
+        summary = self.summary(providers, market)
+        expected_calls, expected_cost, reach = 0.0, 0.0, 1.0
+        
+        for provider in providers:
+            expected_calls += reach
+            expected_cost += reach * summary[provider]["cost_per_call"]
+            reach *= 1 - summary[provider]["hit_rate"]
+        
+        return expected_calls, expected_cost
+    
+    def save(self):
+        """Write statistics to disk if anything changed"""
+        with self._lock:
+            if not self._dirty:
+                return
+            payload = json.dumps(self._stats)
+            self._dirty = False
+            self._last_saved = time.monotonic()
+        
+        try:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            
+            # Write then rename so a crash never leaves a half-written file
+            tmp_path = f"{self.path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with open(tmp_path, "w") as f:
+                f.write(payload)
+            os.replace(tmp_path, self.path)
+        except Exception as e:
+            print(f"     ⚠️ Failed to save provider stats: {str(e)}")
+    
+    def _entry(self, provider: str, market: Optional[str]) -> Dict[str, Any]:
+        """Market statistics when there are enough of them, otherwise the global ones"""
+        empty = {"calls": 0, "hits": 0, "latencies": []}
+        market_entry = self._stats.get(market or GLOBAL_MARKET, {}).get(provider)
+        
+        if market_entry and market_entry["calls"] >= self.min_market_calls:
+            return market_entry
+        return self._stats.get(GLOBAL_MARKET, {}).get(provider, empty)
+    
+    def _load(self) -> Dict[str, Dict[str, Dict[str, Any]]]:
+        """Read statistics saved by earlier runs"""
+        if not os.path.exists(self.path):
+            return {}
+        
+        try:
+            with open(self.path) as f:
+                return json.load(f)
+        except Exception as e:
+            print(f"     ⚠️ Ignoring unreadable provider stats: {str(e)}")
+            return {}
+
+# Shared by the enrichment agent and API clients unless one is passed in explicitly
+_default_store = None
+_default_store_lock = threading.Lock()
+
+def get_provider_stats() -> ProviderStatsStore:
+    """Return the process-wide provider statistics store"""
+    global _default_store
+    with _default_store_lock:
+        if _default_store is None:
+            _default_store = ProviderStatsStore()
+        return _default_store
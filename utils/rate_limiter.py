@@ -0,0 +1,124 @@
+"""
+Shared provider rate limiting
+Token buckets per data provider, shared by every API client and agent in the
+process so provider quotas hold even when several workflows run at once
+"""
+
+import asyncio
+import threading
+import time
+from typing import Any, Dict, Optional, Tuple
+
+# (requests per second, burst capacity) for each provider
+DEFAULT_PROVIDER_RATES = {
+    "zillow": (5.0, 10),
+    "property_records": (20.0, 40),
+    "public_records": (20.0, 40),
+    "skiptracing": (10.0, 20),
+    "social_media": (10.0, 20),
+    "truepeoplesearch": (10.0, 20),
+    "spokeo": (10.0, 20),
+    "whitepages": (10.0, 20),
+    "beenverified": (10.0, 20)
+}
+
+# Used for providers without an explicit entry
+DEFAULT_RATE = (10.0, 20)
+
+class TokenBucket:
+    """Token bucket that hands out tokens in request order (first come, first served)"""
+    
+    def __init__(self, rate: float, capacity: int):
+        self.rate = rate
+        self.capacity = capacity
+        
+        self._tokens = float(capacity)
+        self._updated = time.monotonic()
+        # A thread lock (not an asyncio one) so buckets also work across event loops
+        self._lock = threading.Lock()
+        
+        self.stats = {
+            "acquired": 0,
+            "throttled": 0,
+            "wait_seconds": 0.0
+        }
+    
+    async def acquire(self, tokens: int = 1):
+        """Wait until the requested tokens are available"""
+        wait = self._reserve(tokens)
+        if wait <= 0:
+            return
+        
+        try:
+            await asyncio.sleep(wait)
+        except asyncio.CancelledError:
+            # Give back tokens reserved by a caller that no longer needs them
+            with self._lock:
+                self._tokens += tokens
+            raise
+    
+    def _reserve(self, tokens: int) -> float:
+        """Take tokens now, letting the balance go negative, and return how long to wait"""
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(float(self.capacity), self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            
+            # Later callers queue behind the debt left by earlier ones, which keeps the order fair
+            self._tokens -= tokens
+            wait = -self._tokens / self.rate if self._tokens < 0 else 0.0
+            
+            self.stats["acquired"] += tokens
+            if wait > 0:
+                self.stats["throttled"] += 1
+                self.stats["wait_seconds"] += wait
+        
+        return wait
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """Bucket counters plus its configuration"""
+        return {
+            **self.stats,
+            "wait_seconds": round(self.stats["wait_seconds"], 3),
+            "rate": self.rate,
+            "capacity": self.capacity
+        }
+
+class RateLimiterRegistry:
+    """Process-wide collection of per-provider token buckets"""
+    
+    def __init__(self, provider_rates: Optional[Dict[str, Tuple[float, int]]] = None):
+        self.provider_rates = {**DEFAULT_PROVIDER_RATES, **(provider_rates or {})}
+        self._buckets = {}
+        self._lock = threading.Lock()
+    
+    def configure(self, provider: str, rate: float, capacity: int):
+        """Set (or replace) the rate and burst capacity for a provider"""
+        with self._lock:
+            self.provider_rates[provider] = (rate, capacity)
+            self._buckets[provider] = TokenBucket(rate, capacity)
+    
+    def bucket(self, provider: str) -> TokenBucket:
+        """Return the shared bucket for a provider, creating it on first use"""
+        with self._lock:
+            if provider not in self._buckets:
+                rate, capacity = self.provider_rates.get(provider, DEFAULT_RATE)
+                self._buckets[provider] = TokenBucket(rate, capacity)
+            return self._buckets[provider]
+    
+    async def acquire(self, provider: str, tokens: int = 1):
+        """Wait for the provider's quota to allow another request"""
+        await self.bucket(provider).acquire(tokens)
+    
+    def stats(self) -> Dict[str, Any]:
+        """Counters for every provider used so far"""
+        with self._lock:
+            buckets = dict(self._buckets)
+        return {provider: bucket.get_stats() for provider, bucket in buckets.items()}
+
+# Shared by all API clients and agents unless one is passed in explicitly
+_default_registry = RateLimiterRegistry()
+
+def get_rate_limiter() -> RateLimiterRegistry:
+    """Return the process-wide rate limiter registry"""
+    return _default_registry
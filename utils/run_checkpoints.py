@@ -0,0 +1,81 @@
+"""
+Workflow run checkpoints
+The LangGraph checkpointer stores workflow state after every node in a SQLite
+file; long stages also record per-item progress, so a resumed run skips the
+enrichment and scoring work it already paid for
+"""
+
+import json
+import os
+import sqlite3
+import time
+import uuid
+from datetime import datetime
+from typing import Any, Dict, Optional
+from langgraph.checkpoint.sqlite.aio import AsyncSqliteSaver
+
+DEFAULT_CHECKPOINT_PATH = os.getenv("LEADGEN_CHECKPOINT_PATH", ".cache/checkpoints.sqlite")
+
+def new_run_id() -> str:
+    """Unique, sortable id for a workflow run"""
+    return f"run_{datetime.now().strftime('%Y%m%d_%H%M%S')}_{uuid.uuid4().hex[:8]}"
+
+def open_checkpointer(path: str = DEFAULT_CHECKPOINT_PATH):
+    """Async context manager yielding a LangGraph SQLite checkpointer for the checkpoint file"""
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    return AsyncSqliteSaver.from_conn_string(path)
+
+def stage_items_path(checkpoint_path: str) -> str:
+    """Per-item progress file next to a checkpoint file"""
+    # A separate file, since a blocking write here must never wait on the async checkpointer's write lock
+    base, extension = os.path.splitext(checkpoint_path)
+    return f"{base}_items{extension or '.sqlite'}"
+
+class StageCheckpointStore:
+    """SQLite-backed per-item progress of long workflow stages, keyed by run id"""
+    
+    def __init__(self, path: str = stage_items_path(DEFAULT_CHECKPOINT_PATH)):
+        self.path = path
+        self._conn = None
+    
+    def load(self, run_id: str, stage: str) -> Dict[str, Any]:
+        """Items a run already completed in a stage, by item key"""
+        rows = self._connection().execute(
+            "SELECT item_key, value FROM stage_items WHERE run_id = ? AND stage = ?",
+            (run_id, stage)
+        ).fetchall()
+        return {item_key: json.loads(value) for item_key, value in rows}
+    
+    def save(self, run_id: str, stage: str, item_key: str, value: Any):
+        """Record one completed item"""
+        self._connection().execute(
+            "INSERT OR REPLACE INTO stage_items (run_id, stage, item_key, value, created_at) VALUES (?, ?, ?, ?, ?)",
+            (run_id, stage, item_key, json.dumps(value, default=str), time.time())
+        )
+    
+    def clear(self, run_id: str, stage: Optional[str] = None):
+        """Remove a run's item progress, for one stage or all of them"""
+        if stage is None:
+            self._connection().execute("DELETE FROM stage_items WHERE run_id = ?", (run_id,))
+        else:
+            self._connection().execute("DELETE FROM stage_items WHERE run_id = ? AND stage = ?", (run_id, stage))
+    
+    def _connection(self) -> sqlite3.Connection:
+        """Open the checkpoint database on first use"""
+        if self._conn is None:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            
+            self._conn = sqlite3.connect(self.path, isolation_level=None, check_same_thread=False, timeout=30)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS stage_items ("
+                "run_id TEXT NOT NULL, stage TEXT NOT NULL, item_key TEXT NOT NULL, "
+                "value TEXT NOT NULL, created_at REAL NOT NULL, "
+                "PRIMARY KEY (run_id, stage, item_key))"
+            )
+        
+        return self._conn
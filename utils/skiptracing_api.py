@@ -5,28 +5,64 @@ Mock implementation for demonstration - replace with actual skiptracing services
 
 import asyncio
 import aiohttp
-from typing import Dict, List, Any, Optional
+from itertools import islice
+from typing import Dict, List, Any, Optional, AsyncIterator, Tuple
 import random
 import json
+import time
+from utils.enrichment_cache import EnrichmentCache
+from utils.address import property_key
+from utils.rate_limiter import RateLimiterRegistry, get_rate_limiter
+from utils.provider_stats import ProviderStatsStore, get_provider_stats, market_key
+
+# Hedge delay used for a service with no recorded latencies yet
+DEFAULT_HEDGE_DELAY = 0.5
 
 class SkiptracingAPI:
     """Skiptracing service integration for finding property owner contact information"""
     
-    def __init__(self, api_key: Optional[str] = None):
+    STRATEGIES = ("sequential", "race", "hedged")
+    
+    def __init__(self,
+                 api_key: Optional[str] = None,
+                 rate_limiter: Optional[RateLimiterRegistry] = None,
+                 strategy: str = "sequential",
+                 hedge_delay: Optional[float] = None,
+                 hedge_percentile: float = 0.95,
+                 confidence_threshold: int = 80,
+                 adaptive_ordering: bool = True,
+                 provider_stats: Optional[ProviderStatsStore] = None):
+        if strategy not in self.STRATEGIES:
+            raise ValueError(f"Unknown skiptracing strategy: {strategy}")
+        
         self.api_key = api_key
+        self.rate_limiter = rate_limiter or get_rate_limiter()
         self.services = {
             "truepeoplesearch": self._search_truepeoplesearch,
             "spokeo": self._search_spokeo,
             "whitepages": self._search_whitepages,
             "beenverified": self._search_beenverified
         }
+        
+        # "sequential" tries one service at a time, "race" queries all at once and
+        # "hedged" starts the next service once the one in flight runs past its usual latency
+        # (the hedge_percentile of its observed latencies, or a fixed hedge_delay if given)
+        self.strategy = strategy
+        self.hedge_delay = hedge_delay
+        self.hedge_percentile = hedge_percentile
+        self.confidence_threshold = confidence_threshold
+        
+        # Services are tried cheapest expected cost per contact first, using per-market statistics
+        self.adaptive_ordering = adaptive_ordering
+        self.provider_stats = provider_stats or get_provider_stats()
     
     async def find_owner_contact(self, 
                                 address: str,
                                 city: str,
                                 state: str,
                                 zip_code: str,
-                                owner_name: Optional[str] = None) -> Dict[str, Any]:
+                                owner_name: Optional[str] = None,
+                                strategy: Optional[str] = None) -> Dict[str, Any]:
         """Find property owner contact information"""
         
         contact_info = {
@@ -36,44 +72,141 @@ class SkiptracingAPI:
             "emails": [],
             "relatives": [],
             "previous_addresses": [],
-            "confidence_score": 0
+            "confidence_score": 0,
+            "services_queried": []
         }
         
-        # Try each skiptracing service
-        for service_name, search_func in self.services.items():
+        market = market_key(city, state)
+        service_names = list(self.services)
+        if self.adaptive_ordering:
+            service_names = self.provider_stats.order(service_names, market)
+        contact_info["service_order"] = service_names
+        
+        lookup = (address, city, state, zip_code, owner_name, market)
+        strategy = strategy or self.strategy
+        if strategy == "sequential":
+            await self._find_sequential(contact_info, service_names, *lookup)
+        else:
+            await self._find_racing(contact_info, service_names, strategy == "race", *lookup)
+        
+        # Deduplicate results
+        contact_info["phones"] = list(dict.fromkeys(contact_info["phones"]))
+        contact_info["emails"] = list(dict.fromkeys(contact_info["emails"]))
+        contact_info["relatives"] = list(dict.fromkeys(contact_info["relatives"]))
+        
+        return contact_info
+    
+    async def _find_sequential(self, contact_info: Dict[str, Any], service_names: List[str], address: str, city: str, state: str, zip_code: str, owner_name: Optional[str], market: str):
+        """Query services one after another, stopping at the first confident result"""
+        for service_name in service_names:
             try:
-                result = await search_func(address, city, state, zip_code, owner_name)
-                
-                # Merge results
-                if result.get("phones"):
-                    contact_info["phones"].extend(result["phones"])
-                if result.get("emails"):
-                    contact_info["emails"].extend(result["emails"])
-                if result.get("relatives"):
-                    contact_info["relatives"].extend(result["relatives"])
-                if result.get("previous_addresses"):
-                    contact_info["previous_addresses"].extend(result["previous_addresses"])
-                
-                # Update confidence score
-                contact_info["confidence_score"] = max(
-                    contact_info["confidence_score"],
-                    result.get("confidence_score", 0)
-                )
+                result = await self._query_service(service_name, address, city, state, zip_code, owner_name, market)
+                self._merge_result(contact_info, service_name, result)
                 
                 # If we found good contact info, we might not need to check other services
-                if result.get("confidence_score", 0) > 80:
+                if result.get("confidence_score", 0) > self.confidence_threshold:
                     break
                     
             except Exception as e:
                 print(f"Skiptracing service {service_name} failed: {str(e)}")
                 continue
+    
+    def _hedge_delay(self, service_name: str, market: str) -> float:
+        """Seconds to wait on a service before hedging with the next one"""
+        if self.hedge_delay is not None:
+            return self.hedge_delay
         
-        # Deduplicate results
-        contact_info["phones"] = list(set(contact_info["phones"]))
-        contact_info["emails"] = list(set(contact_info["emails"]))
-        contact_info["relatives"] = list(set(contact_info["relatives"]))
+        latency = self.provider_stats.latency_percentile(service_name, market, self.hedge_percentile)
+        return DEFAULT_HEDGE_DELAY if latency is None else latency
+    
+    async def _find_racing(self, contact_info: Dict[str, Any], service_names: List[str], race: bool, address: str, city: str, state: str, zip_code: str, owner_name: Optional[str], market: str):
+        """Query services concurrently (all at once or hedged) and cancel the rest once one is confident"""
+        queued = list(service_names)
+        running = {}
+        hedge_delay = 0.0
         
-        return contact_info
+        def launch_next():
+            nonlocal hedge_delay
+            service_name = queued.pop(0)
+            task = asyncio.create_task(
+                self._query_service(service_name, address, city, state, zip_code, owner_name, market)
+            )
+            running[task] = service_name
+            hedge_delay = 0.0 if race else self._hedge_delay(service_name, market)
+        
+        launch_next()
+        while queued and hedge_delay <= 0:
+            launch_next()
+        
+        try:
+            while running:
+                # Wake up either when a service answers or when the newest one is slower than usual
+                done, _ = await asyncio.wait(
+                    running,
+                    timeout=hedge_delay if queued else None,
+                    return_when=asyncio.FIRST_COMPLETED
+                )
+                
+                if not done:
+                    launch_next()
+                    continue
+                
+                for task in done:
+                    service_name = running.pop(task)
+                    try:
+                        result = task.result()
+                    except Exception as e:
+                        print(f"Skiptracing service {service_name} failed: {str(e)}")
+                        result = {}
+                    
+                    # Merge as results arrive so partial data is kept even if later services are cancelled
+                    self._merge_result(contact_info, service_name, result)
+                    
+                    if result.get("confidence_score", 0) > self.confidence_threshold:
+                        return
+                    
+                    # A service that came back without a good result frees its slot for the next one
+                    if queued:
+                        launch_next()
+        finally:
+            for task in running:
+                task.cancel()
+            if running:
+                await asyncio.gather(*running, return_exceptions=True)
+    
+    async def _query_service(self, service_name: str, address: str, city: str, state: str, zip_code: str, owner_name: Optional[str], market: str) -> Dict[str, Any]:
+        """Call one skiptracing service within its rate limit, recording its latency and hit"""
+        await self.rate_limiter.acquire(service_name)
+        started = time.perf_counter()
+        
+        try:
+            result = await self.services[service_name](address, city, state, zip_code, owner_name)
+        except Exception:
+            self.provider_stats.record(service_name, market, False, time.perf_counter() - started)
+            raise
+        
+        found_contact = bool(result.get("phones") or result.get("emails"))
+        self.provider_stats.record(service_name, market, found_contact, time.perf_counter() - started)
+        return result
+    
+    def _merge_result(self, contact_info: Dict[str, Any], service_name: str, result: Dict[str, Any]):
+        """Merge one service's result into the combined contact info"""
+        contact_info["services_queried"].append(service_name)
+        
+        if result.get("phones"):
+            contact_info["phones"].extend(result["phones"])
+        if result.get("emails"):
+            contact_info["emails"].extend(result["emails"])
+        if result.get("relatives"):
+            contact_info["relatives"].extend(result["relatives"])
+        if result.get("previous_addresses"):
+            contact_info["previous_addresses"].extend(result["previous_addresses"])
+        
+        # Update confidence score
+        contact_info["confidence_score"] = max(
+            contact_info["confidence_score"],
+            result.get("confidence_score", 0)
+        )
     
     async def _search_truepeoplesearch(self, address: str, city: str, state: str, zip_code: str, owner_name: Optional[str]) -> Dict[str, Any]:
         """Search TruePeopleSearch (mock implementation)"""
@@ -173,12 +306,14 @@ class SkiptracingAPI:
 class PropertyRecordsAPI:
     """Property records API for getting owner information from public records"""
     
-    def __init__(self, api_key: Optional[str] = None):
+    def __init__(self, api_key: Optional[str] = None, rate_limiter: Optional[RateLimiterRegistry] = None):
         self.api_key = api_key
+        self.rate_limiter = rate_limiter or get_rate_limiter()
     
     async def get_property_owner(self, address: str, city: str, state: str, zip_code: str) -> Dict[str, Any]:
         """Get property owner information from public records"""
         
+        await self.rate_limiter.acquire("property_records")
         await asyncio.sleep(0.3)  # Simulate API delay
         
         # Mock property records lookup (90% success rate)
@@ -217,9 +352,18 @@ class PropertyRecordsAPI:
 class EnrichmentService:
     """Comprehensive enrichment service combining multiple data sources"""
     
-    def __init__(self):
-        self.skiptracing = SkiptracingAPI()
-        self.property_records = PropertyRecordsAPI()
+    def __init__(self,
+                 cache_results: bool = True,
+                 enrichment_cache: Optional[EnrichmentCache] = None,
+                 rate_limiter: Optional[RateLimiterRegistry] = None,
+                 skiptrace_strategy: str = "hedged"):
+        self.skiptracing = SkiptracingAPI(rate_limiter=rate_limiter, strategy=skiptrace_strategy)
+        self.property_records = PropertyRecordsAPI(rate_limiter=rate_limiter)
+        
+        # Lookups are billed, so results and misses are cached per address
+        if enrichment_cache is None and cache_results:
+            enrichment_cache = EnrichmentCache()
+        self.enrichment_cache = enrichment_cache
     
     async def enrich_property_lead(self, lead_data: Dict[str, Any]) -> Dict[str, Any]:
         """Enrich a property lead with all available contact information"""
@@ -230,11 +374,15 @@ class EnrichmentService:
         zip_code = lead_data.get("zip_code", "")
         
         enriched_data = lead_data.copy()
+        address_key = property_key(address, city, state, zip_code)
         
         try:
             # Get property owner from public records
-            print(f"   🔍 Searching property records for {address}")
-            property_info = await self.property_records.get_property_owner(address, city, state, zip_code)
+            property_info = self._get_cached("property_records_api", address_key)
+            if property_info is None:
+                print(f"   🔍 Searching property records for {address}")
+                property_info = await self.property_records.get_property_owner(address, city, state, zip_code)
+                self._store_cached("property_records_api", address_key, property_info, bool(property_info.get("owner_name")))
             
             if property_info.get("owner_name"):
                 enriched_data["owner_name"] = property_info["owner_name"]
@@ -242,10 +390,16 @@ class EnrichmentService:
                 enriched_data["property_value_estimate"] = property_info.get("property_value")
                 
                 # Now search for contact info using the owner name
-                print(f"   📞 Skiptracing contact info for {property_info['owner_name']}")
-                contact_info = await self.skiptracing.find_owner_contact(
-                    address, city, state, zip_code, property_info["owner_name"]
-                )
+                contact_info = self._get_cached("skiptracing_api", address_key)
+                if contact_info is None:
+                    print(f"   📞 Skiptracing contact info for {property_info['owner_name']}")
+                    contact_info = await self.skiptracing.find_owner_contact(
+                        address, city, state, zip_code, property_info["owner_name"]
+                    )
+                    self._store_cached(
+                        "skiptracing_api", address_key, contact_info,
+                        bool(contact_info.get("phones") or contact_info.get("emails"))
+                    )
                 
                 # Add contact information
                 if contact_info.get("phones"):
@@ -280,35 +434,82 @@ class EnrichmentService:
             enriched_data["enrichment_confidence"] = 0
         
         return enriched_data
+    
+    def _get_cached(self, provider: str, address_key: str) -> Optional[Dict[str, Any]]:
+        """Previously cached provider result for this address, if any"""
+        if not self.enrichment_cache:
+            return None
+        return self.enrichment_cache.get(provider, address_key)
+    
+    def _store_cached(self, provider: str, address_key: str, result: Dict[str, Any], found: bool):
+        """Cache a provider result, with the shorter negative TTL when nothing was found"""
+        if self.enrichment_cache:
+            self.enrichment_cache.set(provider, address_key, result, found=found)
 
-# Batch enrichment utility
-async def batch_enrich_leads(leads: List[Dict[str, Any]], max_concurrent: int = 5) -> List[Dict[str, Any]]:
-    """Enrich multiple leads concurrently with rate limiting"""
+# Batch enrichment utilities
+async def iter_enrich_leads(leads: List[Dict[str, Any]],
+                            max_concurrent: int = 5,
+                            lead_timeout: Optional[float] = 30.0,
+                            enrichment_service: Optional[EnrichmentService] = None) -> AsyncIterator[Tuple[int, Dict[str, Any]]]:
+    """Enrich leads with a sliding window of max_concurrent lookups, yielding (index, result) as each finishes"""
     
-    enrichment_service = EnrichmentService()
-    enriched_leads = []
+    enrichment_service = enrichment_service or EnrichmentService()
+    queued = iter(enumerate(leads))
+    in_flight = {}
     
-    # Process in batches to avoid rate limiting
-    for i in range(0, len(leads), max_concurrent):
-        batch = leads[i:i + max_concurrent]
-        
-        # Process batch concurrently
-        tasks = [enrichment_service.enrich_property_lead(lead) for lead in batch]
-        batch_results = await asyncio.gather(*tasks, return_exceptions=True)
-        
-        # Handle results and exceptions
-        for j, result in enumerate(batch_results):
-            if isinstance(result, Exception):
-                print(f"Lead {i+j+1} enrichment failed: {str(result)}")
-                # Add original lead with error marker
-                error_lead = batch[j].copy()
-                error_lead["enrichment_error"] = str(result)
-                enriched_leads.append(error_lead)
-            else:
-                enriched_leads.append(result)
+    def fill_window():
+        # Start a new lookup for every free slot, so one slow lead never idles the others
+        for index, lead in islice(queued, max_concurrent - len(in_flight)):
+            task = asyncio.create_task(
+                asyncio.wait_for(enrichment_service.enrich_property_lead(lead), timeout=lead_timeout)
+            )
+            in_flight[task] = index
+    
+    try:
+        fill_window()
         
-        # Small delay between batches
-        if i + max_concurrent < len(leads):
-            await asyncio.sleep(1)
+        while in_flight:
+            done, _ = await asyncio.wait(in_flight, return_when=asyncio.FIRST_COMPLETED)
+            
+            for task in done:
+                index = in_flight.pop(task)
+                try:
+                    result = task.result()
+                except Exception as e:
+                    if isinstance(e, asyncio.TimeoutError):
+                        error = f"timed out after {lead_timeout}s"
+                    else:
+                        error = str(e)
+                    
+                    print(f"Lead {index+1} enrichment failed: {error}")
+                    # Return the original lead with an error marker
+                    result = leads[index].copy()
+                    result["enrichment_error"] = error
+                    result["enrichment_confidence"] = 0
+                
+                yield index, result
+            
+            fill_window()
+    finally:
+        # Stop outstanding lookups if the consumer stops iterating early
+        for task in in_flight:
+            task.cancel()
+        if in_flight:
+            await asyncio.gather(*in_flight, return_exceptions=True)
+
+async def batch_enrich_leads(leads: List[Dict[str, Any]],
+                             max_concurrent: int = 5,
+                             lead_timeout: Optional[float] = 30.0) -> List[Dict[str, Any]]:
+    """Enrich multiple leads concurrently with rate limiting, returning results in input order"""
+    
+    enriched_leads = [None] * len(leads)
+    
+    enrichment_service = EnrichmentService()
+    
+    # Provider quotas are enforced by the shared rate limiter; the window only bounds work in flight
+    async for index, result in iter_enrich_leads(leads, max_concurrent, lead_timeout, enrichment_service):
+        enriched_leads[index] = result
+    
+    enrichment_service.skiptracing.provider_stats.save()
     
     return enriched_leads
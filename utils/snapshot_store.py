@@ -0,0 +1,163 @@
+"""
+Listing snapshots for incremental rescans
+Stores the last run's listings and scored leads per search scope, keyed by
+property (the whole duplicate cluster for merged listings), so a rescan can
+tell new and changed listings from unchanged ones
+"""
+
+import bisect
+import json
+import os
+import sqlite3
+import time
+from typing import Any, Dict, List, Optional, Tuple
+from utils.models import Lead, SearchCriteria
+from utils.cache import DEFAULT_CACHE_PATH, make_cache_key
+from utils.stage_cache import normalize_criteria
+from utils.address import listing_property_key, cluster_property_key
+
+# days_on_market only counts as a change when it crosses one of these (the quality score's steps)
+DAYS_ON_MARKET_BUCKETS = (7, 30, 90, 180)
+
+def scope_key(criteria: SearchCriteria) -> str:
+    """Snapshot scope for a set of search criteria"""
+    return make_cache_key("snapshot", normalize_criteria(criteria))
+
+def content_hash(listing: Dict[str, Any]) -> str:
+    """Hash of the listing fields whose change warrants re-enrichment and re-scoring"""
+    days_on_market = listing.get("days_on_market")
+    return make_cache_key(
+        listing.get("price"),
+        bisect.bisect_left(DAYS_ON_MARKET_BUCKETS, days_on_market) if days_on_market is not None else None,
+        listing.get("listing_type"),
+        sorted(listing.get("motivation_signals") or [])
+    )[:16]
+
+class SnapshotStore:
+    """SQLite-backed per-scope snapshots of listings and their scored leads"""
+    
+    def __init__(self, path: str = DEFAULT_CACHE_PATH):
+        self.path = path
+        self._conn = None
+    
+    def compare(self, scope: str, listings: List[Dict[str, Any]]) -> Tuple[List[Dict[str, Any]], List[Lead], List[Dict[str, Any]]]:
+        """Split listings into new or changed ones and carried-forward leads, with change events"""
+        previous = self.load(scope)
+        changed_listings, carried_forward, events = [], [], []
+        seen = set()
+        
+        for listing in listings:
+            key = cluster_property_key(listing)
+            seen.add(key)
+            snapshot = previous.get(key)
+            
+            if snapshot is None:
+                changed_listings.append(listing)
+                events.append(self._event("new", key, listing))
+            elif snapshot["content_hash"] != content_hash(listing):
+                changed_listings.append(listing)
+                events.append(self._change_event(key, snapshot["listing"], listing))
+            else:
+                carried_forward.append(Lead(**snapshot["lead"]))
+        
+        for key, snapshot in previous.items():
+            if key not in seen:
+                events.append(self._event("removed", key, snapshot["listing"]))
+        
+        return changed_listings, carried_forward, events
+    
+    def load(self, scope: str) -> Dict[str, Dict[str, Any]]:
+        """Snapshot rows for a scope by property key"""
+        rows = self._connection().execute(
+            "SELECT property_key, content_hash, listing, lead FROM listing_snapshots WHERE scope = ?",
+            (scope,)
+        ).fetchall()
+        return {
+            key: {"content_hash": digest, "listing": json.loads(listing), "lead": json.loads(lead)}
+            for key, digest, listing, lead in rows
+        }
+    
+    def save(self, scope: str, listings: List[Dict[str, Any]], leads: List[Lead], removed: Optional[List[str]] = None):
+        """Upsert the listings that have a scored lead and drop removed properties from a scope's snapshot"""
+        leads_by_id = {lead.id: lead for lead in leads}
+        now = time.time()
+        rows = []
+        for listing in listings:
+            # Leads are named after the kept record; snapshots after the whole cluster
+            key = cluster_property_key(listing)
+            lead = leads_by_id.get(f"lead_{listing.get('property_key') or listing_property_key(listing)}")
+            if lead is not None:
+                rows.append((scope, key, content_hash(listing), json.dumps(listing, default=str),
+                             json.dumps(lead.dict(), default=str), now))
+        
+        conn = self._connection()
+        conn.execute("BEGIN")
+        try:
+            conn.executemany(
+                "INSERT OR REPLACE INTO listing_snapshots (scope, property_key, content_hash, listing, lead, updated_at) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                rows
+            )
+            conn.executemany(
+                "DELETE FROM listing_snapshots WHERE scope = ? AND property_key = ?",
+                [(scope, key) for key in removed or []]
+            )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+    
+    def clear(self, scope: Optional[str] = None):
+        """Remove one scope's snapshot, or all of them"""
+        if scope is None:
+            self._connection().execute("DELETE FROM listing_snapshots")
+        else:
+            self._connection().execute("DELETE FROM listing_snapshots WHERE scope = ?", (scope,))
+    
+    def _change_event(self, key: str, before: Dict[str, Any], after: Dict[str, Any]) -> Dict[str, Any]:
+        """Describe how a listing changed, naming price moves explicitly"""
+        old_price, new_price = before.get("price"), after.get("price")
+        if old_price and new_price and new_price < old_price:
+            event = self._event("price_drop", key, after)
+        elif old_price and new_price and new_price > old_price:
+            event = self._event("price_increase", key, after)
+        else:
+            event = self._event("changed", key, after)
+        
+        event["old_price"] = old_price
+        event["changes"] = [
+            field for field in ("price", "listing_type", "days_on_market", "motivation_signals")
+            if before.get(field) != after.get(field)
+        ]
+        if event["event"] == "price_drop":
+            event["drop_amount"] = old_price - new_price
+            event["drop_percent"] = round((old_price - new_price) / old_price * 100, 2)
+        return event
+    
+    def _event(self, kind: str, key: str, listing: Dict[str, Any]) -> Dict[str, Any]:
+        """Change event for a listing"""
+        return {
+            "event": kind,
+            "property_key": key,
+            "address": listing.get("address"),
+            "city": listing.get("city"),
+            "price": listing.get("price")
+        }
+    
+    def _connection(self) -> sqlite3.Connection:
+        """Open the snapshot database on first use"""
+        if self._conn is None:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            
+            self._conn = sqlite3.connect(self.path, isolation_level=None, check_same_thread=False)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS listing_snapshots ("
+                "scope TEXT NOT NULL, property_key TEXT NOT NULL, content_hash TEXT NOT NULL, "
+                "listing TEXT NOT NULL, lead TEXT NOT NULL, updated_at REAL NOT NULL, "
+                "PRIMARY KEY (scope, property_key))"
+            )
+        
+        return self._conn
@@ -0,0 +1,209 @@
+"""
+Spatial indexing for listings and leads
+A static KD-tree over latitude/longitude that answers bounding-box, radius and
+polygon queries in O(log n + k), plus city centroids used to place mock listings
+"""
+
+import hashlib
+import math
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+import numpy as np
+
+EARTH_RADIUS_MILES = 3958.8
+MILES_PER_DEGREE_LAT = 69.0
+
+# Approximate centroids (latitude, longitude) of common target markets
+CITY_CENTROIDS = {
+    "phoenix, az": (33.4484, -112.0740), "mesa, az": (33.4152, -111.8315),
+    "scottsdale, az": (33.4942, -111.9261), "tempe, az": (33.4255, -111.9400),
+    "chandler, az": (33.3062, -111.8413), "glendale, az": (33.5387, -112.1860),
+    "tucson, az": (32.2226, -110.9747), "austin, tx": (30.2672, -97.7431),
+    "dallas, tx": (32.7767, -96.7970), "houston, tx": (29.7604, -95.3698),
+    "san antonio, tx": (29.4241, -98.4936), "fort worth, tx": (32.7555, -97.3308),
+    "los angeles, ca": (34.0522, -118.2437), "san diego, ca": (32.7157, -117.1611),
+    "sacramento, ca": (38.5816, -121.4944), "las vegas, nv": (36.1699, -115.1398),
+    "denver, co": (39.7392, -104.9903), "atlanta, ga": (33.7490, -84.3880),
+    "miami, fl": (25.7617, -80.1918), "orlando, fl": (28.5383, -81.3792),
+    "tampa, fl": (27.9506, -82.4572), "jacksonville, fl": (30.3322, -81.6557),
+    "charlotte, nc": (35.2271, -80.8431), "nashville, tn": (36.1627, -86.7816),
+    "chicago, il": (41.8781, -87.6298), "seattle, wa": (47.6062, -122.3321)
+}
+
+def city_centroid(city: str, state: str = "") -> Tuple[float, float]:
+    """Centroid of a known city, or a stable pseudo-location inside the continental US"""
+    key = f"{' '.join(str(city or '').lower().split())}, {str(state or '').strip().lower()}"
+    if key in CITY_CENTROIDS:
+        return CITY_CENTROIDS[key]
+    
+    digest = hashlib.sha1(key.encode("utf-8")).digest()
+    return 30.0 + digest[0] / 255 * 15.0, -120.0 + digest[1] / 255 * 45.0
+
+def haversine_miles(lat1: Any, lon1: Any, lat2: Any, lon2: Any) -> Any:
+    """Great-circle distance in miles (works on scalars and NumPy arrays)"""
+    lat1, lon1, lat2, lon2 = (np.radians(value) for value in (lat1, lon1, lat2, lon2))
+    a = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    return 2 * EARTH_RADIUS_MILES * np.arcsin(np.sqrt(np.minimum(a, 1.0)))
+
+def radius_bbox(latitude: float, longitude: float, miles: float) -> Tuple[float, float, float, float]:
+    """(min_lat, min_lon, max_lat, max_lon) box enclosing a circle"""
+    lat_delta = miles / MILES_PER_DEGREE_LAT
+    lon_delta = miles / (MILES_PER_DEGREE_LAT * max(math.cos(math.radians(latitude)), 1e-6))
+    return latitude - lat_delta, longitude - lon_delta, latitude + lat_delta, longitude + lon_delta
+
+def coordinates_of(record: Any) -> Tuple[Optional[float], Optional[float]]:
+    """Latitude and longitude of a listing dict or Lead, or (None, None)"""
+    if isinstance(record, dict):
+        return record.get("latitude"), record.get("longitude")
+    return getattr(record, "latitude", None), getattr(record, "longitude", None)
+
+class SpatialIndex:
+    """Static KD-tree over (latitude, longitude) points"""
+    
+    def __init__(self, latitudes: Iterable[Optional[float]], longitudes: Iterable[Optional[float]], leaf_size: int = 16):
+        points = np.array(
+            [(np.nan if lat is None else lat, np.nan if lon is None else lon) for lat, lon in zip(latitudes, longitudes)],
+            dtype=float
+        ).reshape(-1, 2)
+        self.points = points
+        self.leaf_size = max(1, leaf_size)
+        
+        # Records without coordinates are not indexed
+        self.order = np.flatnonzero(~np.isnan(points).any(axis=1))
+        self.nodes = []
+        self.root = self._build(0, len(self.order)) if len(self.order) else None
+    
+    @classmethod
+    def from_records(cls, records: List[Any], leaf_size: int = 16) -> "SpatialIndex":
+        """Index listing dicts or Leads by their latitude/longitude"""
+        coordinates = [coordinates_of(record) for record in records]
+        return cls([lat for lat, _ in coordinates], [lon for _, lon in coordinates], leaf_size)
+    
+    def __len__(self) -> int:
+        return len(self.order)
+    
+    def query_bbox(self, min_lat: float, min_lon: float, max_lat: float, max_lon: float) -> List[int]:
+        """Indexes of the points inside a bounding box"""
+        if self.root is None:
+            return []
+        
+        low = np.array([min_lat, min_lon])
+        high = np.array([max_lat, max_lon])
+        found = []
+        stack = [self.root]
+        
+        while stack:
+            start, end, dim, split, left, right = self.nodes[stack.pop()]
+            if left is None:
+                rows = self.order[start:end]
+                inside = np.all((self.points[rows] >= low) & (self.points[rows] <= high), axis=1)
+                found.extend(rows[inside].tolist())
+                continue
+            
+            # Only descend into halves the box overlaps
+            if low[dim] <= split:
+                stack.append(left)
+            if high[dim] >= split:
+                stack.append(right)
+        
+        return found
+    
+    def query_radius(self, latitude: float, longitude: float, miles: float) -> List[Tuple[int, float]]:
+        """(index, distance in miles) of the points within a radius, nearest first"""
+        candidates = self.query_bbox(*radius_bbox(latitude, longitude, miles))
+        if not candidates:
+            return []
+        
+        rows = np.array(candidates)
+        distances = haversine_miles(latitude, longitude, self.points[rows, 0], self.points[rows, 1])
+        inside = distances <= miles
+        ranked = sorted(zip(rows[inside].tolist(), distances[inside].tolist()), key=lambda item: item[1])
+        return [(index, round(distance, 3)) for index, distance in ranked]
+    
+    def _build(self, start: int, end: int) -> int:
+        """Build the subtree over order[start:end] and return its node id"""
+        node_id = len(self.nodes)
+        self.nodes.append(None)
+        
+        if end - start <= self.leaf_size:
+            self.nodes[node_id] = (start, end, None, None, None, None)
+            return node_id
+        
+        # Split on the wider dimension at the median
+        segment = self.order[start:end]
+        spread = self.points[segment].max(axis=0) - self.points[segment].min(axis=0)
+        dim = int(np.argmax(spread))
+        middle = (end - start) // 2
+        partition = np.argpartition(self.points[segment, dim], middle)
+        self.order[start:end] = segment[partition]
+        split = float(self.points[self.order[start + middle], dim])
+        
+        left = self._build(start, start + middle)
+        right = self._build(start + middle, end)
+        self.nodes[node_id] = (start, end, dim, split, left, right)
+        return node_id
+
+def point_in_polygon(latitudes: Any, longitudes: Any, polygon: List[List[float]]) -> np.ndarray:
+    """Even-odd ray casting test of points against a polygon of [lat, lon] vertices (vectorized)"""
+    latitudes = np.atleast_1d(np.asarray(latitudes, dtype=float))
+    longitudes = np.atleast_1d(np.asarray(longitudes, dtype=float))
+    inside = np.zeros(len(latitudes), dtype=bool)
+    
+    vertices = np.asarray(polygon, dtype=float)
+    for (lat1, lon1), (lat2, lon2) in zip(vertices, np.roll(vertices, -1, axis=0)):
+        # Edges crossing the point's latitude toggle it when the crossing is east of the point
+        crosses = (lat1 > latitudes) != (lat2 > latitudes)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            crossing_lon = lon1 + (latitudes - lat1) * (lon2 - lon1) / (lat2 - lat1)
+        inside ^= crosses & (longitudes < crossing_lon)
+    return inside
+
+def polygon_bbox(polygon: List[List[float]]) -> Tuple[float, float, float, float]:
+    """(min_lat, min_lon, max_lat, max_lon) box enclosing a polygon"""
+    vertices = np.asarray(polygon, dtype=float)
+    return (float(vertices[:, 0].min()), float(vertices[:, 1].min()),
+            float(vertices[:, 0].max()), float(vertices[:, 1].max()))
+
+def geo_contains(record: Any,
+                 radius: Optional[Tuple[float, float, float]] = None,
+                 bbox: Optional[List[float]] = None,
+                 polygon: Optional[List[List[float]]] = None) -> Optional[bool]:
+    """Whether one record is inside every given shape, or None when it has no coordinates"""
+    latitude, longitude = coordinates_of(record)
+    if latitude is None or longitude is None:
+        return None
+    
+    if radius and haversine_miles(radius[0], radius[1], latitude, longitude) > radius[2]:
+        return False
+    if bbox and not (bbox[0] <= latitude <= bbox[2] and bbox[1] <= longitude <= bbox[3]):
+        return False
+    if polygon and not point_in_polygon(latitude, longitude, polygon)[0]:
+        return False
+    return True
+
+def geo_filter(records: List[Dict[str, Any]],
+               radius: Optional[Tuple[float, float, float]] = None,
+               bbox: Optional[List[float]] = None,
+               polygon: Optional[List[List[float]]] = None,
+               index: Optional[SpatialIndex] = None) -> Tuple[List[Dict[str, Any]], int]:
+    """Records inside a (latitude, longitude, miles) radius, bounding box and/or polygon in input order, and how many had no coordinates"""
+    index = index or SpatialIndex.from_records(records)
+    keep = None
+    
+    if radius:
+        keep = {row for row, _ in index.query_radius(*radius)}
+    if bbox:
+        in_box = set(index.query_bbox(*bbox))
+        keep = in_box if keep is None else keep & in_box
+    if polygon:
+        # The polygon's bounding box narrows the candidates before the exact test
+        candidates = np.array(index.query_bbox(*polygon_bbox(polygon)), dtype=int)
+        in_polygon = set(candidates[point_in_polygon(index.points[candidates, 0], index.points[candidates, 1], polygon)].tolist()) if len(candidates) else set()
+        keep = in_polygon if keep is None else keep & in_polygon
+    
+    unplaced = len(records) - len(index)
+    if keep is None:
+        return list(records), unplaced
+    
+    # Records without coordinates cannot be placed, so like the city filter they are let through
+    keep |= set(np.flatnonzero(np.isnan(index.points).any(axis=1)).tolist())
+    return [record for row, record in enumerate(records) if row in keep], unplaced
@@ -0,0 +1,90 @@
+"""
+Workflow stage cache
+Stores search results, filtered listings and enriched leads keyed on normalized
+search criteria and each stage's inputs, so a repeated or refined query resumes
+at the first stage whose inputs changed
+"""
+
+from typing import Any, Dict, List, Optional
+from utils.cache import PersistentCache, DEFAULT_CACHE_PATH, make_cache_key
+from utils.models import SearchCriteria, Lead
+
+# Bump when a stage's output format or logic changes so old entries are ignored
+STAGE_CACHE_VERSION = "1"
+
+DEFAULT_STAGE_TTLS = {
+    "search": 3600,            # Listings go stale quickly
+    "filter": 3600,
+    "enrichment": 24 * 3600    # Owner contact data changes slowly
+}
+
+def normalize_criteria(criteria: SearchCriteria) -> Dict[str, Any]:
+    """Canonical form of search criteria, so equivalent queries share cache entries"""
+    location = " ".join(criteria.location.split()).lower()
+    location = ", ".join(part.strip() for part in location.split(","))
+    
+    return {
+        "location": location,
+        "property_types": sorted({t.strip().lower() for t in criteria.property_types}),
+        "price_min": float(criteria.price_min) if criteria.price_min else None,
+        "price_max": float(criteria.price_max) if criteria.price_max else None,
+        "lead_type": criteria.lead_type,
+        "motivation_signals": sorted({s.strip().lower() for s in criteria.motivation_signals}),
+        "zip_codes": sorted({z.strip() for z in criteria.zip_codes}),
+        "radius": [criteria.center_latitude, criteria.center_longitude, criteria.radius_miles] if criteria.radius_miles else None,
+        "bbox": list(criteria.bbox) if criteria.bbox else None,
+        "polygon": [list(vertex) for vertex in criteria.polygon] if criteria.polygon else None,
+        "whole_state": criteria.whole_state
+    }
+
+class WorkflowStageCache:
+    """Per-stage result cache for the lead generation workflow"""
+    
+    def __init__(self,
+                 path: str = DEFAULT_CACHE_PATH,
+                 ttls: Optional[Dict[str, float]] = None,
+                 max_entries: int = 500):
+        self.ttls = {**DEFAULT_STAGE_TTLS, **(ttls or {})}
+        self.caches = {
+            stage: PersistentCache(f"stage_{stage}", path=path, ttl_seconds=ttl, max_entries=max_entries)
+            for stage, ttl in self.ttls.items()
+        }
+    
+    def search_key(self, criteria: SearchCriteria) -> str:
+        """Search depends on location, ZIP and geo scope, property types, price range and lead type"""
+        normalized = normalize_criteria(criteria)
+        # Mock listings are placed around the radius center, so the geo scope is part of the key
+        search_fields = {k: normalized[k] for k in ("location", "zip_codes", "property_types", "price_min", "price_max",
+                                                   "lead_type", "radius", "bbox", "polygon", "whole_state")}
+        return make_cache_key("search", STAGE_CACHE_VERSION, search_fields)
+    
+    def filter_key(self, criteria: SearchCriteria, raw_listings: List[Dict[str, Any]], top_k: Optional[int] = None) -> str:
+        """Filtering depends on the full criteria, the listings it receives and the top-K limit"""
+        return make_cache_key("filter", STAGE_CACHE_VERSION, normalize_criteria(criteria), raw_listings, top_k)
+    
+    def enrichment_key(self, filtered_listings: List[Dict[str, Any]], approval_threshold: Optional[float] = None) -> str:
+        """Enrichment depends on the listings it receives and the threshold that gates paid lookups"""
+        return make_cache_key("enrichment", STAGE_CACHE_VERSION, filtered_listings, approval_threshold)
+    
+    def get_listings(self, stage: str, key: str) -> Optional[List[Dict[str, Any]]]:
+        """Cached listings for the search or filter stage"""
+        return self.caches[stage].get(key)
+    
+    def set_listings(self, stage: str, key: str, listings: List[Dict[str, Any]]):
+        """Store listings for the search or filter stage"""
+        self.caches[stage].set(key, listings)
+    
+    def get_leads(self, key: str) -> Optional[List[Lead]]:
+        """Cached enriched leads"""
+        cached = self.caches["enrichment"].get(key)
+        if cached is None:
+            return None
+        return [Lead(**lead_data) for lead_data in cached]
+    
+    def set_leads(self, key: str, leads: List[Lead]):
+        """Store enriched leads"""
+        self.caches["enrichment"].set(key, [lead.dict() for lead in leads])
+    
+    def stats(self) -> Dict[str, Any]:
+        """Hit/miss statistics per stage"""
+        return {stage: cache.stats() for stage, cache in self.caches.items()}
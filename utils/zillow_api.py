@@ -8,13 +8,15 @@ import aiohttp
 from typing import Dict, List, Any, Optional
 import random
 import json
+from utils.rate_limiter import RateLimiterRegistry, get_rate_limiter
 
 class ZillowAPI:
     """Zillow API integration class"""
     
-    def __init__(self, api_key: Optional[str] = None):
+    def __init__(self, api_key: Optional[str] = None, rate_limiter: Optional[RateLimiterRegistry] = None):
         self.api_key = api_key
         self.base_url = "https://api.zillow.com/webservice"
+        self.rate_limiter = rate_limiter or get_rate_limiter()
         
     async def search_properties(self, 
                                location: str,
@@ -27,6 +29,7 @@ class ZillowAPI:
         # For demo purposes, return mock data
         # In production, replace with actual Zillow API calls
         
+        await self.rate_limiter.acquire("zillow")
         await asyncio.sleep(1)  # Simulate API delay
         
         properties = []
@@ -67,6 +70,7 @@ class ZillowAPI:
     async def get_property_details(self, zpid: str) -> Dict[str, Any]:
         """Get detailed property information"""
         
+        await self.rate_limiter.acquire("zillow")
         await asyncio.sleep(0.5)  # Simulate API delay
         
         # Mock detailed property data